@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, extract, func
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.models.merchant_rollup import MerchantDailyRollup
+from app.models.user import User
+from app.api.dependencies import get_current_user
+from app.schemas.analytics import AgingBucket, AnalyticsSummary, MonthlyRevenue
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# (label, max age in days); the last bucket is open-ended
+AGING_BUCKETS = [("0-30", 30), ("31-60", 60), ("61-90", 90), ("90+", None)]
+
+
+def _aging_bucket(today: date):
+    # SQL CASE giving each rollup day its bucket label (future days are 0-30)
+    whens = [
+        (MerchantDailyRollup.day >= today - timedelta(days=max_age), label)
+        for label, max_age in AGING_BUCKETS if max_age is not None
+    ]
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+
+def _month_start(d: date, months_back: int) -> date:
+    month_index = d.year * 12 + d.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+@router.get("/summary", response_model=AnalyticsSummary)
+def get_analytics_summary(
+    months: int = Query(12, ge=1, le=120, description="Months of revenue history"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Dashboard totals for the current merchant: paid revenue per month,
+    outstanding amount by age bucket and recurring MRR.
+    Read from merchant_daily_rollups (one row per merchant and issue date),
+    never from the invoices table, with two GROUP BY queries: one over
+    aging buckets for the all-time totals and one per month over the
+    reported window. Revenue is attributed to the invoice's issue month.
+    """
+    today = date.today()
+    first_month = _month_start(today, months - 1)
+    rollup = MerchantDailyRollup
+
+    # All-time totals, grouped by aging bucket: at most len(AGING_BUCKETS) rows
+    bucket = _aging_bucket(today).label("bucket")
+    by_bucket = (
+        db.query(
+            bucket,
+            func.sum(rollup.due_total),
+            func.sum(rollup.due_count),
+            func.sum(rollup.paid_total),
+            func.sum(rollup.recurring_mrr),
+        )
+        .filter(rollup.merchant_id == current_user.id)
+        .group_by(bucket)
+        .all()
+    )
+
+    # Paid revenue within the reported window, one row per month
+    year = extract("year", rollup.day)
+    month = extract("month", rollup.day)
+    by_month = (
+        db.query(year, month, func.sum(rollup.paid_total), func.sum(rollup.paid_count))
+        .filter(
+            rollup.merchant_id == current_user.id,
+            rollup.day >= first_month,
+            rollup.day <= today,
+            rollup.paid_count > 0,
+        )
+        .group_by(year, month)
+        .all()
+    )
+
+    revenue = OrderedDict()
+    for i in range(months - 1, -1, -1):
+        revenue[_month_start(today, i).strftime("%Y-%m")] = [0.0, 0]
+    for row_year, row_month, total, count in by_month:
+        revenue[f"{int(row_year):04d}-{int(row_month):02d}"] = [total or 0.0, count or 0]
+
+    aging = OrderedDict((label, [0.0, 0]) for label, _ in AGING_BUCKETS)
+    recurring_mrr = due_total = paid_total = 0.0
+    for label, bucket_due_total, bucket_due_count, bucket_paid_total, bucket_mrr in by_bucket:
+        aging[label] = [bucket_due_total or 0.0, bucket_due_count or 0]
+        due_total += bucket_due_total or 0.0
+        paid_total += bucket_paid_total or 0.0
+        recurring_mrr += bucket_mrr or 0.0
+
+    return AnalyticsSummary(
+        revenue_by_month=[
+            MonthlyRevenue(month=month, paid_total=round(total, 2), paid_count=count)
+            for month, (total, count) in revenue.items()
+        ],
+        outstanding_by_age=[
+            AgingBucket(bucket=label, due_total=round(total, 2), due_count=count)
+            for label, (total, count) in aging.items()
+        ],
+        recurring_mrr=round(recurring_mrr, 2),
+        due_total=round(due_total, 2),
+        paid_total=round(paid_total, 2),
+    )
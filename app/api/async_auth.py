@@ -0,0 +1,68 @@
+# app/api/async_auth.py
+#
+# Async version of app/api/auth.py, used when ASYNC_DB is enabled.
+
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.async_database import get_async_db
+from app.models.user import User
+from app.core.login_throttle import clear_login_failures
+from app.schemas.user import TokenRefresh
+from app.api.auth import (
+    _check_not_blocked, _client_ip, _login_failed, _refresh_claims, _submit_verify, issue_tokens, revoke_refresh_token,
+)
+from app.api.async_dependencies import get_current_user_fresh
+from app.api.dependencies import AuthenticatedUser
+
+router = APIRouter()
+
+# POST /auth/login
+@router.post("/login")
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """See app/api/auth.login."""
+    ip = _client_ip(request)
+    _check_not_blocked(form_data.username, ip)
+
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    if not user:
+        _login_failed(form_data.username, ip)
+
+    # bcrypt is CPU-bound: it runs in the hash pool, off the event loop
+    valid, new_hash = await asyncio.wrap_future(_submit_verify(form_data.password, user.hashed_password))
+    if not valid:
+        _login_failed(form_data.username, ip)
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    clear_login_failures(form_data.username)
+
+    return issue_tokens(user)
+
+
+# POST /auth/refresh
+@router.post("/refresh")
+async def refresh(body: TokenRefresh, db: AsyncSession = Depends(get_async_db)):
+    """See app/api/auth.refresh."""
+    claims = _refresh_claims(body.refresh_token)
+    user = await db.get(User, int(claims["sub"]))
+    if not user or not await db.run_sync(revoke_refresh_token, claims):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or revoked refresh token")
+    await db.commit()
+    return issue_tokens(user)
+
+
+# POST /auth/logout
+@router.post("/logout")
+async def logout(body: TokenRefresh, db: AsyncSession = Depends(get_async_db)):
+    await db.run_sync(revoke_refresh_token, _refresh_claims(body.refresh_token))
+    await db.commit()
+    return {"success": True}
+
+
+# Helper route to verify current user info
+@router.get("/me")
+async def read_users_me(current_user: AuthenticatedUser = Depends(get_current_user_fresh)):
+    return current_user
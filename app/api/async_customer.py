@@ -0,0 +1,81 @@
+# app/api/async_customer.py
+#
+# Async version of app/api/customer.py, used when ASYNC_DB is enabled.
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.db.async_database import get_async_db
+from app.models.customer import Customer
+from app.api.async_dependencies import get_current_user
+from app.api.dependencies import AuthenticatedUser
+from app.api.customer import (
+    _attach_summary, _customer_invoices_statement, _customer_page, _customer_page_statement,
+    _customers_with_summaries, _found,
+)
+
+from app.schemas.invoice import InvoiceOut
+from app.schemas.customer import CustomerOut, CustomerUpdate
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter(prefix="/customers", tags=["customers"])
+
+
+async def _get_customer_with_summary(db: AsyncSession, merchant_id: int, customer_id: int) -> Customer:
+    statement = _customers_with_summaries(merchant_id).where(Customer.id == customer_id)
+    return _attach_summary(*_found((await db.execute(statement)).first()))
+
+
+@router.get("/", response_model=List[CustomerOut])
+async def get_customers(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    is_active: Optional[bool] = None,
+    search: Optional[str] = Query(None, description="Matches first name, last name or email"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """See app/api/customer.get_customers."""
+    statement = _customer_page_statement(current_user.id, is_active, search, cursor, limit)
+    return _customer_page(response, (await db.execute(statement)).all(), limit)
+
+
+@router.get("/{customer_id}", response_model=CustomerOut)
+async def get_customer(
+    customer_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    return await _get_customer_with_summary(db, current_user.id, customer_id)
+
+
+@router.put("/{customer_id}", response_model=CustomerOut)
+async def update_customer(
+    customer_id: int,
+    payload: CustomerUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    customer = _found(await db.scalar(
+        select(Customer).where(Customer.id == customer_id, Customer.merchant_id == current_user.id)
+    ))
+
+    data = payload.model_dump(exclude_unset=True)
+    for field, value in data.items():
+        setattr(customer, field, value)
+
+    await db.commit()
+    return await _get_customer_with_summary(db, current_user.id, customer.id)
+
+
+@router.get("/{customer_id}/invoices", response_model=List[InvoiceOut])
+async def get_customer_invoices(
+    customer_id: int,
+    status: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    return (await db.scalars(_customer_invoices_statement(current_user.id, customer_id, status))).all()
@@ -0,0 +1,39 @@
+# app/api/async_dependencies.py
+#
+# get_current_user for the async routers: same token check and user cache
+# as app/api/dependencies.py, with the cache-miss lookup on AsyncSession.
+
+from fastapi import Depends, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import (
+    AuthenticatedUser, cache_user, cached_user, email_from_token, oauth2_scheme, token_claims, user_from_claims
+)
+from app.db.async_database import get_async_db
+from app.models.user import User
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> AuthenticatedUser:
+    """See app/api/dependencies.get_current_user."""
+    claims = token_claims(credentials.credentials)
+    return user_from_claims(claims) or await _load_user(db, claims["sub"])
+
+
+async def get_current_user_fresh(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> AuthenticatedUser:
+    return await _load_user(db, email_from_token(credentials.credentials))
+
+
+async def _load_user(db: AsyncSession, email: str) -> AuthenticatedUser:
+    current_user = cached_user(email)
+    if current_user is None:
+        user = await db.scalar(select(User).where(User.email == email))
+        current_user = cache_user(user)
+    return current_user
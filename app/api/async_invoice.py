@@ -0,0 +1,256 @@
+# app/api/async_invoice.py
+#
+# Async version of app/api/invoice.py (same routes, same responses), used
+# when ASYNC_DB is enabled. Requests wait on database connections instead
+# of holding a threadpool thread each.
+# Validation, pay links and emails are shared with the sync module;
+# the sync aggregate/outbox helpers run through AsyncSession.run_sync.
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.async_database import AsyncSessionLocal, get_async_db
+from app.models.invoice import Invoice
+from app.models.customer import Customer
+from app.schemas.invoice import BulkInvoiceResponse, InvoiceCreate, InvoiceOut, RecurringAmountUpdate
+from app.api.async_dependencies import get_current_user
+from app.api.dependencies import AuthenticatedUser
+from app.api.invoice import (
+    FIELDS_DESCRIPTION, INVOICE_PAGE_RESPONSES, _apply_status_transition, _cancel,
+    _check_bulk_size, _finish_bulk, _invoice_list_statement,
+    _invoice_page_response, _invoice_page_statement, _new_invoice_email,
+    INVOICE_FIELDS, _export_response, _export_statement,
+)
+from app.utils.bulk import apply_recurrence_fields, prepare_bulk
+from app.utils.checkout import payment_link
+from datetime import date
+from typing import List, Literal, Optional
+from app.utils.export import EXPORT_BATCH_SIZE, encode_rows, export_header
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, estimate_count
+from app.utils.aggregates import invoices_changed
+from app.utils.send_email import enqueue_email
+from app.tasks.email_outbox import dispatch_email_outbox
+
+router = APIRouter()
+
+
+async def _get_invoice(db: AsyncSession, invoice_id: int, merchant_id: int) -> Optional[Invoice]:
+    return await db.scalar(select(Invoice).filter_by(id=invoice_id, merchant_id=merchant_id))
+
+
+@router.post("/", response_model=InvoiceOut)
+async def create_invoice(
+    invoice: InvoiceCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    payload = invoice.dict()
+    payload["merchant_id"] = current_user.id
+
+    customer = await db.scalar(
+        select(Customer).filter_by(email=payload["customer_email"], merchant_id=current_user.id)
+    )
+    if not customer:
+        customer = Customer(
+            merchant_id=current_user.id,
+            first_name=payload["customer_first_name"],
+            last_name=payload["customer_last_name"],
+            email=payload["customer_email"]
+        )
+        db.add(customer)
+        await db.commit()
+    payload["customer_id"] = customer.id
+
+    if payload.get("is_recurring"):
+        existing_recurring_invoice = await db.scalar(
+            select(Invoice.id)
+            .filter_by(customer_id=customer.id, merchant_id=current_user.id, is_recurring=True)
+            .limit(1)
+        )
+        if existing_recurring_invoice:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Customer with email {payload['customer_email']} already has an active recurring invoice."
+            )
+
+    apply_recurrence_fields(payload)
+
+    db_invoice = Invoice(**payload)
+    db.add(db_invoice)
+    await db.flush()
+    db_invoice.payment_url = payment_link(db_invoice.id)
+    await db.run_sync(invoices_changed, [db_invoice])
+
+    # Queued in the same commit as the invoice
+    subject, content = _new_invoice_email(db_invoice, current_user.company_name)
+    await db.run_sync(enqueue_email, db_invoice.customer_email, subject, content)
+    await db.commit()
+
+    # Sent after the response goes out; the scheduler retries if this fails
+    background_tasks.add_task(dispatch_email_outbox)
+
+    return db_invoice
+
+
+@router.post("/bulk", response_model=BulkInvoiceResponse)
+async def create_invoices_bulk(
+    invoices: List[InvoiceCreate],
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    """See app/api/invoice.create_invoices_bulk."""
+    _check_bulk_size(invoices)
+    results, created = await db.run_sync(prepare_bulk, current_user, invoices)
+    response = await db.run_sync(_finish_bulk, current_user, results, created)
+    await db.commit()
+
+    background_tasks.add_task(dispatch_email_outbox)
+    return response
+
+
+@router.get("/export")
+async def export_invoices(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[str] = Query(None, enum=["Paid", "Due", "canceled", "refunded"]),
+    date_from: Optional[date] = Query(None, description="First issue date to include"),
+    date_to: Optional[date] = Query(None, description="Last issue date to include"),
+    bom: bool = Query(False, description="Start the CSV with a UTF-8 BOM (for Excel)"),
+):
+    """See app/api/invoice.export_invoices."""
+    statement = _export_statement(current_user.id, status, date_from, date_to)
+
+    async def chunks():
+        yield export_header(INVOICE_FIELDS, format, bom)
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield encode_rows(rows, INVOICE_FIELDS, format)
+
+    return _export_response(chunks(), format)
+
+
+async def _paginated_invoices(
+    db: AsyncSession,
+    merchant_id: int,
+    status: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    fields: Optional[str],
+):
+    # See app/api/invoice._paginated_invoices
+    statement = _invoice_list_statement(merchant_id, status, fields)
+    total = await db.run_sync(estimate_count, statement)
+    rows = (await db.execute(_invoice_page_statement(statement, cursor, limit))).all()
+    return _invoice_page_response(rows, limit, total)
+
+
+@router.get("/all", response_model=None, responses=INVOICE_PAGE_RESPONSES)
+async def list_all_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    status: str = Query(None, enum=["Paid", "Due", "canceled", "refunded"]),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    return await _paginated_invoices(db, current_user.id, status, cursor, limit, fields)
+
+
+@router.patch("/cancel/{invoice_id}", response_model=InvoiceOut)
+async def cancel_invoice(
+    invoice_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    invoice = await _get_invoice(db, invoice_id, current_user.id)
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found or unauthorized.")
+
+    _cancel(invoice)
+
+    await db.run_sync(invoices_changed, [invoice])
+    await db.commit()
+    return invoice
+
+
+@router.patch("/{invoice_id}/recurring-amount", response_model=InvoiceOut)
+async def update_recurring_amount(
+    invoice_id: int,
+    update: RecurringAmountUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    invoice = await _get_invoice(db, invoice_id, current_user.id)
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found or unauthorized.")
+
+    if not invoice.is_recurring:
+        raise HTTPException(status_code=400, detail="Invoice is not recurring.")
+
+    if update.recurring_amount <= 0:
+        raise HTTPException(status_code=400, detail="Recurring amount must be positive.")
+
+    invoice.recurring_amount = update.recurring_amount
+    await db.commit()
+    return invoice
+
+
+@router.get("/due", response_model=None, responses=INVOICE_PAGE_RESPONSES)
+async def list_due_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    return await _paginated_invoices(db, current_user.id, "Due", cursor, limit, fields)
+
+
+@router.get("/paid", response_model=None, responses=INVOICE_PAGE_RESPONSES)
+async def list_paid_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    return await _paginated_invoices(db, current_user.id, "Paid", cursor, limit, fields)
+
+
+@router.get("/canceled", response_model=None, responses=INVOICE_PAGE_RESPONSES)
+async def list_canceled_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    return await _paginated_invoices(db, current_user.id, "canceled", cursor, limit, fields)
+
+
+@router.patch("/{invoice_id}/status", response_model=InvoiceOut)
+async def update_invoice_status(
+    invoice_id: int,
+    status_update: dict,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    new_status = status_update.get("status")
+    if new_status not in ["Due", "Paid", "canceled"]:
+        raise HTTPException(status_code=400, detail="Invalid status")
+
+    invoice = await _get_invoice(db, invoice_id, current_user.id)
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    if invoice.status == new_status:
+        return invoice
+
+    _apply_status_transition(invoice, new_status)
+
+    await db.run_sync(invoices_changed, [invoice])
+    await db.commit()
+    return invoice
@@ -0,0 +1,29 @@
+# app/api/async_webhook.py
+#
+# Async version of app/api/webhook.py, used when ASYNC_DB is enabled.
+
+import logging
+from fastapi import APIRouter, Request, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.async_database import get_async_db
+from app.api.webhook import store_event
+from app.utils.stripe_gateway import get_stripe_gateway
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("/stripe-webhook")
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
+    payload = await request.body()
+    sig_header = request.headers.get("stripe-signature")
+
+    try:
+        event = get_stripe_gateway().verify_webhook(payload, sig_header)
+    except Exception as e:
+        logger.warning("Webhook signature verification failed: %s", e)
+        return {"success": False, "error": str(e)}
+
+    stored = await db.run_sync(store_event, event, payload)
+    await db.commit()
+    return {"success": True, "duplicate": not stored}
@@ -1,39 +1,174 @@
 # ✅ app/api/auth.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import uuid
+from concurrent.futures import Future
+from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from app.db.database import get_db
+from app.db.upsert import insert_for
+from app.models.revoked_token import RevokedToken
 from app.models.user import User
-from app.core.security import verify_password
+from app.schemas.user import TokenRefresh
+from app.core.login_throttle import clear_login_failures, login_blocked, record_login_failure
+from app.core.security import PasswordHasherBusy, submit_verify_and_update
 from datetime import timedelta, datetime
 from jose import jwt
 from app.core.config import settings
-from app.api.dependencies import get_current_user
+from app.api.dependencies import AuthenticatedUser, get_current_user, get_current_user_fresh, token_claims
 
 router = APIRouter()
 
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Helper to create token
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.setdefault("typ", "access")
+    to_encode.update({"iat": now, "exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
+
+def create_refresh_token(user: User) -> str:
+    return create_access_token(
+        data={"sub": str(user.id), "typ": "refresh", "jti": uuid.uuid4().hex},
+        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+
+
+def issue_tokens(user: User) -> dict:
+    """
+    Login/refresh response. The access token carries what get_current_user
+    needs (see AuthenticatedUser), so requests never load the users row.
+    """
+    access_token = create_access_token(data={
+        "sub": user.email,
+        "mid": user.id,
+        "company": user.company_name,
+        "stripe_account_id": user.stripe_account_id,
+    })
+    return {
+        "access_token": access_token,
+        "refresh_token": create_refresh_token(user),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def revoke_refresh_token(db: Session, claims: dict) -> bool:
+    """
+    Adds the token to revoked_tokens; False if it was already there (used
+    or logged out). Checking and revoking is one INSERT ... ON CONFLICT DO
+    NOTHING, so two concurrent refreshes with the same token cannot both
+    succeed. Does not commit.
+    """
+    statement = insert_for(db)(RevokedToken).values(
+        jti=claims["jti"],
+        user_id=int(claims["sub"]),
+        expires_at=datetime.utcfromtimestamp(claims["exp"]),
+        revoked_at=datetime.utcnow(),
+    ).on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+    return db.execute(statement).rowcount == 1
+
+
+def _refresh_claims(token: str) -> dict:
+    claims = token_claims(token, "refresh")
+    if not claims.get("jti"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return claims
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _check_not_blocked(email: str, ip: str):
+    # Before the user lookup and any hashing: a blocked caller costs nothing
+    if login_blocked(email, ip):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts. Try again later.",
+            headers={"Retry-After": str(settings.LOGIN_FAILURE_WINDOW_SECONDS)},
+        )
+
+
+def _login_failed(email: str, ip: str):
+    record_login_failure(email, ip)
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+
+def _submit_verify(password: str, hashed_password: str) -> Future:
+    try:
+        return submit_verify_and_update(password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry.",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _find_login_user(db: Session, email: str, ip: str) -> User:
+    _check_not_blocked(email, ip)
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        _login_failed(email, ip)
+    return user
+
+
+def _finish_login(db: Session, user: User, email: str, ip: str, valid: bool, new_hash) -> dict:
+    if not valid:
+        _login_failed(email, ip)
+    if new_hash:
+        # Hashed with an outdated BCRYPT_ROUNDS: store it with the current cost
+        user.hashed_password = new_hash
+        db.commit()
+    clear_login_failures(email)
+    return issue_tokens(user)
+
+
 # POST /auth/login
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # The database and cache work runs in the threadpool, but bcrypt is only
+    # awaited: a burst of logins waits on the hash pool without holding
+    # threadpool threads that other sync endpoints need
+    ip = _client_ip(request)
+    user = await run_in_threadpool(_find_login_user, db, form_data.username, ip)
+    valid, new_hash = await asyncio.wrap_future(_submit_verify(form_data.password, user.hashed_password))
+    return await run_in_threadpool(_finish_login, db, user, form_data.username, ip, valid, new_hash)
+
+
+# POST /auth/refresh
+@router.post("/refresh")
+def refresh(body: TokenRefresh, db: Session = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new access/refresh pair. Refresh tokens
+    are single-use: the old one is revoked, and presenting it again fails.
+    The new access token gets the merchant's current claims.
+    """
+    claims = _refresh_claims(body.refresh_token)
+    user = db.get(User, int(claims["sub"]))
+    if not user or not revoke_refresh_token(db, claims):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or revoked refresh token")
+    db.commit()
+    return issue_tokens(user)
+
 
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+# POST /auth/logout
+@router.post("/logout")
+def logout(body: TokenRefresh, db: Session = Depends(get_db)):
+    # The access token simply expires (ACCESS_TOKEN_EXPIRE_MINUTES)
+    revoke_refresh_token(db, _refresh_claims(body.refresh_token))
+    db.commit()
+    return {"success": True}
 
 
 # Helper route to verify current user info
 @router.get("/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: AuthenticatedUser = Depends(get_current_user_fresh)):
     return current_user
@@ -1,77 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import exists, and_, or_, select
+from sqlalchemy import func, or_, select
 from typing import List, Optional
 
 from app.db.database import get_db
 from app.models.customer import Customer
+from app.models.customer_summary import CustomerSummary
 from app.models.invoice import Invoice
 from app.models.user import User
 from app.api.auth import get_current_user
 
 from app.schemas.invoice import InvoiceOut
 from app.schemas.customer import CustomerOut, CustomerUpdate
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
 
-def _compute_has_active_invoices(db: Session, merchant_id: int, customer_id: int) -> bool:
-    return db.query(
-        exists().where(
-            and_(
-                Invoice.customer_id == customer_id,
-                Invoice.merchant_id == merchant_id,
-                or_(
-                    Invoice.status == 'Due',
-                    Invoice.is_recurring == True
-                )
-            )
-        )
-    ).scalar()
+def _attach_summary(customer: Customer, summary: Optional[CustomerSummary]) -> Customer:
+    # Fields used by CustomerOut; customers without invoices have no summary row yet
+    customer.has_active_invoices = bool(summary and summary.active_invoice_count)
+    customer.active_invoice_count = summary.active_invoice_count if summary else 0
+    customer.due_total = summary.due_total if summary else 0
+    customer.paid_total = summary.paid_total if summary else 0
+    customer.last_invoice_date = summary.last_invoice_date if summary else None
+    return customer
+
+
+def _customers_with_summaries(merchant_id: int):
+    return (
+        select(Customer, CustomerSummary)
+        .outerjoin(CustomerSummary, CustomerSummary.customer_id == Customer.id)
+        .where(Customer.merchant_id == merchant_id)
+    )
+
+
+def _customer_page_statement(
+    merchant_id: int,
+    is_active: Optional[bool],
+    search: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+):
+    # Shared with app/api/async_customer.py
+    statement = _customers_with_summaries(merchant_id)
+
+    if is_active is not None:
+        is_active_expr = func.coalesce(CustomerSummary.active_invoice_count, 0) > 0
+        if is_active:
+            statement = statement.where(is_active_expr)
+        else:
+            statement = statement.where(~is_active_expr)
+
+    if search:
+        pattern = f"%{search}%"
+        statement = statement.where(or_(
+            Customer.first_name.ilike(pattern),
+            Customer.last_name.ilike(pattern),
+            Customer.email.ilike(pattern),
+        ))
+
+    if cursor:
+        (cursor_id,) = decode_cursor(cursor, int)
+        statement = statement.where(Customer.id > cursor_id)
+
+    return statement.order_by(Customer.id).limit(limit + 1)
+
+
+def _customer_page(response: Response, rows, limit: int) -> List[Customer]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1][0].id)
+    return [_attach_summary(customer, summary) for customer, summary in rows]
+
+
+def _customer_invoices_statement(merchant_id: int, customer_id: int, status: Optional[str]):
+    statement = select(Invoice).where(
+        Invoice.customer_id == customer_id,
+        Invoice.merchant_id == merchant_id
+    )
+    if status:
+        statement = statement.where(Invoice.status == status.capitalize())
+    return statement
+
+
+def _found(row):
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+    return row
+
+
+def _get_customer_with_summary(db: Session, merchant_id: int, customer_id: int) -> Customer:
+    statement = _customers_with_summaries(merchant_id).where(Customer.id == customer_id)
+    return _attach_summary(*_found(db.execute(statement).first()))
 
 
 @router.get("/", response_model=List[CustomerOut])
 def get_customers(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    is_active: Optional[bool] = None
+    is_active: Optional[bool] = None,
+    search: Optional[str] = Query(None, description="Matches first name, last name or email"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
 ):
     """
     Gets all customers. Can be filtered by their active status.
     An active customer has at least one invoice that is 'Due' OR is recurring.
+    Results are ordered by id and keyset-paginated; the next page's cursor
+    is returned in the X-Next-Cursor header. Activity and totals come from
+    customer_summaries, so a page is a single query.
     """
-    query = db.query(Customer).filter(Customer.merchant_id == current_user.id)
-
-    if is_active is not None:
-        # Correlated subquery for active customers (scoped to this merchant)
-        active_customer_subquery = select(Invoice.customer_id).where(
-            and_(
-                Invoice.customer_id == Customer.id,
-                Invoice.merchant_id == current_user.id,
-                or_(
-                    Invoice.status == 'Due',
-                    Invoice.is_recurring == True
-                )
-            )
-        ).distinct()
-
-        if is_active:
-            query = query.filter(exists(active_customer_subquery))
-        else:
-            query = query.filter(~exists(active_customer_subquery))
-
-    customers = query.all()
-
-    # Attach flag used by CustomerOut
-    for customer in customers:
-        if is_active is not None:
-            customer.has_active_invoices = is_active
-        else:
-            customer.has_active_invoices = _compute_has_active_invoices(
-                db, current_user.id, customer.id
-            )
-
-    return customers
+    statement = _customer_page_statement(current_user.id, is_active, search, cursor, limit)
+    return _customer_page(response, db.execute(statement).all(), limit)
 
 
 @router.get("/{customer_id}", response_model=CustomerOut)
@@ -80,18 +122,7 @@ def get_customer(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    customer = db.query(Customer).filter(
-        Customer.id == customer_id,
-        Customer.merchant_id == current_user.id
-    ).first()
-
-    if not customer:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
-
-    customer.has_active_invoices = _compute_has_active_invoices(
-        db, current_user.id, customer.id
-    )
-    return customer
+    return _get_customer_with_summary(db, current_user.id, customer_id)
 
 
 @router.put("/{customer_id}", response_model=CustomerOut)
@@ -104,13 +135,10 @@ def update_customer(
     """
     Update customer fields (e.g., phone). Only allows updating the current user's customers.
     """
-    customer = db.query(Customer).filter(
+    customer = _found(db.query(Customer).filter(
         Customer.id == customer_id,
         Customer.merchant_id == current_user.id
-    ).first()
-
-    if not customer:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+    ).first())
 
     # Apply partial updates
     data = payload.model_dump(exclude_unset=True)
@@ -120,11 +148,8 @@ def update_customer(
     db.commit()
     db.refresh(customer)
 
-    # Recompute the flag for response
-    customer.has_active_invoices = _compute_has_active_invoices(
-        db, current_user.id, customer.id
-    )
-    return customer
+    # Attach the summary for the response
+    return _get_customer_with_summary(db, current_user.id, customer.id)
 
 
 @router.get("/{customer_id}/invoices", response_model=List[InvoiceOut])
@@ -134,13 +159,4 @@ def get_customer_invoices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(Invoice).filter(
-        Invoice.customer_id == customer_id,
-        Invoice.merchant_id == current_user.id
-    )
-
-    if status:
-        query = query.filter(Invoice.status == status.capitalize())
-
-    invoices = query.all()
-    return invoices
+    return db.scalars(_customer_invoices_statement(current_user.id, customer_id, status)).all()
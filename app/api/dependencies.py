@@ -1,28 +1,141 @@
+from dataclasses import asdict, dataclass
+from typing import Optional
+
 from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.models.user import User
+from app.core.cache import make_cache
 from app.core.config import settings  # Make sure this exists
 
 oauth2_scheme = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    token = credentials.credentials
+
+# ─── Authenticated user cache ─────────────────────────────────────────────────
+# The token's email → the user fields the routes need. A hit authenticates a
+# request without touching the database; entries are dropped whenever the
+# user row is updated or deleted (and otherwise expire after the TTL).
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    id: int
+    email: str
+    company_name: str
+    stripe_account_id: Optional[str] = None
+
+
+user_cache = make_cache("auth:user:", settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAXSIZE)
+
+
+def invalidate_user(email: str):
+    user_cache.delete(email)
+
+
+def _user_emails(user: User) -> set:
+    # Current email plus the previous one if it is being changed
+    history = inspect(user).attrs.email.history
+    emails = {user.email} | set(history.deleted)
+    return {email for email in emails if email}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_row_changed(mapper, connection, user):
+    session = Session.object_session(user)
+    emails = _user_emails(user)
+    for email in emails:
+        invalidate_user(email)
+    # Invalidate again on commit, so a request that re-cached the old row
+    # between flush and commit does not keep it for a whole TTL
+    if session is not None:
+        session.info.setdefault("changed_user_emails", set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for email in session.info.pop("changed_user_emails", ()):
+        invalidate_user(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop("changed_user_emails", None)
+
+
+def token_claims(token: str, token_type: str = "access") -> dict:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    # Tokens issued before refresh tokens existed have no typ and are access tokens
+    if claims.get("typ", "access") != token_type or claims.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return claims
+
+
+def email_from_token(token: str) -> str:
+    return token_claims(token)["sub"]
+
+
+def user_from_claims(claims: dict) -> Optional[AuthenticatedUser]:
+    """The merchant an access token was issued to, None for tokens without the claims."""
+    if "mid" not in claims:
+        return None
+    return AuthenticatedUser(
+        id=claims["mid"],
+        email=claims["sub"],
+        company_name=claims["company"],
+        stripe_account_id=claims.get("stripe_account_id"),
+    )
 
-    user = db.query(User).filter(User.email == email).first()
+
+def cached_user(email: str) -> Optional[AuthenticatedUser]:
+    cached = user_cache.get(email)
+    return AuthenticatedUser(**cached) if cached is not None else None
+
+
+def cache_user(user: Optional[User]) -> AuthenticatedUser:
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
-    return user
+    current_user = AuthenticatedUser(
+        id=user.id,
+        email=user.email,
+        company_name=user.company_name,
+        stripe_account_id=user.stripe_account_id,
+    )
+    user_cache.set(user.email, asdict(current_user))
+    return current_user
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> AuthenticatedUser:
+    """
+    Straight from the token's claims: no cache or database round-trip.
+    The claims can lag behind the users row by up to
+    ACCESS_TOKEN_EXPIRE_MINUTES; routes that must see the current row use
+    get_current_user_fresh. Older tokens without claims go through the
+    user cache.
+    """
+    claims = token_claims(credentials.credentials)
+    return user_from_claims(claims) or _load_user(db, claims["sub"])
+
+
+def get_current_user_fresh(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> AuthenticatedUser:
+    """The users row as of now (through the user cache), e.g. right after Stripe Connect."""
+    return _load_user(db, email_from_token(credentials.credentials))
+
+
+def _load_user(db: Session, email: str) -> AuthenticatedUser:
+    current_user = cached_user(email)
+    if current_user is None:
+        current_user = cache_user(db.query(User).filter(User.email == email).first())
+    return current_user
@@ -0,0 +1,93 @@
+# app/api/imports.py
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.import_job import ImportJob
+from app.models.user import User
+from app.api.dependencies import get_current_user
+from app.schemas.import_job import ImportJobOut
+
+router = APIRouter(prefix="/imports", tags=["imports"])
+
+FORMATS_BY_EXTENSION = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+SPOOL_BUFFER_SIZE = 1024 * 1024
+
+
+def _job_out(job: ImportJob) -> ImportJobOut:
+    return ImportJobOut(
+        id=job.id,
+        kind=job.kind,
+        format=job.format,
+        filename=job.filename,
+        status=job.status,
+        progress=round(job.bytes_processed / job.bytes_total, 4) if job.bytes_total else 0.0,
+        rows_processed=job.rows_processed,
+        rows_imported=job.rows_imported,
+        rows_failed=job.rows_failed,
+        errors=json.loads(job.errors) if job.errors else [],
+        last_error=job.last_error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.post("/{kind}", response_model=ImportJobOut, status_code=202)
+def upload_import(
+    kind: Literal["invoices", "customers"],
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, enum=["csv", "ndjson"], description="Defaults to the file extension"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Uploads a CSV (with a header row) or NDJSON file of invoices
+    (InvoiceCreate fields) or customers (email, first_name, last_name,
+    phone). The file is spooled to IMPORT_DIR and the job queued; a
+    scheduler worker imports it (app/tasks/imports.py). Poll
+    GET /imports/{job_id} for progress and row errors.
+    Customers are upserted on (email, merchant): existing ones are updated.
+    """
+    file_format = format or FORMATS_BY_EXTENSION.get(os.path.splitext(file.filename or "")[1].lower())
+    if not file_format:
+        raise HTTPException(status_code=400, detail="Pass format=csv or format=ndjson (or upload a .csv/.ndjson file)")
+
+    # Copied in fixed-size blocks: never held in memory as a whole
+    with tempfile.NamedTemporaryFile(
+        dir=settings.IMPORT_DIR, prefix="import-", suffix=f".{file_format}", delete=False
+    ) as spool:
+        shutil.copyfileobj(file.file, spool, SPOOL_BUFFER_SIZE)
+
+    job = ImportJob(
+        merchant_id=current_user.id,
+        kind=kind,
+        format=file_format,
+        filename=file.filename,
+        file_path=spool.name,
+        bytes_total=os.path.getsize(spool.name),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return _job_out(job)
+
+
+@router.get("/{job_id}", response_model=ImportJobOut)
+def get_import(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    job = db.query(ImportJob).filter_by(id=job_id, merchant_id=current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return _job_out(job)
@@ -1,34 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.models.invoice import Invoice
 from app.models.customer import Customer
-from app.schemas.invoice import InvoiceCreate, InvoiceOut, RecurringAmountUpdate
+from app.schemas.invoice import (
+    BulkInvoiceResponse, InvoiceCreate, InvoiceOut, InvoiceRow, RecurringAmountUpdate
+)
 from app.models.user import User
 from app.api.dependencies import get_current_user
-import stripe
-import os
 from dotenv import load_dotenv
 from datetime import date
-from typing import List
-from app.utils.send_email import send_invoice_email
+from typing import List, Literal, Optional
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, estimate_count, parse_fields
+)
+from app.utils.aggregates import invoices_changed
+from app.utils.bulk import apply_recurrence_fields, prepare_bulk
+from app.core.config import settings
+from app.utils.checkout import payment_link
+from app.utils.export import EXPORT_BATCH_SIZE, MEDIA_TYPES, encode_rows, export_header
+from app.utils.send_email import enqueue_email
+from app.tasks.email_outbox import dispatch_email_outbox
 
 load_dotenv()
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
 router = APIRouter()
 
-def first_of_next_month(d: date) -> date:
-    if d.month == 12:
-        return date(d.year + 1, 1, 1)
-    return date(d.year, d.month + 1, 1)
+INVOICE_FIELDS = list(InvoiceOut.model_fields)
+FIELDS_DESCRIPTION = "Comma-separated InvoiceOut fields to return (id and issue_date are always included)"
+
+# OpenAPI for the paginated lists, which return projected rows as a plain JSONResponse
+INVOICE_PAGE_RESPONSES = {
+    200: {
+        "model": List[InvoiceRow],
+        "description": "One page of invoices, newest first, with the requested fields",
+        "headers": {
+            "X-Next-Cursor": {
+                "description": "Pass as `cursor` for the next page; absent on the last page",
+                "schema": {"type": "string"},
+            },
+            "X-Total-Count": {
+                "description": "Invoices matching the filter (a planner estimate on Postgres)",
+                "schema": {"type": "integer"},
+            },
+        },
+    },
+}
 
-def first_of_next_year(d: date) -> date:
-    return date(d.year + 1, 1, 1)
+# ─── Shared by the sync routes below and app/api/async_invoice.py ───────────
+
+def _new_invoice_email(db_invoice: Invoice, company_name: str):
+    subject = f"Your Invoice #{db_invoice.id} from {company_name}"
+    content = f"""
+    <html>
+    <body>
+        <p>Dear {db_invoice.customer_first_name},</p>
+        <p>You have a new invoice from {company_name}.</p>
+        <p>Amount: ${db_invoice.amount}</p>
+        <p>Issue Date: {db_invoice.issue_date}</p>
+        <p><a href="{db_invoice.payment_url}">Click here to pay your invoice</a></p>
+    </body>
+    </html>
+    """
+    return subject, content
+
+def _invoice_list_statement(merchant_id: int, status: Optional[str], fields: Optional[str]):
+    columns = parse_fields(fields, INVOICE_FIELDS, required=("id", "issue_date"))
+    statement = (
+        select(*[getattr(Invoice, column) for column in columns])
+        .where(Invoice.merchant_id == merchant_id)
+    )
+    if status:
+        statement = statement.where(Invoice.status == status)
+    return statement
+
+def _invoice_page_statement(statement, cursor: Optional[str], limit: int):
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor, date.fromisoformat, int)
+        statement = statement.where(tuple_(Invoice.issue_date, Invoice.id) < tuple_(cursor_date, cursor_id))
+    # One extra row tells us whether there is a next page
+    return statement.order_by(Invoice.issue_date.desc(), Invoice.id.desc()).limit(limit + 1)
+
+def _invoice_page_response(rows, limit: int, total: int) -> JSONResponse:
+    headers = {"X-Total-Count": str(total)}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].issue_date, rows[-1].id)
+    return JSONResponse(content=jsonable_encoder([row._asdict() for row in rows]), headers=headers)
+
+def _cancel(invoice: Invoice):
+    if invoice.status == "canceled":
+        raise HTTPException(status_code=400, detail="Invoice is already canceled.")
+
+    invoice.status = "canceled"
+    invoice.is_recurring = False
+
+    if invoice.is_recurring:
+        invoice.recurrence_start_date = None
+
+def _apply_status_transition(invoice: Invoice, new_status: str):
+    prev_status = invoice.status
+
+    if prev_status == "Due" and new_status == "Paid":
+        invoice.status = "Paid"
+    elif prev_status == "Paid" and new_status == "Due":
+        invoice.status = "Due"
+    elif prev_status == "canceled" and new_status == "Due":
+        invoice.status = "Due"
+        if invoice.frequency:
+            invoice.is_recurring = True
+    elif prev_status == "canceled" and new_status == "Paid":
+        invoice.status = "Paid"
+        if invoice.frequency:
+            invoice.is_recurring = True
+    elif new_status == "canceled":
+        invoice.status = "canceled"
+        invoice.is_recurring = False
+    else:
+        raise HTTPException(status_code=400, detail="Invalid status transition")
+
+def _export_statement(
+    merchant_id: int,
+    status: Optional[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+):
+    statement = (
+        select(*[getattr(Invoice, field) for field in INVOICE_FIELDS])
+        .where(Invoice.merchant_id == merchant_id)
+    )
+    if status:
+        statement = statement.where(Invoice.status == status)
+    if date_from:
+        statement = statement.where(Invoice.issue_date >= date_from)
+    if date_to:
+        statement = statement.where(Invoice.issue_date <= date_to)
+    return statement.order_by(Invoice.issue_date, Invoice.id)
+
+def _export_response(chunks, file_format: str) -> StreamingResponse:
+    filename = f"invoices-{date.today():%Y%m%d}.{file_format}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ─── Bulk creation (shared with app/api/async_invoice.py) ────────────────────
+# 1. validate, upsert customers, bulk-insert invoices with their pay links
+# 2. queue the emails → one commit. No Stripe calls: Checkout sessions are
+#    created when a customer opens the link (app/api/pay.py).
+
+def _check_bulk_size(invoices: list):
+    if not invoices:
+        raise HTTPException(status_code=422, detail="Send at least one invoice.")
+    if len(invoices) > settings.BULK_INVOICE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BULK_INVOICE_MAX_ITEMS} invoices per request."
+        )
+
+def _finish_bulk(db: Session, current_user, results: list, created: dict) -> BulkInvoiceResponse:
+    """Step 2. Does not commit."""
+    for index, db_invoice in created.items():
+        results[index].invoice = db_invoice
+        subject, content = _new_invoice_email(db_invoice, current_user.company_name)
+        enqueue_email(db, db_invoice.customer_email, subject, content)
+
+    return BulkInvoiceResponse(
+        created=len(created),
+        failed=len(results) - len(created),
+        results=results,
+    )
+
+# ─── Routes ───────────────────────────────────────────────────────────────────
 
 @router.post("/", response_model=InvoiceOut)
 def create_invoice(
     invoice: InvoiceCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -78,98 +230,109 @@ def create_invoice(
                 detail=f"Customer with email {payload['customer_email']} already has an active recurring invoice."
             )
 
-        if payload.get("recurring_amount") is None:
-            raise HTTPException(
-                status_code=422,
-                detail="If is_recurring is true, you must also provide recurring_amount."
-            )
-        today = date.today()
-        freq = payload.get("frequency", "").lower()
-        if freq == "monthly":
-            payload["recurrence_start_date"] = first_of_next_month(today)
-        elif freq == "yearly":
-            payload["recurrence_start_date"] = first_of_next_year(today)
-        else:
-            raise HTTPException(
-                status_code=422,
-                detail="If is_recurring is true, frequency must be 'monthly' or 'yearly'."
-            )
-    else:
-        payload["recurring_amount"] = None
-        payload["recurrence_start_date"] = None
-        payload["original_invoice_id"] = None
+    apply_recurrence_fields(payload)
 
     # Create the invoice object using the now-complete payload
     db_invoice = Invoice(**payload)
     db.add(db_invoice)
+    db.flush()  # assigns the id the pay link is derived from
+    # The Checkout session is only created when the customer opens the link
+    db_invoice.payment_url = payment_link(db_invoice.id)
+    invoices_changed(db, [db_invoice])
+
+    # --- Queue Email Notification (committed with the invoice) ---
+    subject, content = _new_invoice_email(db_invoice, current_user.company_name)
+    enqueue_email(db, db_invoice.customer_email, subject, content)
     db.commit()
     db.refresh(db_invoice)
 
-    # --- The rest of your Stripe and Email logic remains the same ---
-    result_page = os.getenv("PAYMENT_RESULT_URL") or "http://127.0.0.1:8000/app"
-    try:
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[{
-                "price_data": {
-                    "currency": "eur",
-                    "product_data": {
-                        "name": f"Invoice #{db_invoice.id} for {current_user.company_name}"
-                    },
-                    "unit_amount": int(db_invoice.amount * 100),
-                },
-                "quantity": 1,
-            }],
-            mode="payment",
-            success_url=f"{result_page}?status=success&session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{result_page}?status=cancel",
-            metadata={"invoice_id": str(db_invoice.id)},
-            payment_intent_data={
-                "transfer_data": {
-                    "destination": current_user.stripe_account_id
-                }
-            },
-        )
-    except stripe.error.StripeError as e:
-        db.delete(db_invoice)
-        db.commit()
-        raise HTTPException(status_code=500, detail=f"Stripe error: {e.user_message or str(e)}")
+    # Sent after the response goes out; the scheduler retries if this fails
+    background_tasks.add_task(dispatch_email_outbox)
+
+    return db_invoice
 
-    db_invoice.payment_url = session.url
+@router.post("/bulk", response_model=BulkInvoiceResponse)
+def create_invoices_bulk(
+    invoices: List[InvoiceCreate],
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Creates up to BULK_INVOICE_MAX_ITEMS invoices in one request. Customers
+    are upserted and invoices inserted in bulk, and emails are queued, all in
+    one transaction. Each item gets its own result; a failing item
+    (validation, duplicate recurring invoice) does not affect the others.
+    """
+    _check_bulk_size(invoices)
+    results, created = prepare_bulk(db, current_user, invoices)
+    response = _finish_bulk(db, current_user, results, created)
     db.commit()
-    db.refresh(db_invoice)
 
-    # --- Send Email Notification ---
-    subject = f"Your Invoice #{db_invoice.id} from {current_user.company_name}"
-    content = f"""
-    <html>
-    <body>
-        <p>Dear {db_invoice.customer_first_name},</p>
-        <p>You have a new invoice from {current_user.company_name}.</p>
-        <p>Amount: ${db_invoice.amount}</p>
-        <p>Issue Date: {db_invoice.issue_date}</p>
-        <p><a href="{db_invoice.payment_url}">Click here to pay your invoice</a></p>
-    </body>
-    </html>
+    background_tasks.add_task(dispatch_email_outbox)
+    return response
+
+@router.get("/export")
+def export_invoices(
+    current_user: User = Depends(get_current_user),
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[str] = Query(None, enum=["Paid", "Due", "canceled", "refunded"]),
+    date_from: Optional[date] = Query(None, description="First issue date to include"),
+    date_to: Optional[date] = Query(None, description="Last issue date to include"),
+    bom: bool = Query(False, description="Start the CSV with a UTF-8 BOM (for Excel)"),
+):
+    """
+    Streams the merchant's invoices (oldest first) as CSV or NDJSON.
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time, so
+    memory stays flat and the header is sent before the query runs.
     """
-    send_invoice_email(db_invoice.customer_email, subject, content)
+    statement = _export_statement(current_user.id, status, date_from, date_to)
+
+    def chunks():
+        yield export_header(INVOICE_FIELDS, format, bom)
+        # Own session: the request's one is closed before the body is streamed
+        db = SessionLocal()
+        try:
+            result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for rows in result.partitions():
+                yield encode_rows(rows, INVOICE_FIELDS, format)
+        finally:
+            db.close()
+
+    return _export_response(chunks(), format)
+
+def _paginated_invoices(
+    db: Session,
+    merchant_id: int,
+    status: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    fields: Optional[str],
+):
+    """
+    One page of a merchant's invoices, newest first, keyset-paginated on
+    (issue_date, id). Only the requested columns are selected and rows are
+    returned as plain JSON (no ORM objects or InvoiceOut validation).
+    Headers: X-Next-Cursor (absent on the last page) and X-Total-Count
+    (a planner estimate on Postgres).
+    """
+    statement = _invoice_list_statement(merchant_id, status, fields)
+    total = estimate_count(db, statement)
+    rows = db.execute(_invoice_page_statement(statement, cursor, limit)).all()
+    return _invoice_page_response(rows, limit, total)
 
-    return db_invoice
 
 # THIS IS THE KEY MODIFIED FUNCTION
-@router.get("/all", response_model=List[InvoiceOut])
+@router.get("/all", response_model=None, responses=INVOICE_PAGE_RESPONSES)
 def list_all_invoices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    status: str = Query(None, enum=["Paid", "Due", "canceled"])
+    status: str = Query(None, enum=["Paid", "Due", "canceled", "refunded"]),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    query = db.query(Invoice).filter(Invoice.merchant_id == current_user.id)
-
-    if status:
-        query = query.filter(Invoice.status == status)
-
-    all_invoices = query.order_by(Invoice.issue_date.desc()).all()
-    return all_invoices
+    return _paginated_invoices(db, current_user.id, status, cursor, limit, fields)
 
 
 @router.patch("/cancel/{invoice_id}", response_model=InvoiceOut)
@@ -183,15 +346,9 @@ def cancel_invoice(
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found or unauthorized.")
 
-    if invoice.status == "canceled":
-        raise HTTPException(status_code=400, detail="Invoice is already canceled.")
-
-    invoice.status = "canceled"
-    invoice.is_recurring = False
-
-    if invoice.is_recurring:
-        invoice.recurrence_start_date = None
+    _cancel(invoice)
 
+    invoices_changed(db, [invoice])
     db.commit()
     db.refresh(invoice)
 
@@ -221,41 +378,35 @@ def update_recurring_amount(
 
     return invoice
 
-@router.get("/due", response_model=List[InvoiceOut])
+@router.get("/due", response_model=None, responses=INVOICE_PAGE_RESPONSES)
 def list_due_invoices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    due_invoices = (
-        db.query(Invoice)
-        .filter_by(merchant_id=current_user.id, status="Due")
-        .all()
-    )
-    return due_invoices
+    return _paginated_invoices(db, current_user.id, "Due", cursor, limit, fields)
 
-@router.get("/paid", response_model=List[InvoiceOut])
+@router.get("/paid", response_model=None, responses=INVOICE_PAGE_RESPONSES)
 def list_paid_invoices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    paid_invoices = (
-        db.query(Invoice)
-        .filter_by(merchant_id=current_user.id, status="Paid")
-        .all()
-    )
-    return paid_invoices
+    return _paginated_invoices(db, current_user.id, "Paid", cursor, limit, fields)
 
-@router.get("/canceled", response_model=List[InvoiceOut])
+@router.get("/canceled", response_model=None, responses=INVOICE_PAGE_RESPONSES)
 def list_canceled_invoices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    canceled_invoices = (
-        db.query(Invoice)
-        .filter_by(merchant_id=current_user.id, status="canceled")
-        .all()
-    )
-    return canceled_invoices
+    return _paginated_invoices(db, current_user.id, "canceled", cursor, limit, fields)
 
 @router.patch("/{invoice_id}/status", response_model=InvoiceOut)
 def update_invoice_status(
@@ -272,29 +423,12 @@ def update_invoice_status(
     if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    prev_status = invoice.status
-
-    if prev_status == new_status:
+    if invoice.status == new_status:
         return invoice
 
-    if prev_status == "Due" and new_status == "Paid":
-        invoice.status = "Paid"
-    elif prev_status == "Paid" and new_status == "Due":
-        invoice.status = "Due"
-    elif prev_status == "canceled" and new_status == "Due":
-        invoice.status = "Due"
-        if invoice.frequency:
-            invoice.is_recurring = True
-    elif prev_status == "canceled" and new_status == "Paid":
-        invoice.status = "Paid"
-        if invoice.frequency:
-            invoice.is_recurring = True
-    elif new_status == "canceled":
-        invoice.status = "canceled"
-        invoice.is_recurring = False
-    else:
-        raise HTTPException(status_code=400, detail="Invalid status transition")
+    _apply_status_transition(invoice, new_status)
 
+    invoices_changed(db, [invoice])
     db.commit()
     db.refresh(invoice)
     return invoice
\ No newline at end of file
@@ -0,0 +1,49 @@
+# app/api/pay.py
+#
+# Public pay links (GET /pay/{token}). Invoice emails and payment_url point
+# here; the Stripe Checkout session is created on the first visit, reused
+# while it is valid and recreated once it has expired.
+
+import logging
+from fastapi import APIRouter, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.orm import Session, joinedload
+import stripe
+
+from app.db.database import get_db
+from app.models.invoice import Invoice
+from app.utils.checkout import checkout_url, invoice_id_from_token
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Payments"])
+
+@router.get("/pay/{token}", summary="Open an invoice's Stripe Checkout page")
+def pay_invoice(token: str, db: Session = Depends(get_db)):
+    invoice_id = invoice_id_from_token(token)
+    invoice = None
+    if invoice_id is not None:
+        invoice = (
+            db.query(Invoice)
+            .options(joinedload(Invoice.merchant))
+            .filter(Invoice.id == invoice_id)
+            .first()
+        )
+    if not invoice:
+        return HTMLResponse(content="<h2>❌ Invoice not found</h2>", status_code=404)
+
+    if invoice.status in ("Paid", "refunded"):
+        return HTMLResponse(content=f"<h2>✅ Invoice #{invoice.id} has already been paid.</h2>", status_code=200)
+    if invoice.status == "canceled":
+        return HTMLResponse(content=f"<h2>❌ Invoice #{invoice.id} was canceled.</h2>", status_code=410)
+    if not invoice.merchant or not invoice.merchant.stripe_account_id:
+        return HTMLResponse(content="<h2>⚠️ Online payment is not available for this invoice.</h2>", status_code=503)
+
+    try:
+        url = checkout_url(invoice, invoice.merchant)
+    except stripe.error.StripeError as e:
+        logger.error("Stripe error opening invoice %s: %s", invoice.id, e, extra={"invoice_id": invoice.id})
+        return HTMLResponse(content="<h2>❌ Payment page unavailable, please try again shortly.</h2>", status_code=502)
+    db.commit()
+
+    return RedirectResponse(url, status_code=303)
@@ -5,12 +5,16 @@ from fastapi.responses import HTMLResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 from urllib.parse import urlencode
-import requests
+import logging
+import stripe
 
 from app.core.config import settings
 from app.db.database import get_db
 from app.models.user import User
 from app.api.dependencies import get_current_user
+from app.utils.stripe_gateway import get_stripe_gateway
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Stripe Connect"])
 
@@ -41,8 +45,8 @@ def stripe_oauth_callback(
     error: str = Query(None),
     db: Session = Depends(get_db)
 ):
-    print("📥 Stripe callback HIT")
-    print(f"🔧 code={code}, state={state}, error={error}")
+    # The code is a credential until exchanged, so it is not logged
+    logger.info("Stripe OAuth callback for merchant %s", state, extra={"merchant_id": state, "error": error})
 
     if error:
         return HTMLResponse(
@@ -50,24 +54,16 @@ def stripe_oauth_callback(
             status_code=400
         )
 
-    data = {
-        "client_secret": settings.STRIPE_SECRET_KEY,
-        "code": code,
-        "grant_type": "authorization_code",
-    }
-
     try:
-        response = requests.post("https://connect.stripe.com/oauth/token", data=data)
-        response.raise_for_status()
-        stripe_data = response.json()
-        print(f"✅ Stripe token exchange success: {stripe_data}")
-    except requests.RequestException as e:
+        stripe_data = get_stripe_gateway().oauth_token(code)
+        logger.info("Stripe token exchange succeeded for account %s", stripe_data.stripe_user_id)
+    except stripe.error.StripeError as e:
         return HTMLResponse(
             content=f"<h2>❌ OAuth token exchange failed: {str(e)}</h2>",
             status_code=400
         )
 
-    stripe_user_id = stripe_data.get("stripe_user_id")
+    stripe_user_id = stripe_data.stripe_user_id
     if not stripe_user_id:
         return HTMLResponse(
             content="<h2>❌ Stripe user ID not returned</h2>",
@@ -1,38 +1,40 @@
 import os
 from dotenv import load_dotenv
-import stripe
 
 # ✅ Load .env file
 load_dotenv()
 
-# ✅ Check if env variable was loaded
-print("Loaded Stripe Key:", os.getenv("STRIPE_SECRET_KEY"))  # 👈 this must print the full key
+from app.core.config import settings
+from app.utils.stripe_gateway import get_stripe_gateway
 
-# ✅ Set the Stripe key
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# ✅ Real Stripe needs a test key; STRIPE_BACKEND=fake runs without one
+if settings.STRIPE_BACKEND != "fake" and (not settings.STRIPE_SECRET_KEY or "sk_test_" not in settings.STRIPE_SECRET_KEY):
+    raise Exception("❌ Stripe secret key is missing or invalid in .env (or set STRIPE_BACKEND=fake)")
 
-if not stripe.api_key or "sk_test_" not in stripe.api_key:
-    raise Exception("❌ Stripe secret key is missing or invalid in .env")
+print("Stripe backend:", settings.STRIPE_BACKEND)
 
 # ✅ Create a test Stripe checkout session
-session = stripe.checkout.Session.create(
-    payment_method_types=["card"],
-    mode="payment",
-    line_items=[{
-        "price_data": {
-            "currency": "usd",
-            "unit_amount": 1000,
-            "product_data": {
-                "name": "Test Invoice"
-            }
-        },
-        "quantity": 1,
-    }],
-    success_url="https://example.com/success",
-    cancel_url="https://example.com/cancel",
-    metadata={
-        "invoice_id": "9999"
-    }
+session = get_stripe_gateway().create_checkout_session(
+    {
+        "payment_method_types": ["card"],
+        "mode": "payment",
+        "line_items": [{
+            "price_data": {
+                "currency": "usd",
+                "unit_amount": 1000,
+                "product_data": {
+                    "name": "Test Invoice"
+                }
+            },
+            "quantity": 1,
+        }],
+        "success_url": "https://example.com/success",
+        "cancel_url": "https://example.com/cancel",
+        "metadata": {
+            "invoice_id": "9999"
+        }
+    },
+    idempotency_key=f"test-session-{os.getpid()}",
 )
 
 print("✅ Created session. URL:")
@@ -1,54 +1,205 @@
 # app/api/webhook.py
+#
+# Stripe webhooks are only verified and stored here (one INSERT, duplicates
+# ignored by the unique Stripe event id), so the response goes out right
+# away; app/tasks/webhook_events.py applies the stored events in batches
+# through apply_events(), and replay_webhook_events.py re-applies them.
 
+import logging
 from fastapi import APIRouter, Request, Depends
+from sqlalchemy import bindparam, or_, select, update
 from sqlalchemy.orm import Session
 from app.db.database import get_db
+from app.db.upsert import insert_for
 from app.models.invoice import Invoice
-import stripe
-import os
-from dotenv import load_dotenv
+from app.models.user import User
+from app.models.webhook_event import WebhookEvent
+from app.utils.aggregates import refresh_for_invoice_ids
+from app.utils.stripe_gateway import get_stripe_gateway
 
-load_dotenv()
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def store_event(db: Session, event: dict, payload: bytes) -> bool:
+    """
+    Queues a verified event for processing. Returns False when the event
+    was already stored (Stripe retries and duplicate deliveries).
+    Does not commit.
+    """
+    statement = insert_for(db)(WebhookEvent).values(
+        stripe_event_id=event["id"],
+        type=event["type"],
+        payload=payload.decode("utf-8"),
+    ).on_conflict_do_nothing(index_elements=[WebhookEvent.stripe_event_id])
+    return db.execute(statement).rowcount == 1
+
+# ─── Event handlers (run by the webhook worker) ─────────────────────────────
+# Handlers only record what an event changes; apply_events() then loads the
+# affected rows once, folds every change of the batch into them in delivery
+# order and writes each changed row with a single UPDATE. A recurring
+# invoice reuses its row for every billing period, so transitions only
+# apply to events of the current one: its Checkout session, the period in
+# the session's metadata, or its payment intent.
+
+EVENT_HANDLERS = {}
+
+def handles(event_type: str):
+    """Registers a handler(changes, data_object) for a Stripe event type."""
+    def decorator(handler):
+        EVENT_HANDLERS[event_type] = handler
+        return handler
+    return decorator
+
+# Invoice columns the handlers read and write
+INVOICE_STATE = [Invoice.status, Invoice.issue_date, Invoice.checkout_session_id, Invoice.checkout_url,
+                 Invoice.checkout_expires_at, Invoice.stripe_payment_intent_id,
+                 Invoice.payment_error, Invoice.amount_refunded]
+
+class _Changes:
+    def __init__(self):
+        self.invoices = []  # (invoice_id, payment_intent_id, transition), in delivery order
+        self.accounts = {}  # stripe account id -> {column: value}, last event wins
+
+    def invoice(self, obj: dict, transition, payment_intent_id: str = None):
+        # Our Checkout sessions and their payment intents carry the invoice id;
+        # otherwise the invoice is found by its payment intent
+        invoice_id = (obj.get("metadata") or {}).get("invoice_id")
+        if not invoice_id and not payment_intent_id:
+            logger.warning("%s %s: no invoice_id metadata or payment intent; cannot update", obj.get("object"), obj.get("id"))
+            return
+        self.invoices.append((int(invoice_id) if invoice_id else None, payment_intent_id, transition))
+
+def _other_period(invoice: dict, obj: dict) -> bool:
+    """Whether a session or payment intent was created for an earlier billing period of the invoice."""
+    period = (obj.get("metadata") or {}).get("period")
+    return period is not None and period != invoice["issue_date"].isoformat()
+
+@handles("checkout.session.completed")
+def _checkout_completed(changes: _Changes, session: dict):
+    # Sessions created before the period was added to the metadata are matched by id
+    dated = "period" in (session.get("metadata") or {})
+    def paid(invoice):
+        if _other_period(invoice, session) or (not dated and invoice["checkout_session_id"] != session["id"]):
+            logger.warning(
+                "Checkout session %s for invoice %s paid an earlier billing period; invoice left unchanged",
+                session["id"], invoice["id"],
+            )
+            return
+        if invoice["status"] != "refunded":
+            invoice["status"] = "Paid"
+        invoice["payment_error"] = None
+        invoice["stripe_payment_intent_id"] = session.get("payment_intent") or invoice["stripe_payment_intent_id"]
+    changes.invoice(session, paid)
+
+@handles("checkout.session.expired")
+def _checkout_expired(changes: _Changes, session: dict):
+    def expired(invoice):
+        # Drop the cached URL so the pay link creates a new session; the id
+        # stays, as the next session's idempotency key is derived from it
+        if invoice["checkout_session_id"] == session["id"]:
+            invoice["checkout_url"] = None
+            invoice["checkout_expires_at"] = None
+    changes.invoice(session, expired)
+
+@handles("payment_intent.payment_failed")
+def _payment_failed(changes: _Changes, intent: dict):
+    error = intent.get("last_payment_error") or {}
+    def failed(invoice):
+        if invoice["status"] == "Due" and not _other_period(invoice, intent):
+            invoice["payment_error"] = error.get("message") or error.get("code") or "Payment failed"
+            invoice["stripe_payment_intent_id"] = intent["id"]
+    changes.invoice(intent, failed, payment_intent_id=intent["id"])
+
+@handles("charge.refunded")
+def _charge_refunded(changes: _Changes, charge: dict):
+    def refunded(invoice):
+        # Only the payment of the current period; the intent is cleared when a recurring invoice rolls over
+        if invoice["stripe_payment_intent_id"] != charge.get("payment_intent"):
+            logger.warning(
+                "Refund of charge %s is not for invoice %s's current payment; invoice left unchanged",
+                charge.get("id"), invoice["id"],
+            )
+            return
+        invoice["amount_refunded"] = charge.get("amount_refunded", 0) / 100
+        if charge.get("refunded"):
+            invoice["status"] = "refunded"
+    changes.invoice(charge, refunded, payment_intent_id=charge.get("payment_intent"))
+
+@handles("account.updated")
+def _account_updated(changes: _Changes, account: dict):
+    changes.accounts[account["id"]] = {
+        "charges_enabled": bool(account.get("charges_enabled")),
+        "payouts_enabled": bool(account.get("payouts_enabled")),
+    }
+
+def _apply_invoice_changes(db: Session, entries: list):
+    invoice_ids = {invoice_id for invoice_id, _, _ in entries if invoice_id}
+    intent_ids = {intent_id for invoice_id, intent_id, _ in entries if intent_id and not invoice_id}
+    rows = db.execute(
+        select(Invoice.id, *INVOICE_STATE)
+        .where(or_(Invoice.id.in_(invoice_ids), Invoice.stripe_payment_intent_id.in_(intent_ids)))
+        .with_for_update()
+    ).all()
+    before = {row.id: dict(row._mapping) for row in rows}
+    after = {invoice_id: dict(values) for invoice_id, values in before.items()}
+    by_intent = {values["stripe_payment_intent_id"]: invoice_id for invoice_id, values in after.items()}
+
+    for invoice_id, intent_id, transition in entries:
+        invoice_id = invoice_id or by_intent.get(intent_id)
+        if invoice_id not in after:
+            logger.warning("Invoice %s wasn’t found in the DB", invoice_id or intent_id)
+            continue
+        transition(after[invoice_id])
+        by_intent[after[invoice_id]["stripe_payment_intent_id"]] = invoice_id
+
+    changed = [values for invoice_id, values in after.items() if values != before[invoice_id]]
+    if changed:
+        # Bulk UPDATE by primary key: one row each, sent as one executemany
+        db.execute(update(Invoice), changed)
+        refresh_for_invoice_ids(db, [values["id"] for values in changed])
+        logger.debug("Updated %d invoice(s) from Stripe events", len(changed))
+
+def _apply_account_changes(db: Session, accounts: dict):
+    if not accounts:
+        return
+    users = User.__table__
+    db.execute(
+        users.update()
+        .where(users.c.stripe_account_id == bindparam("account_id"))
+        .values(charges_enabled=bindparam("charges_enabled"), payouts_enabled=bindparam("payouts_enabled")),
+        [{"account_id": account_id, **values} for account_id, values in accounts.items()],
+    )
+
+def apply_events(db: Session, events: list):
+    """
+    Applies a batch of Stripe events (parsed payloads, in delivery order)
+    through EVENT_HANDLERS; unhandled types are skipped. Does not commit.
+    """
+    changes = _Changes()
+    for event in events:
+        handler = EVENT_HANDLERS.get(event["type"])
+        if handler:
+            handler(changes, event["data"]["object"])
+    _apply_invoice_changes(db, changes.invoices)
+    _apply_account_changes(db, changes.accounts)
+
+async def _raw_body(request: Request) -> bytes:
+    return await request.body()
+
 @router.post("/stripe-webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
-    payload = await request.body()
+def stripe_webhook(request: Request, payload: bytes = Depends(_raw_body), db: Session = Depends(get_db)):
+    # A plain def: the insert and commit run in the threadpool, not on the
+    # event loop. The raw body (needed for the signature) is read by the
+    # async dependency above.
     sig_header = request.headers.get("stripe-signature")
 
     try:
-        event = stripe.Webhook.construct_event(
-            payload=payload,
-            sig_header=sig_header,
-            secret=os.getenv("STRIPE_WEBHOOK_SECRET"),
-        )
+        event = get_stripe_gateway().verify_webhook(payload, sig_header)
     except Exception as e:
-        print("🔥 Webhook signature verification failed:", str(e))
+        logger.warning("Webhook signature verification failed: %s", e)
         return {"success": False, "error": str(e)}
 
-    # ─── Log the full event and its data ───────────────────────────────────
-    print("🔔 Received Stripe event:", event["type"])
-    print("🪪 Raw event data object:", event["data"]["object"])
-
-    if event["type"] == "checkout.session.completed":
-        session_obj = event["data"]["object"]
-        print("💡 session_obj.metadata in webhook:", session_obj.get("metadata"))
-
-        invoice_id = session_obj.get("metadata", {}).get("invoice_id")
-        if not invoice_id:
-            print("⚠️ Metadata missing invoice_id; cannot update.")
-        else:
-            invoice = db.query(Invoice).filter(Invoice.id == int(invoice_id)).first()
-            if not invoice:
-                print(f"⚠️ Invoice {invoice_id} wasn’t found in the DB")
-            else:
-                invoice.status = "Paid"
-                db.commit()
-                print(f"✅ Invoice {invoice_id} marked as Paid in DB")
-
-    else:
-        print(f"⏭️ Ignoring unhandled event type: {event['type']}")
-
-    return {"success": True}
+    stored = store_event(db, event, payload)
+    db.commit()
+    return {"success": True, "duplicate": not stored}
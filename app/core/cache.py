@@ -0,0 +1,107 @@
+# app/core/cache.py
+#
+# Small key/value caches with a time-to-live.
+# TTLCache lives in the process (LRU-bounded); RedisCache shares entries
+# between processes when REDIS_URL is set. Both store JSON-friendly values.
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+
+class TTLCache:
+    """Thread-safe in-process cache: entries expire after `ttl` seconds, least recently used evicted first."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Same interface as TTLCache, backed by Redis (or anything speaking its
+    protocol). Redis errors are logged and treated as a miss (get) or
+    skipped (set/delete/clear): the cache is never the source of truth.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: float):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Redis get failed for %s; treating it as a miss", self.prefix + key, exc_info=True)
+            return None
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=max(int(self.ttl), 1))
+        except redis.RedisError:
+            logger.warning("Redis set failed for %s", self.prefix + key, exc_info=True)
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Redis delete failed for %s", self.prefix + key, exc_info=True)
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError:
+            logger.warning("Redis clear failed for %s*", self.prefix, exc_info=True)
+
+
+def make_cache(prefix: str, ttl: float, maxsize: int):
+    """RedisCache when REDIS_URL is configured and redis is installed, TTLCache otherwise."""
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisCache(settings.REDIS_URL, prefix, ttl)
+        logger.warning("REDIS_URL is set but the redis package is not installed; using an in-process cache")
+    return TTLCache(ttl, maxsize)
@@ -14,5 +14,124 @@ class Settings:
     # 🔑 Alias to support both JWT_SECRET_KEY and SECRET_KEY usage
     SECRET_KEY = JWT_SECRET_KEY
     ALGORITHM = "HS256"
+    # Access tokens carry the merchant's id and claims, so they are trusted
+    # without a users lookup until they expire; clients renew them with the
+    # (single-use) refresh token at POST /auth/refresh
+    ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+    REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+    # ─── Database pools ───────────────────────────────────────────────────────
+    # Per process: API requests use DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Scheduled jobs get a separate pool (leader lock + tick + recurrence worker + email dispatcher)
+    SCHEDULER_DB_POOL_SIZE = int(os.getenv("SCHEDULER_DB_POOL_SIZE", "4"))
+    SCHEDULER_DB_MAX_OVERFLOW = int(os.getenv("SCHEDULER_DB_MAX_OVERFLOW", "2"))
+    # Seconds to wait for a free connection before failing the checkout
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Test connections before use / replace them after this many seconds (-1 disables)
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Postgres statement_timeout for every connection, in milliseconds (0 = no limit)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+    # Serve the invoice, customer, auth and webhook routes with async endpoints
+    # on an asyncpg AsyncSession instead of sync endpoints on the threadpool
+    ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
+
+    # ─── Recurrence engine ────────────────────────────────────────────────────
+    # Due invoices are streamed in chunks of this size (one commit per chunk)
+    RECURRENCE_CHUNK_SIZE = int(os.getenv("RECURRENCE_CHUNK_SIZE", "500"))
+    # A failed run is retried with exponential backoff, then marked failed
+    RECURRENCE_MAX_ATTEMPTS = int(os.getenv("RECURRENCE_MAX_ATTEMPTS", "5"))
+    RECURRENCE_RETRY_BASE_SECONDS = int(os.getenv("RECURRENCE_RETRY_BASE_SECONDS", "60"))
+    # A claimed chunk is handed to another worker if not finished within this lease
+    RECURRENCE_LEASE_SECONDS = int(os.getenv("RECURRENCE_LEASE_SECONDS", "900"))
+    # How often every worker looks for unfinished runs to help with
+    RECURRENCE_POLL_SECONDS = int(os.getenv("RECURRENCE_POLL_SECONDS", "60"))
+    # Also run the scheduler inside the API process (set to false when app/worker.py is deployed)
+    RUN_SCHEDULER_IN_WEB = os.getenv("RUN_SCHEDULER_IN_WEB", "true").lower() == "true"
+
+    # ─── Stripe ───────────────────────────────────────────────────────────────
+    # Per process (app/utils/stripe_gateway.py): requests in flight, and requests
+    # per second (Stripe allows 100/s live and 25/s in test mode per account,
+    # so divide by the number of processes)
+    STRIPE_CONCURRENCY = int(os.getenv("STRIPE_CONCURRENCY", "16"))
+    STRIPE_RATE_LIMIT = float(os.getenv("STRIPE_RATE_LIMIT", "20"))
+    # Rate-limited (429) and connection-failed requests are retried with backoff
+    STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "4"))
+    STRIPE_RETRY_BASE_SECONDS = float(os.getenv("STRIPE_RETRY_BASE_SECONDS", "0.5"))
+    STRIPE_TIMEOUT_SECONDS = int(os.getenv("STRIPE_TIMEOUT_SECONDS", "30"))
+    # "stripe" or "fake" (in-process stand-in for load tests, no network)
+    STRIPE_BACKEND = os.getenv("STRIPE_BACKEND", "stripe").lower()
+    # Fake backend: mean latency per call and share of calls failing (429 / connection error)
+    FAKE_STRIPE_LATENCY_MS = int(os.getenv("FAKE_STRIPE_LATENCY_MS", "0"))
+    FAKE_STRIPE_ERROR_RATE = float(os.getenv("FAKE_STRIPE_ERROR_RATE", "0"))
+    BULK_INVOICE_MAX_ITEMS = int(os.getenv("BULK_INVOICE_MAX_ITEMS", "5000"))
+    # Where customers open invoices (GET /pay/...); emailed and returned as payment_url
+    PUBLIC_BASE_URL = (os.getenv("PUBLIC_BASE_URL") or os.getenv("DOMAIN") or "http://127.0.0.1:8000").rstrip("/")
+    # Stripe's page after checkout (success / cancel)
+    PAYMENT_RESULT_URL = os.getenv("PAYMENT_RESULT_URL") or "http://127.0.0.1:8000/app"
+    # A cached Checkout session is reused only if it stays open at least this long
+    CHECKOUT_MIN_REMAINING_SECONDS = int(os.getenv("CHECKOUT_MIN_REMAINING_SECONDS", "1800"))
+
+    # ─── Stripe webhooks ──────────────────────────────────────────────────────
+    # Stored events are applied in batches of this size (one commit per batch)
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+    WEBHOOK_PROCESS_SECONDS = int(os.getenv("WEBHOOK_PROCESS_SECONDS", "5"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+
+    # ─── CSV / NDJSON import ───────────────────────────────────────────────────
+    # Uploads are spooled here until processed (defaults to the system temp dir);
+    # must be shared by the API and the workers that run the imports
+    IMPORT_DIR = os.getenv("IMPORT_DIR") or None
+    # Rows validated and written per transaction
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+    # How often every worker looks for queued imports
+    IMPORT_POLL_SECONDS = int(os.getenv("IMPORT_POLL_SECONDS", "5"))
+    # A running import whose worker has not committed a chunk for this long is resumed by another
+    IMPORT_LEASE_SECONDS = int(os.getenv("IMPORT_LEASE_SECONDS", "600"))
+
+    # ─── Outbound email ───────────────────────────────────────────────────────
+    # "sendgrid" or "fake" (in-memory, no network)
+    EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "sendgrid").lower()
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "1000"))
+    EMAIL_DISPATCH_SECONDS = int(os.getenv("EMAIL_DISPATCH_SECONDS", "10"))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+    # Fake backend: mean latency per batch and share of batches failing
+    FAKE_EMAIL_LATENCY_MS = int(os.getenv("FAKE_EMAIL_LATENCY_MS", "0"))
+    FAKE_EMAIL_ERROR_RATE = float(os.getenv("FAKE_EMAIL_ERROR_RATE", "0"))
+
+    # ─── Logging ──────────────────────────────────────────────────────────────
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Per-module overrides: "app.tasks.recurrence=DEBUG,apscheduler=WARNING"
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "apscheduler=WARNING,httpx=WARNING")
+    # "json" (one object per line) or "text" for local runs
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+    # Records waiting for the writer thread; beyond this they are dropped
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Share of payload dumps (raw webhook bodies) that are actually logged
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+    # ─── Caching ──────────────────────────────────────────────────────────────
+    # Shared cache for all API processes (optional; in-process cache otherwise)
+    REDIS_URL = os.getenv("REDIS_URL")
+    # How long an authenticated user is trusted without going back to the database
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+
+    # ─── Passwords and login ──────────────────────────────────────────────────
+    # bcrypt cost; existing hashes with another cost are re-hashed on login
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Processes verifying passwords, per API process (0 = in the request thread)
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    # Verifications allowed to wait per API process; more get a 503
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+    # Failed logins allowed per email / per client IP before logins are refused
+    # (checked before any hashing); the count expires this long after the last failure
+    LOGIN_MAX_FAILURES_PER_EMAIL = int(os.getenv("LOGIN_MAX_FAILURES_PER_EMAIL", "5"))
+    LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+    LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "900"))
 
 settings = Settings()
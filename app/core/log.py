@@ -0,0 +1,128 @@
+# app/core/log.py
+#
+# Structured logging for the API and workers. Records are formatted as one
+# JSON object per line, but not on the caller's thread: loggers hand them
+# to a bounded queue (QueueHandler) and a background QueueListener writes
+# them to stdout, so a slow terminal or log shipper never adds latency to
+# a request. When the queue is full, records are dropped and counted
+# (log_records_dropped_total on GET /metrics) rather than blocking.
+#
+#   logger = logging.getLogger(__name__)
+#   logger.info("Applied %d Stripe event(s)", len(batch), extra={"batch_size": len(batch)})
+#
+# Levels are per module (LOG_LEVELS="app.tasks.recurrence=DEBUG,apscheduler=WARNING").
+# Records carrying a `payload` extra (raw webhook bodies and the like) are
+# only kept for a LOG_PAYLOAD_SAMPLE_RATE share of calls.
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped",
+    "Log records discarded because the log queue was full",
+)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class PayloadSampler(logging.Filter):
+    """Keeps records with a `payload` extra only `rate` of the time; others always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not hasattr(record, "payload") or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the logging thread: a full queue drops the record."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now (args may change later), but
+        # leave the formatting itself to the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def _parse_levels(spec: str) -> dict:
+    # "app.tasks=DEBUG, sqlalchemy.engine=WARNING" → {"app.tasks": "DEBUG", ...}
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """
+    Routes the root logger through the queue and starts the writer thread.
+    Called once per process (app/main.py, app/worker.py); later calls only
+    re-apply the levels.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    for name, level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s: %(message)s"
+    ))
+
+    handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(PayloadSampler(settings.LOG_PAYLOAD_SAMPLE_RATE))
+    root.handlers = [handler]
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued on a normal exit
+    atexit.register(_listener.stop)
@@ -0,0 +1,35 @@
+# app/core/login_throttle.py
+#
+# Failed-login counters per email and per client IP, kept in the shared
+# cache (Redis when REDIS_URL is set, so all API processes see the same
+# counts). Logins are refused once either limit is reached, before the
+# user is loaded or any password is hashed; a count expires
+# LOGIN_FAILURE_WINDOW_SECONDS after its last failure.
+
+from app.core.cache import make_cache
+from app.core.config import settings
+
+_failures = make_cache("auth:login-failures:", settings.LOGIN_FAILURE_WINDOW_SECONDS, settings.AUTH_CACHE_MAXSIZE)
+
+
+def _keys(email: str, ip: str) -> dict:
+    return {
+        f"email:{email.strip().lower()}": settings.LOGIN_MAX_FAILURES_PER_EMAIL,
+        f"ip:{ip}": settings.LOGIN_MAX_FAILURES_PER_IP,
+    }
+
+
+def login_blocked(email: str, ip: str) -> bool:
+    return any((_failures.get(key) or 0) >= limit for key, limit in _keys(email, ip).items())
+
+
+def record_login_failure(email: str, ip: str):
+    # get + set is not atomic; a few concurrent failures may count as one,
+    # which only delays the block slightly
+    for key in _keys(email, ip):
+        _failures.set(key, (_failures.get(key) or 0) + 1)
+
+
+def clear_login_failures(email: str):
+    """After a successful login; the IP's count is kept (one IP, many accounts)."""
+    _failures.delete(f"email:{email.strip().lower()}")
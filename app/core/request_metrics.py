@@ -0,0 +1,148 @@
+# app/core/request_metrics.py
+#
+# Per-request performance breakdown. RequestMetricsMiddleware times every
+# HTTP request and, through a context variable, adds up the database time
+# (cursor events, see app/db/pool.py) and upstream time (Stripe gateway,
+# email sender) spent on its behalf. Everything is labelled with the route
+# template, so GET /metrics shows which endpoints are DB-bound and which
+# wait on Stripe or SendGrid:
+#
+#   rate(http_request_db_seconds_sum[5m]) / rate(http_request_duration_seconds_sum[5m])
+#
+# Work outside a request (scheduler, app/worker.py) is still counted in the
+# process-wide db_query_seconds and upstream_call_seconds histograms.
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.metrics import Counter, Histogram
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of the response",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries executed per request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time per request spent executing database queries",
+    ["method", "route"],
+)
+HTTP_REQUEST_UPSTREAM_SECONDS = Counter(
+    "http_request_upstream_seconds",
+    "Time spent in upstream calls (stripe, sendgrid) during requests, including rate-limit waits and retries",
+    ["method", "route", "service"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Time per database query (cursor execute), requests and background jobs",
+    ["pool"],
+)
+UPSTREAM_CALL_SECONDS = Histogram(
+    "upstream_call_seconds",
+    "Time per upstream call, requests and background jobs",
+    ["service", "operation", "outcome"],
+)
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds", "upstream")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.upstream = {}
+
+
+# Set by the middleware; a mutable object, so work done in the threadpool
+# (sync endpoints see a copy of the context) is still added to the request
+_current = ContextVar("request_stats", default=None)
+
+
+def record_query(seconds: float, pool: str):
+    DB_QUERY_SECONDS.observe(seconds, pool=pool)
+    stats = _current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+@contextmanager
+def upstream_call(service: str, operation: str):
+    """Times the block as a call to `service` (and to the current request, if any)."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_CALL_SECONDS.observe(elapsed, service=service, operation=operation, outcome=outcome)
+        stats = _current.get()
+        if stats is not None:
+            stats.upstream[service] = stats.upstream.get(service, 0.0) + elapsed
+
+
+def _route_label(scope) -> str:
+    # The route template (/invoices/{invoice_id}), never the raw path, to keep
+    # the number of series bounded. Newer FastAPI versions keep included
+    # routers nested, so scope["route"].path lacks the prefix; the full
+    # template is on the effective route context then.
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(context, "path", None) or getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware, so streaming responses are
+    not buffered). The request is observed when the last body chunk has
+    been sent, so background tasks that run afterwards are not counted.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        observed = False
+
+        def observe():
+            nonlocal observed
+            observed = True
+            method, route = scope["method"], _route_label(scope)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route, status=status)
+            HTTP_REQUEST_DB_QUERIES.observe(stats.db_queries, method=method, route=route)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
+            for service, seconds in stats.upstream.items():
+                HTTP_REQUEST_UPSTREAM_SECONDS.inc(seconds, method=method, route=route, service=service)
+
+        async def send_and_observe(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body") and not observed:
+                observe()
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            # Unhandled errors (the 500 is sent further out) and disconnects
+            if not observed:
+                observe()
+            _current.reset(token)
@@ -1,9 +1,84 @@
+# app/core/security.py
+#
+# Password hashing. bcrypt is deliberately slow (~250ms of CPU per verify at
+# the default cost), so logins verify in a small process pool instead of on
+# a request thread: a burst of logins then queues for PASSWORD_HASH_WORKERS
+# cores instead of starving every other request in the worker. At most
+# PASSWORD_HASH_QUEUE verifications wait per process; beyond that callers
+# get PasswordHasherBusy right away (the login returns 503).
+#
+# The cost is BCRYPT_ROUNDS; hashes made with another cost are re-hashed
+# on the next successful login (verify_and_update returns the new hash).
+
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import settings
+
+# min == max: any other cost (higher or lower) is flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+_slots = threading.BoundedSemaphore(max(settings.PASSWORD_HASH_QUEUE, 1))
+
+
+class PasswordHasherBusy(Exception):
+    """Too many verifications already waiting in this process."""
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple:
+    # Runs in a pool process: (valid, new hash or None)
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+@lru_cache(maxsize=1)
+def _hash_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the API process has threads (scheduler, log writer)
+    return ProcessPoolExecutor(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def submit_verify_and_update(plain_password: str, hashed_password: str) -> Future:
+    """
+    Verifies in the hash pool (inline when PASSWORD_HASH_WORKERS is 0).
+    The future resolves to (valid, new hash or None); raises
+    PasswordHasherBusy instead of queueing when the pool is backed up.
+    """
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(_verify_and_update(plain_password, hashed_password))
+        except Exception as ex:
+            future.set_exception(ex)
+        finally:
+            _slots.release()
+        return future
+
+    try:
+        future = _hash_pool().submit(_verify_and_update, plain_password, hashed_password)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
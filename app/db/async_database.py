@@ -0,0 +1,44 @@
+# app/db/async_database.py
+#
+# AsyncSession on asyncpg, used by the app/api/async_*.py routers when
+# ASYNC_DB is enabled. Only imported in that case, so the sync deployment
+# does not need asyncpg installed. Models and Base come from database.py.
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.database import DATABASE_URL
+from app.db.pool import engine_options, track_pool
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Same database as DATABASE_URL, through the dialect's async driver."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+
+# Replaces the "web" pool for the async routers, so it gets the same limits
+async_engine = track_pool(create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(ASYNC_DATABASE_URL, "async", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+))
+
+# expire_on_commit=False: attributes stay readable after commit without
+# an implicit (and, in async code, forbidden) lazy reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Dependency for the async FastAPI endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
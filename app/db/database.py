@@ -4,14 +4,30 @@ from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
+from app.core.config import settings
+from app.db.pool import engine_options, track_pool
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# API requests
+engine = track_pool(create_engine(
+    DATABASE_URL,
+    **engine_options(DATABASE_URL, "web", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Scheduled jobs (recurrence runs, email outbox, leader locks) get their own
+# pool, so a billing run can never take the connections API requests need
+scheduler_engine = track_pool(create_engine(
+    DATABASE_URL,
+    **engine_options(DATABASE_URL, "scheduler", settings.SCHEDULER_DB_POOL_SIZE, settings.SCHEDULER_DB_MAX_OVERFLOW),
+))
+
+SchedulerSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=scheduler_engine)
+
 Base = declarative_base()
 
 # Dependency for FastAPI endpoints
@@ -20,4 +36,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
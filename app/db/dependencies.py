@@ -1,11 +0,0 @@
-# app/db/dependencies.py
-
-from app.db.database import SessionLocal
-from typing import Generator
-
-def get_db() -> Generator:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
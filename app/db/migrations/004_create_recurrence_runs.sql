@@ -0,0 +1,32 @@
+-- 004_create_recurrence_runs.sql
+
+-- 1) One row per recurrence run (resumable ledger)
+CREATE TABLE IF NOT EXISTS recurrence_runs (
+  id              SERIAL PRIMARY KEY,
+  run_date        DATE      NOT NULL UNIQUE,
+  status          VARCHAR   NOT NULL DEFAULT 'running',
+  planned         BOOLEAN   NOT NULL DEFAULT FALSE,
+  invoices_total  INTEGER   NOT NULL DEFAULT 0,
+  invoices_done   INTEGER   NOT NULL DEFAULT 0,
+  attempts        INTEGER   NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMP WITHOUT TIME ZONE NULL,
+  last_error      TEXT      NULL,
+  started_at      TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  finished_at     TIMESTAMP WITHOUT TIME ZONE NULL
+);
+
+-- 2) Per-invoice progress inside a run
+CREATE TABLE IF NOT EXISTS recurrence_run_items (
+  id          SERIAL PRIMARY KEY,
+  run_id      INTEGER NOT NULL
+    REFERENCES recurrence_runs(id)
+    ON DELETE CASCADE,
+  invoice_id  INTEGER NOT NULL
+    REFERENCES invoices(id)
+    ON DELETE CASCADE,
+  status      VARCHAR NOT NULL DEFAULT 'pending',
+  payment_url VARCHAR NULL,
+  emailed_at  TIMESTAMP WITHOUT TIME ZONE NULL,
+  updated_at  TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  CONSTRAINT _recurrence_run_invoice_uc UNIQUE (run_id, invoice_id)
+);
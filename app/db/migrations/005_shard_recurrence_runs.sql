@@ -0,0 +1,9 @@
+-- 005_shard_recurrence_runs.sql
+
+-- Items are leased by workers, so several of them can share a run
+ALTER TABLE recurrence_run_items
+  ADD COLUMN IF NOT EXISTS claimed_by VARCHAR NULL,
+  ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITHOUT TIME ZONE NULL;
+
+CREATE INDEX IF NOT EXISTS ix_recurrence_run_items_claim
+  ON recurrence_run_items (run_id, status, invoice_id);
@@ -0,0 +1,16 @@
+-- 006_create_email_outbox.sql
+CREATE TABLE IF NOT EXISTS email_outbox (
+  id              SERIAL PRIMARY KEY,
+  to_email        VARCHAR   NOT NULL,
+  subject         VARCHAR   NOT NULL,
+  html_content    TEXT      NOT NULL,
+  status          VARCHAR   NOT NULL DEFAULT 'pending',
+  attempts        INTEGER   NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  last_error      TEXT      NULL,
+  created_at      TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  sent_at         TIMESTAMP WITHOUT TIME ZONE NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_email_outbox_pending
+  ON email_outbox (status, next_attempt_at);
@@ -0,0 +1,22 @@
+-- 007_add_invoice_indexes.sql
+-- CONCURRENTLY avoids locking writes on a live table; run outside a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_merchant_issue
+  ON invoices (merchant_id, issue_date DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_merchant_status_issue
+  ON invoices (merchant_id, status, issue_date DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_merchant_customer
+  ON invoices (merchant_id, customer_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_active_customer
+  ON invoices (customer_id, merchant_id)
+  WHERE status = 'Due' OR is_recurring = true;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_invoices_recurring_due
+  ON invoices (last_generated_on, recurrence_start_date)
+  WHERE is_recurring = true;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_merchant
+  ON customers (merchant_id, id);
@@ -0,0 +1,18 @@
+-- 008_create_customer_summaries.sql
+-- Backfill after applying: python rebuild_aggregates.py
+CREATE TABLE IF NOT EXISTS customer_summaries (
+  customer_id          INTEGER PRIMARY KEY
+    REFERENCES customers(id)
+    ON DELETE CASCADE,
+  merchant_id          INTEGER NOT NULL
+    REFERENCES users(id)
+    ON DELETE CASCADE,
+  active_invoice_count INTEGER          NOT NULL DEFAULT 0,
+  due_total            DOUBLE PRECISION NOT NULL DEFAULT 0,
+  paid_total           DOUBLE PRECISION NOT NULL DEFAULT 0,
+  last_invoice_date    DATE             NULL,
+  updated_at           TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_customer_summaries_merchant_id
+  ON customer_summaries (merchant_id);
@@ -0,0 +1,16 @@
+-- 009_create_merchant_daily_rollups.sql
+-- Backfill after applying: python rebuild_aggregates.py
+CREATE TABLE IF NOT EXISTS merchant_daily_rollups (
+  merchant_id    INTEGER NOT NULL
+    REFERENCES users(id)
+    ON DELETE CASCADE,
+  day            DATE    NOT NULL,
+  due_count      INTEGER          NOT NULL DEFAULT 0,
+  due_total      DOUBLE PRECISION NOT NULL DEFAULT 0,
+  paid_count     INTEGER          NOT NULL DEFAULT 0,
+  paid_total     DOUBLE PRECISION NOT NULL DEFAULT 0,
+  canceled_count INTEGER          NOT NULL DEFAULT 0,
+  recurring_mrr  DOUBLE PRECISION NOT NULL DEFAULT 0,
+  updated_at     TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (merchant_id, day)
+);
@@ -0,0 +1,31 @@
+-- 010_create_import_jobs.sql
+CREATE TABLE IF NOT EXISTS import_jobs (
+  id              SERIAL PRIMARY KEY,
+  merchant_id     INTEGER   NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  kind            VARCHAR   NOT NULL,
+  format          VARCHAR   NOT NULL,
+  filename        VARCHAR   NULL,
+  file_path       VARCHAR   NULL,
+  status          VARCHAR   NOT NULL DEFAULT 'queued',
+  bytes_total     BIGINT    NOT NULL DEFAULT 0,
+  bytes_processed BIGINT    NOT NULL DEFAULT 0,
+  rows_processed  INTEGER   NOT NULL DEFAULT 0,
+  rows_imported   INTEGER   NOT NULL DEFAULT 0,
+  rows_failed     INTEGER   NOT NULL DEFAULT 0,
+  errors          TEXT      NULL,
+  last_error      TEXT      NULL,
+  created_at      TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  started_at      TIMESTAMP WITHOUT TIME ZONE NULL,
+  finished_at     TIMESTAMP WITHOUT TIME ZONE NULL,
+  -- Worker that claimed the job; claimed_at is its lease, renewed with
+  -- every chunk, so a job whose worker died is resumed by another one
+  claimed_by      VARCHAR   NULL,
+  claimed_at      TIMESTAMP WITHOUT TIME ZONE NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_import_jobs_merchant
+  ON import_jobs (merchant_id, id);
+
+CREATE INDEX IF NOT EXISTS ix_import_jobs_open
+  ON import_jobs (id)
+  WHERE status IN ('queued', 'running');
@@ -0,0 +1,15 @@
+-- 011_create_webhook_events.sql
+CREATE TABLE IF NOT EXISTS webhook_events (
+  id              SERIAL PRIMARY KEY,
+  stripe_event_id VARCHAR   NOT NULL UNIQUE,
+  type            VARCHAR   NOT NULL,
+  payload         TEXT      NOT NULL,
+  status          VARCHAR   NOT NULL DEFAULT 'pending',
+  attempts        INTEGER   NOT NULL DEFAULT 0,
+  last_error      TEXT      NULL,
+  received_at     TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  processed_at    TIMESTAMP WITHOUT TIME ZONE NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_webhook_events_pending
+  ON webhook_events (status, id);
@@ -0,0 +1,13 @@
+-- 012_add_payment_event_fields.sql
+-- State written by the Stripe webhook handlers (app/api/webhook.py)
+ALTER TABLE invoices
+  ADD COLUMN IF NOT EXISTS stripe_payment_intent_id VARCHAR,
+  ADD COLUMN IF NOT EXISTS payment_error TEXT,
+  ADD COLUMN IF NOT EXISTS amount_refunded DOUBLE PRECISION;
+
+CREATE INDEX IF NOT EXISTS ix_invoices_payment_intent
+  ON invoices (stripe_payment_intent_id);
+
+ALTER TABLE users
+  ADD COLUMN IF NOT EXISTS charges_enabled BOOLEAN,
+  ADD COLUMN IF NOT EXISTS payouts_enabled BOOLEAN;
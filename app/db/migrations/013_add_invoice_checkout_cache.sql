@@ -0,0 +1,7 @@
+-- 013_add_invoice_checkout_cache.sql
+-- Checkout sessions are created when the customer opens GET /pay/{token}
+-- and cached here until they expire (app/utils/checkout.py)
+ALTER TABLE invoices
+  ADD COLUMN IF NOT EXISTS checkout_session_id VARCHAR,
+  ADD COLUMN IF NOT EXISTS checkout_url VARCHAR,
+  ADD COLUMN IF NOT EXISTS checkout_expires_at TIMESTAMP WITHOUT TIME ZONE;
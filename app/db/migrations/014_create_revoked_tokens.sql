@@ -0,0 +1,11 @@
+-- 014_create_revoked_tokens.sql
+-- Used and logged-out refresh tokens, kept until they expire (app/api/auth.py)
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  jti        VARCHAR PRIMARY KEY,
+  user_id    INTEGER   NOT NULL,
+  expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+  revoked_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at
+  ON revoked_tokens (expires_at);
@@ -0,0 +1,116 @@
+# app/db/pool.py
+#
+# Engine options from Settings (pool size, overflow, pre-ping, recycle,
+# statement timeout) and pool telemetry. Every engine gets a named pool
+# ("web", "scheduler", "async"); checkout wait time, timeouts and
+# saturation are exported per pool on GET /metrics, and every query is
+# timed (see app/core/request_metrics.py).
+
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.core.request_metrics import record_query
+
+_engines = {}
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for (or opening) a pooled connection",
+    ["pool"],
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ["pool"],
+)
+
+
+def _pool_stats(stat):
+    return lambda: {(name,): stat(engine.pool) for name, engine in _engines.items()}
+
+
+Gauge("db_pool_size", "Connections kept open by the pool", ["pool"], _pool_stats(lambda p: p.size()))
+Gauge("db_pool_max_connections", "Pool size plus max overflow", ["pool"], _pool_stats(lambda p: p.size() + p._max_overflow))
+Gauge("db_pool_checked_out", "Connections currently in use", ["pool"], _pool_stats(lambda p: p.checkedout()))
+Gauge(
+    "db_pool_saturation",
+    "Connections in use / max connections (1.0 means new checkouts wait)",
+    ["pool"],
+    _pool_stats(lambda p: p.checkedout() / max(p.size() + p._max_overflow, 1)),
+)
+
+
+class _TimedCheckout:
+    """Mixin timing how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(pool=self._orig_logging_name)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self._orig_logging_name)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, name: str, pool_size: int, max_overflow: int) -> dict:
+    """
+    Keyword arguments for create_engine()/create_async_engine() for the
+    pool called `name`. The statement timeout is set per connection on
+    Postgres (psycopg2 or asyncpg); other databases ignore it.
+    """
+    url = make_url(url)
+    is_async = url.drivername.endswith(("+asyncpg", "+aiosqlite"))
+    options = dict(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_logging_name=name,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if url.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if url.drivername.endswith("+asyncpg"):
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _time_queries(engine, name: str):
+    # Async engines fire cursor events on their sync_engine
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        record_query(time.perf_counter() - conn.info.pop("query_started"), name)
+
+
+def track_pool(engine):
+    """
+    Registers the engine's pool for the db_pool_* gauges (read at scrape
+    time, so dispose() is fine) and times its queries.
+    """
+    name = engine.pool._orig_logging_name
+    _engines[name] = engine
+    _time_queries(engine, name)
+    return engine
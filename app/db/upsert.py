@@ -0,0 +1,15 @@
+# app/db/upsert.py
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session):
+    """
+    Returns the dialect's insert() construct, which supports
+    on_conflict_do_update / on_conflict_do_nothing (Postgres in production,
+    SQLite for local runs and benchmarks).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
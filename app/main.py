@@ -3,20 +3,39 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
+
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api import auth, invoice, webhook, stripe_connect
 from app.api.webhook import router as webhook_router
+from app.core.config import settings
+from app.core.log import setup_logging
+from app.core.metrics import render_metrics
+from app.core.request_metrics import RequestMetricsMiddleware
 from app.db.database import Base, engine
-from app.tasks.recurrence import start_scheduler
+from app.scheduler import start_scheduler
 from app.api.customer import router as customer_router
+from app.api.analytics import router as analytics_router
+from app.api.imports import router as imports_router
+from app.api.pay import router as pay_router
+
+# ─── Async database path (same routes, see settings.ASYNC_DB) ────────────────
+if settings.ASYNC_DB:
+    from app.api import async_auth as auth, async_invoice as invoice, async_webhook as webhook
+    from app.api.async_customer import router as customer_router
+    webhook_router = webhook.router
 
 from fastapi.staticfiles import StaticFiles
 
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer()
 app = FastAPI()
 
@@ -26,21 +45,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+# Outermost: per-route latency, DB and upstream time (see GET /metrics)
+app.add_middleware(RequestMetricsMiddleware)
+
 # ─── Debug Webhook ──────────────────────────────────────────────────────────
 @app.post("/debug-webhook")
 async def debug_webhook(request: Request):
     body = await request.body()
-    print("📥 RAW WEBHOOK:")
-    print(body.decode("utf-8"))
+    # Sampled (LOG_PAYLOAD_SAMPLE_RATE): a payload extra marks it as a dump
+    logger.info("Raw webhook received", extra={"payload": body.decode("utf-8", "replace")})
     return {"ok": True}
 
+# ─── Metrics (Prometheus text format) ───────────────────────────────────────
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return render_metrics()
+
 # ─── On Startup: Create Tables and Start Recurring Jobs ─────────────────────
 @app.on_event("startup")
 async def on_startup():
     Base.metadata.create_all(bind=engine)
-    start_scheduler()
+    if settings.RUN_SCHEDULER_IN_WEB:
+        start_scheduler()
 
 # ─── Existing Public Routes ─────────────────────────────────────────────────
 app.include_router(invoice.router)
@@ -48,6 +77,9 @@ app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(webhook.router, tags=["Stripe Webhook"])
 app.include_router(webhook_router)
 app.include_router(customer_router)
+app.include_router(analytics_router)
+app.include_router(imports_router)
+app.include_router(pay_router)
 app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
 
 # ─── Existing Protected Routes ───────────────────────────────────────────────
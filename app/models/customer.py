@@ -1,6 +1,6 @@
 # invoice_saas/app/models/customer.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint # 1. Import UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Index # 1. Import UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -22,4 +22,6 @@ class Customer(Base):
     # 3. ADD THIS NEW PROPERTY
     __table_args__ = (
         UniqueConstraint('email', 'merchant_id', name='_customer_email_merchant_uc'),
+        # GET /customers lists by merchant
+        Index('ix_customers_merchant', 'merchant_id', 'id'),
     )
\ No newline at end of file
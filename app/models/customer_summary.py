@@ -0,0 +1,21 @@
+# invoice_saas/app/models/customer_summary.py
+
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from datetime import datetime
+from app.db.database import Base
+
+class CustomerSummary(Base):
+    """
+    Per-customer invoice totals, maintained by app/utils/aggregates.py in
+    the same transaction as every invoice change. Rebuild with
+    `python rebuild_aggregates.py`.
+    """
+    __tablename__ = "customer_summaries"
+
+    customer_id          = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    merchant_id          = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    active_invoice_count = Column(Integer, nullable=False, default=0)   # 'Due' OR recurring
+    due_total            = Column(Float, nullable=False, default=0)
+    paid_total           = Column(Float, nullable=False, default=0)
+    last_invoice_date    = Column(Date, nullable=True)
+    updated_at           = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,27 @@
+# invoice_saas/app/models/email_outbox.py
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+from app.db.database import Base
+
+class EmailOutbox(Base):
+    """
+    Outgoing email, written in the same transaction as the change that
+    triggers it and sent later by app/tasks/email_outbox.py.
+    """
+    __tablename__ = "email_outbox"
+
+    id              = Column(Integer, primary_key=True, index=True)
+    to_email        = Column(String, nullable=False)
+    subject         = Column(String, nullable=False)
+    html_content    = Column(Text, nullable=False)
+    status          = Column(String, nullable=False, default="pending")  # pending | sent | failed
+    attempts        = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error      = Column(Text, nullable=True)
+    created_at      = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at         = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_email_outbox_pending', 'status', 'next_attempt_at'),
+    )
@@ -0,0 +1,38 @@
+# invoice_saas/app/models/import_job.py
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, BigInteger, Index
+from datetime import datetime
+from app.db.database import Base
+
+class ImportJob(Base):
+    """
+    One CSV/NDJSON upload (POST /imports/...), claimed and processed by a
+    scheduler worker (app/tasks/imports.py). Progress is committed with
+    every chunk, together with the claim's lease (claimed_at).
+    """
+    __tablename__ = "import_jobs"
+
+    id               = Column(Integer, primary_key=True, index=True)
+    merchant_id      = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind             = Column(String, nullable=False)                     # invoices | customers
+    format           = Column(String, nullable=False)                     # csv | ndjson
+    filename         = Column(String, nullable=True)
+    file_path        = Column(String, nullable=True)                      # spooled upload, removed when done
+    status           = Column(String, nullable=False, default="queued")   # queued | running | completed | failed
+    bytes_total      = Column(BigInteger, nullable=False, default=0)
+    bytes_processed  = Column(BigInteger, nullable=False, default=0)
+    rows_processed   = Column(Integer, nullable=False, default=0)
+    rows_imported    = Column(Integer, nullable=False, default=0)
+    rows_failed      = Column(Integer, nullable=False, default=0)
+    errors           = Column(Text, nullable=True)                        # JSON list of the first row errors
+    last_error       = Column(Text, nullable=True)
+    created_at       = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at       = Column(DateTime, nullable=True)
+    finished_at      = Column(DateTime, nullable=True)
+    claimed_by       = Column(String, nullable=True)                      # worker processing the job
+    claimed_at       = Column(DateTime, nullable=True)                    # lease, renewed with every chunk
+
+    __table_args__ = (
+        Index('ix_import_jobs_merchant', 'merchant_id', 'id'),
+        Index('ix_import_jobs_open', id, postgresql_where=status.in_(["queued", "running"])),
+    )
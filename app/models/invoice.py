@@ -1,6 +1,6 @@
 # invoice_saas/app/models/invoice.py
 
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Text, Boolean, Index, or_
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -17,7 +17,17 @@ class Invoice(Base):
     frequency            = Column(String, nullable=True)
     status               = Column(String, default="Due")
     notes                = Column(Text, nullable=True)
-    payment_url          = Column(String, nullable=True)
+    payment_url          = Column(String, nullable=True)   # pay link, see utils/checkout.py
+
+    # ─── Cached Stripe Checkout session (created when the pay link is opened) ─
+    checkout_session_id  = Column(String, nullable=True)
+    checkout_url         = Column(String, nullable=True)
+    checkout_expires_at  = Column(DateTime, nullable=True)
+
+    # ─── Payment state from Stripe webhooks (see api/webhook.py) ──────────────
+    stripe_payment_intent_id = Column(String, nullable=True)
+    payment_error        = Column(Text, nullable=True)
+    amount_refunded      = Column(Float, nullable=True)
 
     # ─── Recurring fields (added via migration) ─────────────────────────────────
     is_recurring         = Column(Boolean, nullable=False, default=False)
@@ -32,3 +42,25 @@ class Invoice(Base):
     customer    = relationship("Customer", back_populates="invoices")
 
     # (Self-ref for recurring origin)    
+
+    # ─── Indexes (see migrations/007_add_invoice_indexes.sql) ─────────────────
+    __table_args__ = (
+        # GET /invoices/all, newest first, keyset on (issue_date, id)
+        Index("ix_invoices_merchant_issue", merchant_id, issue_date.desc(), id.desc()),
+        # GET /invoices/{due,paid,canceled} and /all?status=
+        Index("ix_invoices_merchant_status_issue", merchant_id, status, issue_date.desc(), id.desc()),
+        # GET /customers/{id}/invoices
+        Index("ix_invoices_merchant_customer", merchant_id, customer_id),
+        # has_active_invoices and the one-recurring-invoice-per-customer check
+        Index(
+            "ix_invoices_active_customer", customer_id, merchant_id,
+            postgresql_where=or_(status == "Due", is_recurring == True),
+        ),
+        # charge.refunded / payment_intent.* webhooks
+        Index("ix_invoices_payment_intent", stripe_payment_intent_id),
+        # Recurrence run planning: only recurring invoices are ever due
+        Index(
+            "ix_invoices_recurring_due", last_generated_on, recurrence_start_date,
+            postgresql_where=(is_recurring == True),
+        ),
+    )
@@ -0,0 +1,23 @@
+# invoice_saas/app/models/merchant_rollup.py
+
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from datetime import datetime
+from app.db.database import Base
+
+class MerchantDailyRollup(Base):
+    """
+    Per-merchant invoice totals for one issue date, maintained by
+    app/utils/aggregates.py in the same transaction as every invoice change
+    and read by the analytics API. Rebuild with `python rebuild_aggregates.py`.
+    """
+    __tablename__ = "merchant_daily_rollups"
+
+    merchant_id    = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day            = Column(Date, primary_key=True)          # invoice issue_date
+    due_count      = Column(Integer, nullable=False, default=0)
+    due_total      = Column(Float, nullable=False, default=0)
+    paid_count     = Column(Integer, nullable=False, default=0)
+    paid_total     = Column(Float, nullable=False, default=0)
+    canceled_count = Column(Integer, nullable=False, default=0)
+    recurring_mrr  = Column(Float, nullable=False, default=0)   # monthly-equivalent recurring amount
+    updated_at     = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,56 @@
+# invoice_saas/app/models/recurrence_run.py
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Text, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.database import Base
+
+class RecurrenceRun(Base):
+    """
+    One row per billing run of generate_recurring_invoices.
+    A 'running' run is resumed by the next invocation; after an error it
+    waits until next_attempt_at, and is marked 'failed' after
+    RECURRENCE_MAX_ATTEMPTS.
+    """
+    __tablename__ = "recurrence_runs"
+
+    id              = Column(Integer, primary_key=True, index=True)
+    run_date        = Column(Date, nullable=False, unique=True)
+    status          = Column(String, nullable=False, default="running")  # running | completed | failed
+    planned         = Column(Boolean, nullable=False, default=False)
+    invoices_total  = Column(Integer, nullable=False, default=0)
+    invoices_done   = Column(Integer, nullable=False, default=0)
+    attempts        = Column(Integer, nullable=False, default=0)        # failed attempts
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error      = Column(Text, nullable=True)
+    started_at      = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at     = Column(DateTime, nullable=True)
+
+    items = relationship("RecurrenceRunItem", back_populates="run")
+
+
+class RecurrenceRunItem(Base):
+    """
+    Per-invoice progress inside a run:
+    pending -> done | skipped. A worker leases a chunk of pending items by
+    setting claimed_by/claimed_at. `emailed_at` is stamped when the
+    email is queued, in the same commit as the item.
+    """
+    __tablename__ = "recurrence_run_items"
+
+    id          = Column(Integer, primary_key=True, index=True)
+    run_id      = Column(Integer, ForeignKey("recurrence_runs.id", ondelete="CASCADE"), nullable=False)
+    invoice_id  = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False)
+    status      = Column(String, nullable=False, default="pending")  # pending | done | skipped
+    payment_url = Column(String, nullable=True)
+    emailed_at  = Column(DateTime, nullable=True)
+    claimed_by  = Column(String, nullable=True)
+    claimed_at  = Column(DateTime, nullable=True)
+    updated_at  = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    run = relationship("RecurrenceRun", back_populates="items")
+
+    __table_args__ = (
+        UniqueConstraint('run_id', 'invoice_id', name='_recurrence_run_invoice_uc'),
+        Index('ix_recurrence_run_items_claim', 'run_id', 'status', 'invoice_id'),
+    )
@@ -0,0 +1,24 @@
+# invoice_saas/app/models/revoked_token.py
+
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from datetime import datetime
+from app.db.database import Base
+
+class RevokedToken(Base):
+    """
+    A refresh token that can no longer be used: either already exchanged
+    at POST /auth/refresh (refresh tokens are single-use) or logged out.
+    Rows are only needed until the token would have expired anyway and are
+    pruned after that (app/tasks/revoked_tokens.py), so the table stays
+    at roughly one row per active session.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti        = Column(String, primary_key=True)      # the refresh token's id claim
+    user_id    = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)      # the token's exp
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
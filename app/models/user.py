@@ -1,6 +1,6 @@
 # app/models/user.py
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Boolean, Column, Integer, String
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -12,6 +12,9 @@ class User(Base):
     email             = Column(String, unique=True, index=True, nullable=False)
     hashed_password   = Column(String, nullable=False)
     stripe_account_id = Column(String, nullable=True)
+    # From Stripe's account.updated webhook
+    charges_enabled   = Column(Boolean, nullable=True)
+    payouts_enabled   = Column(Boolean, nullable=True)
 
     invoices  = relationship("Invoice",  back_populates="merchant")
     customers = relationship("Customer", back_populates="merchant")
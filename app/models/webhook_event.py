@@ -0,0 +1,27 @@
+# invoice_saas/app/models/webhook_event.py
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+from app.db.database import Base
+
+class WebhookEvent(Base):
+    """
+    A verified Stripe webhook delivery, stored by POST /stripe-webhook and
+    applied later in batches by app/tasks/webhook_events.py. The unique
+    Stripe event id makes redeliveries no-ops.
+    """
+    __tablename__ = "webhook_events"
+
+    id              = Column(Integer, primary_key=True, index=True)
+    stripe_event_id = Column(String, nullable=False, unique=True)
+    type            = Column(String, nullable=False)
+    payload         = Column(Text, nullable=False)                       # raw event JSON
+    status          = Column(String, nullable=False, default="pending")  # pending | processed | failed
+    attempts        = Column(Integer, nullable=False, default=0)
+    last_error      = Column(Text, nullable=True)
+    received_at     = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at    = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_webhook_events_pending', 'status', 'id'),
+    )
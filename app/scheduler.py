@@ -1,5 +1,124 @@
 # invoice_saas/app/scheduler.py
 
-from app.tasks.recurrence import start_scheduler
+import logging
+import zlib
+from functools import wraps
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.database import scheduler_engine
+from app.tasks.email_outbox import dispatch_email_outbox
+from app.tasks.imports import process_import_jobs
+from app.tasks.recurrence import start_recurrence_run, work_recurrence_runs
+from app.tasks.revoked_tokens import prune_revoked_tokens
+from app.tasks.webhook_events import process_webhook_events
 
-# This file now just re-exports the start_scheduler function
+logger = logging.getLogger(__name__)
+
+
+def leader_only(job_name: str):
+    """
+    Wraps a scheduled job so that, across every process running a scheduler
+    (API workers and app/worker.py), only the one holding the Postgres
+    advisory lock for `job_name` fires it; the others skip the tick.
+    Without Postgres (e.g. local SQLite) every process is its own leader.
+    """
+    lock_key = zlib.crc32(job_name.encode())
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if scheduler_engine.dialect.name != "postgresql":
+                return func(*args, **kwargs)
+
+            with scheduler_engine.connect() as conn:
+                is_leader = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": lock_key}).scalar()
+                if not is_leader:
+                    logger.debug("Another worker is leader for %s; skipping this tick", job_name)
+                    return None
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": lock_key})
+                    conn.commit()
+        return wrapper
+    return decorator
+
+
+def register_jobs(scheduler):
+    """
+    Adds the recurring jobs to an APScheduler instance:
+      • Monthly tick at 00:00 on day 1 of each month (leader only)
+      • Yearly tick at 00:00 on January 1 (leader only)
+      • Recurrence worker every RECURRENCE_POLL_SECONDS, on every process,
+        billing open runs in chunks claimed with SKIP LOCKED
+      • Email outbox dispatcher every EMAIL_DISPATCH_SECONDS, on every process
+      • Stripe webhook events applied every WEBHOOK_PROCESS_SECONDS, on every process
+      • Queued CSV/NDJSON imports claimed every IMPORT_POLL_SECONDS, on every process
+      • Expired revoked refresh tokens pruned daily at 03:00 (leader only)
+    """
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    scheduler.add_job(
+        leader_only("monthly_recurring_job")(start_recurrence_run),
+        trigger=CronTrigger(day="1", hour="0", minute="0"),
+        id="monthly_recurring_job",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        leader_only("yearly_recurring_job")(start_recurrence_run),
+        trigger=CronTrigger(month="1", day="1", hour="0", minute="0"),
+        id="yearly_recurring_job",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        work_recurrence_runs,
+        trigger=IntervalTrigger(seconds=settings.RECURRENCE_POLL_SECONDS),
+        id="recurrence_worker_job",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    scheduler.add_job(
+        dispatch_email_outbox,
+        trigger=IntervalTrigger(seconds=settings.EMAIL_DISPATCH_SECONDS),
+        id="email_outbox_job",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    scheduler.add_job(
+        process_webhook_events,
+        trigger=IntervalTrigger(seconds=settings.WEBHOOK_PROCESS_SECONDS),
+        id="webhook_events_job",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    scheduler.add_job(
+        process_import_jobs,
+        trigger=IntervalTrigger(seconds=settings.IMPORT_POLL_SECONDS),
+        id="import_jobs_job",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    scheduler.add_job(
+        leader_only("prune_revoked_tokens_job")(prune_revoked_tokens),
+        trigger=CronTrigger(hour="3", minute="0"),
+        id="prune_revoked_tokens_job",
+        replace_existing=True
+    )
+
+
+def start_scheduler():
+    """
+    Initializes and starts an in-process APScheduler (used by the API when
+    RUN_SCHEDULER_IN_WEB is set).
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler(timezone="UTC")
+    register_jobs(scheduler)
+    scheduler.start()
+    logger.info("APScheduler started: monthly and yearly recurring jobs scheduled")
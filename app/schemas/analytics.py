@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List
+
+class MonthlyRevenue(BaseModel):
+    month: str            # "YYYY-MM", by invoice issue date
+    paid_total: float
+    paid_count: int
+
+class AgingBucket(BaseModel):
+    bucket: str           # "0-30", "31-60", "61-90", "90+" days since issue
+    due_total: float
+    due_count: int
+
+class AnalyticsSummary(BaseModel):
+    revenue_by_month: List[MonthlyRevenue]
+    outstanding_by_age: List[AgingBucket]
+    recurring_mrr: float
+    due_total: float
+    paid_total: float
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 class CustomerOut(BaseModel):
@@ -10,6 +10,11 @@ class CustomerOut(BaseModel):
     phone: Optional[str] = None            # ← NEW
     created_at: datetime
     has_active_invoices: bool
+    # ─── From customer_summaries ──────────────────────────────────────────────
+    active_invoice_count: int = 0
+    due_total: float = 0
+    paid_total: float = 0
+    last_invoice_date: Optional[date] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class ImportRowError(BaseModel):
+    row: int              # 1-based data row (CSV header not counted)
+    error: str
+
+class ImportJobOut(BaseModel):
+    id: int
+    kind: str             # "invoices" or "customers"
+    format: str           # "csv" or "ndjson"
+    filename: Optional[str] = None
+    status: str           # queued | running | completed | failed
+    progress: float       # 0..1, share of the file read so far
+    rows_processed: int
+    rows_imported: int
+    rows_failed: int
+    errors: List[ImportRowError] = []
+    last_error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -2,7 +2,7 @@
 
 from pydantic import BaseModel, EmailStr
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 class InvoiceCreate(BaseModel):
     # ─── Core invoice fields ───────────────────────────────────────────────────
@@ -41,10 +41,35 @@ class InvoiceOut(InvoiceCreate):
     id: int
     status: str
     payment_url: Optional[str] = None
+    payment_error: Optional[str] = None
+    amount_refunded: Optional[float] = None
 
     class Config:
         orm_mode = True
 
+class InvoiceRow(BaseModel):
+    """
+    One row of the paginated invoice lists (GET /invoices/all, /due, ...).
+    Only id, issue_date and the InvoiceOut fields named in `fields=` are
+    present (all of them when `fields` is omitted).
+    """
+    id: int
+    issue_date: date
+    customer_first_name: Optional[str] = None
+    customer_last_name: Optional[str] = None
+    customer_email: Optional[str] = None
+    amount: Optional[float] = None
+    frequency: Optional[str] = None
+    notes: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    recurring_amount: Optional[float] = None
+    recurrence_start_date: Optional[date] = None
+    original_invoice_id: Optional[int] = None
+    status: Optional[str] = None
+    payment_url: Optional[str] = None
+    payment_error: Optional[str] = None
+    amount_refunded: Optional[float] = None
+
 class RecurringAmountUpdate(BaseModel):
     recurring_amount: float
 
@@ -53,4 +78,15 @@ class RecurringAmountUpdate(BaseModel):
             "example": {
                 "recurring_amount": 9.99
             }
-        }
\ No newline at end of file
+        }
+# ─── Bulk creation (POST /invoices/bulk) ───────────────────────────────────────
+class BulkInvoiceResult(BaseModel):
+    index: int                       # position in the request list
+    status: str                      # "created" or "error"
+    invoice: Optional[InvoiceOut] = None
+    error: Optional[str] = None
+
+class BulkInvoiceResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkInvoiceResult]
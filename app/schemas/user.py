@@ -16,3 +16,6 @@ class UserOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
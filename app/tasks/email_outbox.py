@@ -0,0 +1,80 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.request_metrics import upstream_call
+from app.db.database import SchedulerSessionLocal
+from app.models.email_outbox import EmailOutbox
+from app.utils.send_email import get_email_sender
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff: base, 2x base, 4x base ... capped at one hour
+    seconds = settings.EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    return timedelta(seconds=min(seconds, 3600))
+
+
+def dispatch_email_outbox(batch_size: int = None) -> int:
+    """
+    Sends pending outbox emails until none are due.
+    Each batch is claimed with FOR UPDATE SKIP LOCKED (so API processes and
+    workers can dispatch concurrently), sent in as few SendGrid calls as the
+    sender allows, and committed: each email as sent, or rescheduled with
+    backoff when the SendGrid call it was part of failed, so only failed
+    emails are sent again. Gives up after EMAIL_MAX_ATTEMPTS.
+    Returns the number of emails sent.
+    """
+    sender = get_email_sender()
+    batch_size = batch_size or min(settings.EMAIL_BATCH_SIZE, sender.max_batch)
+    sent = 0
+
+    while True:
+        db: Session = SchedulerSessionLocal()
+        try:
+            now = datetime.utcnow()
+            batch = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.status == "pending")
+                .filter(EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not batch:
+                break
+
+            with upstream_call("sendgrid", "mail.send"):
+                outcomes = sender.send_batch([
+                    {"to_email": m.to_email, "subject": m.subject, "html_content": m.html_content}
+                    for m in batch
+                ])
+            failed = 0
+            for m, error in zip(batch, outcomes):
+                m.attempts += 1
+                if error is None:
+                    m.status = "sent"
+                    m.sent_at = now
+                    continue
+                failed += 1
+                m.last_error = str(error)
+                if m.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    m.status = "failed"
+                else:
+                    m.next_attempt_at = now + _retry_delay(m.attempts)
+            sent += len(batch) - failed
+            if failed < len(batch):
+                logger.info("Sent %d queued email(s)", len(batch) - failed)
+            if failed:
+                logger.error(
+                    "%d of %d queued email(s) failed, will retry: %s", failed, len(batch),
+                    next(error for error in outcomes if error is not None),
+                )
+
+            db.commit()
+        finally:
+            db.close()
+
+    return sent
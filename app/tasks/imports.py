@@ -0,0 +1,269 @@
+# app/tasks/imports.py
+#
+# Background processing of CSV/NDJSON uploads (see app/api/imports.py).
+# The API only spools the file and queues the job; scheduler workers (the
+# API's in-process scheduler and app/worker.py) claim queued jobs every
+# IMPORT_POLL_SECONDS with FOR UPDATE SKIP LOCKED. The spooled file is read
+# row by row, so memory stays flat whatever its size; rows are validated
+# and written in chunks of IMPORT_CHUNK_SIZE with the set-based helpers of
+# app/utils/bulk.py, one commit per chunk (progress and lease included).
+# A job whose worker died is claimed again once IMPORT_LEASE_SECONDS pass
+# and resumes after its last committed row. Imported invoices get a pay
+# link but no email.
+#
+# A row that crashes a chunk's set-based write only fails itself: the
+# chunk is rolled back to a savepoint and written again row by row. Only
+# errors of the database connection itself (RETRYABLE_ERRORS) stop a job;
+# it then keeps its file and is resumed when its lease expires.
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SchedulerSessionLocal
+from app.models.import_job import ImportJob
+from app.models.user import User
+from app.schemas.customer import CustomerUpdate
+from app.schemas.invoice import InvoiceCreate
+from app.tasks.recurrence import WORKER_ID
+from app.utils.bulk import prepare_bulk, upsert_customers
+
+logger = logging.getLogger(__name__)
+
+# Only the first row errors are kept on the job
+MAX_STORED_ERRORS = 100
+
+# Failures of the database rather than of a row (connection lost, lock or
+# statement timeout): the job is retried instead of failed
+RETRYABLE_ERRORS = (OperationalError, InterfaceError)
+
+
+def _read_rows(path: str, file_format: str):
+    """
+    Yields (row number, row dict or error message, bytes read so far),
+    reading the file lazily.
+    """
+    with open(path, "rb") as raw:
+        if file_format == "csv":
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            for number, row in enumerate(csv.DictReader(text), start=1):
+                # Empty cells are missing values; cells beyond the header are dropped
+                yield number, {key: value or None for key, value in row.items() if key}, raw.tell()
+        else:
+            number = 0
+            for line in raw:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = f"Invalid JSON: {e}"
+                if not isinstance(row, (dict, str)):
+                    row = "Each line must be a JSON object"
+                yield number, row, raw.tell()
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+def _validate(kind: str, row: dict):
+    if kind == "invoices":
+        return InvoiceCreate(**row)
+    customer = CustomerUpdate(**row)
+    missing = [field for field in ("email", "first_name", "last_name") if not getattr(customer, field)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    return customer
+
+
+def _write_rows(db: Session, job: ImportJob, merchant: User, rows: list) -> list:
+    """Writes validated (row number, model) pairs; returns [(row number, error)]."""
+    if job.kind == "customers":
+        upsert_customers(db, merchant.id, [customer.model_dump() for _, customer in rows], update_existing=True)
+        return []
+
+    # Same path as POST /invoices/bulk, without Checkout sessions and emails
+    results, _ = prepare_bulk(db, merchant, [invoice for _, invoice in rows])
+    return [(rows[result.index][0], result.error) for result in results if result.status == "error"]
+
+
+def _row_error(error: Exception) -> str:
+    # The driver's message, without the statement and parameters SQLAlchemy adds
+    return str(error.orig if isinstance(error, DBAPIError) else error)
+
+
+def _write_chunk(db: Session, job: ImportJob, merchant: User, rows: list) -> list:
+    """
+    Writes one chunk of validated (row number, model) pairs; returns
+    [(row number, error)]. If the set-based write fails, it is rolled back
+    to a savepoint and the rows are written one by one, each in its own
+    savepoint, so only the rows that fail are reported as failed.
+    RETRYABLE_ERRORS are raised.
+    """
+    try:
+        with db.begin_nested():
+            return _write_rows(db, job, merchant, rows)
+    except RETRYABLE_ERRORS:
+        raise
+    except Exception:
+        logger.warning(
+            "Import %s: chunk of rows %d-%d failed, writing it row by row", job.id, rows[0][0], rows[-1][0],
+            exc_info=True, extra={"import_id": job.id},
+        )
+
+    failed = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                failed += _write_rows(db, job, merchant, [row])
+        except RETRYABLE_ERRORS:
+            raise
+        except Exception as e:
+            failed.append((row[0], _row_error(e)))
+    return failed
+
+
+def _process(db: Session, job: ImportJob):
+    merchant = db.get(User, job.merchant_id)
+    errors = json.loads(job.errors) if job.errors else []
+    chunk = []
+    bytes_read = 0
+
+    def flush():
+        failed = _write_chunk(db, job, merchant, chunk) if chunk else []
+        for number, message in failed:
+            if len(errors) < MAX_STORED_ERRORS:
+                errors.append({"row": number, "error": message})
+        job.rows_imported += len(chunk) - len(failed)
+        job.rows_failed += len(failed)
+        job.bytes_processed = bytes_read
+        job.errors = json.dumps(errors)
+        job.claimed_at = datetime.utcnow()
+        db.commit()
+        chunk.clear()
+
+    # Rows up to rows_processed were committed before an interrupted run
+    rows = islice(_read_rows(job.file_path, job.format), job.rows_processed, None)
+    for number, row, bytes_read in rows:
+        job.rows_processed += 1
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            chunk.append((number, _validate(job.kind, row)))
+        except ValidationError as e:
+            job.rows_failed += 1
+            if len(errors) < MAX_STORED_ERRORS:
+                errors.append({"row": number, "error": _validation_message(e)})
+        except (ValueError, TypeError) as e:
+            job.rows_failed += 1
+            if len(errors) < MAX_STORED_ERRORS:
+                errors.append({"row": number, "error": str(e)})
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            flush()
+    bytes_read = job.bytes_total
+    flush()
+
+
+def _claim(db: Session):
+    """
+    Claims the oldest queued import, or a running one whose lease expired
+    (its worker died), for this worker. Commits the claim.
+    """
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=settings.IMPORT_LEASE_SECONDS)
+    job = (
+        db.query(ImportJob)
+        .filter(
+            (ImportJob.status == "queued")
+            | ((ImportJob.status == "running") & (ImportJob.claimed_at < lease_expired))
+        )
+        .order_by(ImportJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job:
+        if job.status == "running":
+            logger.warning(
+                "Resuming import %s after row %d (was claimed by %s)", job.id, job.rows_processed, job.claimed_by,
+                extra={"import_id": job.id},
+            )
+        job.status = "running"
+        job.started_at = job.started_at or now
+        job.claimed_by = WORKER_ID
+        job.claimed_at = now
+        db.commit()
+    return job
+
+
+def _run(db: Session, job: ImportJob):
+    """
+    Processes a claimed import job to completion. Chunks already committed
+    stay imported if a later one fails. On RETRYABLE_ERRORS the job stays
+    claimed and keeps its file, so it resumes once its lease expires; any
+    other error marks it failed. The spooled file is removed once the job
+    is completed or failed.
+    """
+    job_id = job.id
+    try:
+        if not os.path.exists(job.file_path):
+            raise FileNotFoundError(f"Upload file {job.file_path} is missing (is IMPORT_DIR shared with the workers?)")
+
+        _process(db, job)
+
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logger.info(
+            "Import %s (%s) completed: %d imported, %d failed", job.id, job.kind, job.rows_imported, job.rows_failed,
+            extra={"import_id": job.id},
+        )
+    except RETRYABLE_ERRORS as ex:
+        logger.exception(
+            "Import %s interrupted; it resumes once its lease expires", job_id, extra={"import_id": job_id}
+        )
+        db.rollback()
+        job.last_error = str(ex)
+        db.commit()
+        return
+    except Exception as ex:
+        logger.exception("Import %s failed", job_id, extra={"import_id": job_id})
+        db.rollback()
+        job.status = "failed"
+        job.last_error = str(ex)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    if job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def process_import_jobs() -> int:
+    """
+    Claims and runs queued imports, one at a time, until none are left.
+    Runs on the scheduler every IMPORT_POLL_SECONDS on every process.
+    Returns the number of jobs run.
+    """
+    processed = 0
+    while True:
+        db: Session = SchedulerSessionLocal()
+        try:
+            job = _claim(db)
+            if not job:
+                break
+            _run(db, job)
+            processed += 1
+        finally:
+            db.close()
+    return processed
@@ -1,161 +1,396 @@
-from datetime import date, datetime
-from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.db.database import SchedulerSessionLocal
 from app.models.invoice import Invoice
+from app.models.recurrence_run import RecurrenceRun, RecurrenceRunItem
 from app.models.user import User
-import stripe
+import logging
 import os
+import socket
 from dotenv import load_dotenv
-from app.utils.send_email import send_invoice_email  # Import the email utility
+from app.utils.aggregates import invoices_changed
+from app.utils.checkout import payment_link, reset_checkout
+from app.utils.send_email import enqueue_email  # Emails go through the outbox
 
-# Load environment (to pick up STRIPE_SECRET_KEY, DOMAIN, etc.)
 load_dotenv()
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 
+logger = logging.getLogger(__name__)
 
-def generate_recurring_invoices():
+# Identifies this process in recurrence_run_items.claimed_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _next_issue_date(frequency: str, today: date):
+    if frequency == "monthly":
+        return date(today.year, today.month, 1) # Note: This logic might need refinement for edge cases, but is not the cause of the email bug.
+    if frequency == "yearly":
+        return date(today.year + 1, 1, 1)
+    return None
+
+
+def _due_filter(today: date):
+    return (Invoice.is_recurring == True) & (
+        ((Invoice.last_generated_on.is_(None)) & (Invoice.recurrence_start_date <= today))
+        |
+        ((Invoice.last_generated_on.isnot(None)) & (Invoice.last_generated_on < today))
+    )
+
+
+def _recurring_email(job: dict, payment_url: str):
+    payment_link_html = f'<p><a href="{payment_url}">Click here to pay your invoice</a></p>' if payment_url else "<p>Your invoice will be processed according to your agreement.</p>"
+
+    subject = f"Your Recurring Invoice #{job['invoice_id']} from {job['company_name']}"
+    content = f"""
+    <html>
+    <body>
+        <p>Dear {job['first_name']},</p>
+        <p>You have a new recurring invoice from {job['company_name']}.</p>
+        <p>Amount: €{job['amount']}</p>
+        <p>Issue Date: {job['issue_date']}</p>
+        {payment_link_html}
+    </body>
+    </html>
     """
-    This function finds all base invoices marked is_recurring = True,
-    whose next billing date has arrived, and for each:
-      1) Updates the base invoice with a new amount, Issue date, status, etc.
-      2) Creates a new Stripe Checkout Session if the merchant is connected.
-      3) Sends an email notification to the customer.
-      4) Updates last_generated_on on the invoice to today().
+    return subject, content
+
+
+def _process_chunk(db: Session, run: RecurrenceRun, items: list):
     """
-    db: Session = SessionLocal()
-    today = date.today()
+    Bills one chunk of claimed run items. Invoices, merchants and customers
+    are preloaded for the whole chunk; no Stripe calls are made (customers
+    get a pay link, see app/utils/checkout.py). The invoices, the items,
+    the queued emails, the customer summaries and the run counters are
+    committed together, so an email is queued exactly once per item.
+    """
+    today = run.run_date
+    invoices = (
+        db.query(Invoice)
+        .options(selectinload(Invoice.merchant), selectinload(Invoice.customer))
+        .filter(Invoice.id.in_([item.invoice_id for item in items]))
+        .all()
+    )
+    by_invoice_id = {base.id: base for base in invoices}
+
+    jobs = []
+    for item in items:
+        base = by_invoice_id.get(item.invoice_id)
+        if base is None or not base.is_recurring:
+            item.status = "skipped"
+            continue
+
+        # 2. Compute the next issue_date
+        next_due = _next_issue_date(base.frequency, today)
+        if next_due is None:
+            logger.warning("Skipping invoice %s: unrecognized frequency %r", base.id, base.frequency)
+            item.status = "skipped"
+            continue
+
+        if next_due > today:
+            item.status = "skipped"
+            continue
+
+        # 3. The merchant (user) for this invoice, needed for both Stripe and Email.
+        base_user = base.merchant
+        if not base_user:
+            logger.warning("Cannot find merchant for invoice %s, skipping", base.id)
+            item.status = "skipped"
+            continue
+
+        # 4. Update the base invoice details (idempotent if the chunk is retried)
+        base.status = "Due"
+        base.amount = base.recurring_amount if base.recurring_amount is not None else base.amount
+        base.issue_date = next_due
+        base.payment_url = None  # Always reset old URL
+        reset_checkout(base)     # and the previous period's Checkout session
+        base.stripe_payment_intent_id = None  # and its payment
+        base.payment_error = None
+        base.amount_refunded = None
+
+        customer = base.customer
+        jobs.append({
+            "item_id": item.id,
+            "run_date": run.run_date,
+            "invoice_id": base.id,
+            "merchant_id": base_user.id,
+            "company_name": base_user.company_name,
+            "stripe_account_id": base_user.stripe_account_id,
+            "first_name": customer.first_name if customer else base.customer_first_name,
+            "last_name": customer.last_name if customer else base.customer_last_name,
+            "email": customer.email if customer else base.customer_email,
+            "amount": base.amount,
+            "issue_date": base.issue_date,
+        })
+
+    by_item_id = {item.id: item for item in items}
+    for job in jobs:
+        item = by_item_id[job["item_id"]]
+        # 5. Pay link, if the merchant can take card payments
+        payment_url = payment_link(job["invoice_id"]) if job["stripe_account_id"] else None
+
+        # 6. Queue the Email Notification (skipped if an earlier attempt already sent it)
+        if item.emailed_at is None:
+            subject, content = _recurring_email(job, payment_url)
+            enqueue_email(db, job["email"], subject, content)
+            item.emailed_at = datetime.utcnow()
+
+        # 7. Store payment_url and last_generated_on
+        base = by_invoice_id[item.invoice_id]
+        base.payment_url = payment_url
+        base.last_generated_on = today
+        item.payment_url = payment_url
+        item.status = "done"
+
+    invoices_changed(db, invoices)
+
+    # Counters are bumped in SQL: other workers commit chunks of the same run
+    db.query(RecurrenceRun).filter(RecurrenceRun.id == run.id).update(
+        {"invoices_done": RecurrenceRun.invoices_done + len(jobs)}, synchronize_session=False
+    )
+    db.commit()
+    # One line per chunk, and only at DEBUG: a large run has thousands of them
+    logger.debug(
+        "Run %s: billed %d invoice(s) up to invoice %s", run.id, len(jobs), items[-1].invoice_id,
+        extra={"run_id": run.id, "worker_id": WORKER_ID, "billed": len(jobs)},
+    )
+
+
+def _claim_items(db: Session, run: RecurrenceRun, chunk_size: int):
+    """
+    Claims the next chunk of pending items for this worker.
+    FOR UPDATE SKIP LOCKED lets concurrent workers take disjoint chunks
+    without waiting on each other; the claim is a lease, so items held by a
+    worker that died are picked up again once RECURRENCE_LEASE_SECONDS pass.
+    """
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=settings.RECURRENCE_LEASE_SECONDS)
+    items = (
+        db.query(RecurrenceRunItem)
+        .filter(RecurrenceRunItem.run_id == run.id)
+        .filter(RecurrenceRunItem.status == "pending")
+        .filter(
+            (RecurrenceRunItem.claimed_at.is_(None)) | (RecurrenceRunItem.claimed_at < lease_expired)
+        )
+        .order_by(RecurrenceRunItem.invoice_id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for item in items:
+        item.claimed_by = WORKER_ID
+        item.claimed_at = now
+    db.commit()
+    return items
+
+
+def _create_run(db: Session, run_date: date):
+    """
+    Returns the run for `run_date`, creating it if needed. The unique
+    run_date makes this safe when several processes race on the same tick.
+    """
+    run = db.query(RecurrenceRun).filter(RecurrenceRun.run_date == run_date).first()
+    if run:
+        return run
 
     try:
-        # 1. Find all base invoices needing a new recurrence (your query is fine)
-        bases = (
-            db.query(Invoice)
-            .filter(Invoice.is_recurring == True)
-            .filter(
-                ((Invoice.last_generated_on.is_(None)) & (Invoice.recurrence_start_date <= today))
-                |
-                ((Invoice.last_generated_on.isnot(None)) & (Invoice.last_generated_on < today))
-            )
-            .all()
+        run = RecurrenceRun(run_date=run_date)
+        db.add(run)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        run = db.query(RecurrenceRun).filter(RecurrenceRun.run_date == run_date).one()
+    return run
+
+
+def _plan_run(db: Session, run_id: int):
+    """
+    Snapshots every due base invoice into recurrence_run_items in a single
+    INSERT ... SELECT, so a resumed run never has to rescan invoices.
+    The run row is locked while planning so only one worker plans it.
+    """
+    run = (
+        db.query(RecurrenceRun)
+        .filter(RecurrenceRun.id == run_id)
+        .with_for_update()
+        .one()
+    )
+    if run.planned:
+        db.commit()
+        return
+
+    due_ids = select(literal(run.id), Invoice.id, literal("pending")).where(_due_filter(run.run_date))
+    db.execute(
+        insert(RecurrenceRunItem).from_select(["run_id", "invoice_id", "status"], due_ids)
+    )
+    run.invoices_total = db.query(RecurrenceRunItem).filter(RecurrenceRunItem.run_id == run.id).count()
+    run.planned = True
+    db.commit()
+    logger.info(
+        "Run %s for %s: %d due invoice(s) planned", run.id, run.run_date, run.invoices_total,
+        extra={"run_id": run.id},
+    )
+
+
+def _finish_run_if_done(db: Session, run_id: int):
+    remaining = (
+        db.query(RecurrenceRunItem)
+        .filter(RecurrenceRunItem.run_id == run_id)
+        .filter(RecurrenceRunItem.status == "pending")
+        .count()
+    )
+    if remaining:
+        # Other workers still hold leases on the rest of this run
+        return
+
+    finished = (
+        db.query(RecurrenceRun)
+        .filter(RecurrenceRun.id == run_id, RecurrenceRun.status != "completed")
+        .update({"status": "completed", "finished_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    if finished:
+        run = db.query(RecurrenceRun).filter(RecurrenceRun.id == run_id).one()
+        logger.info(
+            "Run %s for %s completed: %d/%d item(s)", run.id, run.run_date, run.invoices_done, run.invoices_total,
+            extra={"run_id": run.id},
         )
 
-        for base in bases:
-            # --- Start of per-invoice processing ---
-
-            # 2. Compute the next issue_date (your logic is fine)
-            next_due = None
-            if base.frequency == "monthly":
-                next_due = date(today.year, today.month, 1) # Note: This logic might need refinement for edge cases, but is not the cause of the email bug.
-            elif base.frequency == "yearly":
-                next_due = date(today.year + 1, 1, 1)
-            else:
-                print(f"⚠️ Skipping invoice {base.id}: unrecognized frequency '{base.frequency}'")
-                continue
-
-            if next_due > today:
-                continue
-            
-            # 3. Get the merchant (user) for this invoice. This is needed for both Stripe and Email.
-            base_user = db.query(User).filter(User.id == base.merchant_id).first()
-            if not base_user:
-                print(f"⚠️ Cannot find merchant for invoice {base.id}, skipping.")
-                continue
-
-            # 4. Update the base invoice details
-            base.status = "Due"
-            base.amount = base.recurring_amount if base.recurring_amount is not None else base.amount
-            base.issue_date = next_due
-            base.payment_url = None  # Always reset old URL
-
-            db.commit()
-            db.refresh(base)
-
-            # 5. Attempt to create a Stripe Checkout Session
-            if base_user.stripe_account_id:
-                try:
-                    session = stripe.checkout.Session.create(
-                        payment_method_types=["card"],
-                        line_items=[{
-                            "price_data": {
-                                "currency": "eur", # Changed back to EUR as in your original file
-                                "product_data": {
-                                    "name": f"Invoice #{base.id} for {base.customer.first_name} {base.customer.last_name}"
-                                },
-                                "unit_amount": int(base.amount * 100),
-                            },
-                            "quantity": 1,
-                        }],
-                        mode="payment",
-                        success_url=f"{os.getenv('DOMAIN')}/payment-success?session_id={{CHECKOUT_SESSION_ID}}",
-                        cancel_url=f"{os.getenv('DOMAIN')}/payment-cancel",
-                        metadata={"invoice_id": str(base.id)},
-                        payment_intent_data={
-                            "transfer_data": {
-                                "destination": base_user.stripe_account_id
-                            }
-                        },
-                    )
-                    base.payment_url = session.url # Set the new URL if successful
-                    print(f"✅ Created Stripe session for invoice {base.id}.")
-                except stripe.error.StripeError as e:
-                    print(f"❌ Stripe error for invoice {base.id}: {str(e)}")
-            else:
-                print(f"⚠️ No Stripe account for merchant {base_user.id}; skipping Checkout session.")
-
-            # 6. Send Email Notification (This now runs every time)
-            payment_link_html = f'<p><a href="{base.payment_url}">Click here to pay your invoice</a></p>' if base.payment_url else "<p>Your invoice will be processed according to your agreement.</p>"
-            
-            subject = f"Your Recurring Invoice #{base.id} from {base_user.company_name}"
-            content = f"""
-            <html>
-            <body>
-                <p>Dear {base.customer.first_name},</p>
-                <p>You have a new recurring invoice from {base_user.company_name}.</p>
-                <p>Amount: €{base.amount}</p>
-                <p>Issue Date: {base.issue_date}</p>
-                {payment_link_html}
-            </body>
-            </html>
-            """
-            send_invoice_email(base.customer.email, subject, content)
-            print(f"📧 Email sent for invoice {base.id}.")
-
-            # 7. Update last_generated_on and commit final changes (like payment_url)
-            base.last_generated_on = today
-            db.commit()
-            print(f"⏱ Updated base invoice {base.id} last_generated_on = {today}")
-
-            # --- End of per-invoice processing ---
+
+def _retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff: base, 2x base, 4x base ... capped at one hour
+    seconds = settings.RECURRENCE_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    return timedelta(seconds=min(seconds, 3600))
+
+
+def _record_failure(db: Session, run_id: int, error: Exception):
+    """
+    Counts a failed attempt: the run waits _retry_delay() before workers
+    pick it up again, or is marked failed after RECURRENCE_MAX_ATTEMPTS.
+    This worker's claimed items are released so the retry can take them.
+    """
+    run = db.query(RecurrenceRun).filter(RecurrenceRun.id == run_id).with_for_update().one()
+    run.attempts += 1
+    run.last_error = str(error)
+    if run.attempts >= settings.RECURRENCE_MAX_ATTEMPTS:
+        run.status = "failed"
+        run.finished_at = datetime.utcnow()
+    else:
+        run.next_attempt_at = datetime.utcnow() + _retry_delay(run.attempts)
+    db.query(RecurrenceRunItem).filter(
+        RecurrenceRunItem.run_id == run_id,
+        RecurrenceRunItem.status == "pending",
+        RecurrenceRunItem.claimed_by == WORKER_ID,
+    ).update({"claimed_by": None, "claimed_at": None}, synchronize_session=False)
+    db.commit()
+    return run
+
+
+def _execute_run(run_id: int, chunk_size: int):
+    db: Session = SchedulerSessionLocal()
+    try:
+        _plan_run(db, run_id)
+        run = db.query(RecurrenceRun).filter(RecurrenceRun.id == run_id).one()
+        if run.invoices_done:
+            logger.info(
+                "Joining run %s for %s at %d/%d", run.id, run.run_date, run.invoices_done, run.invoices_total,
+                extra={"run_id": run.id, "worker_id": WORKER_ID},
+            )
+
+        while True:
+            # 1. Claim the next chunk of unfinished items
+            items = _claim_items(db, run, chunk_size)
+            if not items:
+                break
+            _process_chunk(db, run, items)
+            db.expunge_all()  # keep the identity map at one chunk
+            run = db.query(RecurrenceRun).filter(RecurrenceRun.id == run_id).one()
+
+        _finish_run_if_done(db, run_id)
 
     except Exception as ex:
-        print(f"🔥 An unhandled error occurred in generate_recurring_invoices: {str(ex)}")
         db.rollback() # Rollback in case of unexpected errors
+        run = _record_failure(db, run_id, ex)
+        if run.status == "failed":
+            logger.exception(
+                "Recurrence run %s failed after %d attempt(s), giving up", run_id, run.attempts,
+                extra={"run_id": run_id},
+            )
+        else:
+            # Left resumable: its pending items are claimed again at next_attempt_at
+            logger.exception(
+                "Recurrence run %s failed (attempt %d), retrying at %s", run_id, run.attempts, run.next_attempt_at,
+                extra={"run_id": run_id},
+            )
+        raise
     finally:
         db.close()
 
 
-def start_scheduler():
+def start_recurrence_run(run_date: date = None):
     """
-    Initializes and starts APScheduler jobs:
-      • Monthly job at 00:00 on day 1 of each month
-      • Yearly job at 00:00 on January 1
+    Scheduler tick: creates and plans the run for `run_date` (today by
+    default). Billing itself is done by work_recurrence_runs on every worker.
     """
-    from apscheduler.schedulers.background import BackgroundScheduler
-    from apscheduler.triggers.cron import CronTrigger
+    db: Session = SchedulerSessionLocal()
+    try:
+        run = _create_run(db, run_date or date.today())
+        _plan_run(db, run.id)
+    finally:
+        db.close()
 
-    scheduler = BackgroundScheduler(timezone="UTC")
 
-    scheduler.add_job(
-        generate_recurring_invoices,
-        trigger=CronTrigger(day="1", hour="0", minute="0"),
-        id="monthly_recurring_job",
-        replace_existing=True
-    )
-    scheduler.add_job(
-        generate_recurring_invoices,
-        trigger=CronTrigger(month="1", day="1", hour="0", minute="0"),
-        id="yearly_recurring_job",
-        replace_existing=True
-    )
+def work_recurrence_runs(chunk_size: int = None):
+    """
+    Processes every unfinished run until this worker can claim nothing more.
+    Safe to call from any number of processes at once: each one claims
+    disjoint chunks, and an interrupted run is simply picked up again (a run
+    that raised, once its retry delay has passed).
+    """
+    chunk_size = chunk_size or settings.RECURRENCE_CHUNK_SIZE
+
+    db: Session = SchedulerSessionLocal()
+    try:
+        run_ids = [
+            run_id for (run_id,) in
+            db.query(RecurrenceRun.id)
+            .filter(RecurrenceRun.status == "running")
+            .filter(
+                (RecurrenceRun.next_attempt_at.is_(None)) | (RecurrenceRun.next_attempt_at <= datetime.utcnow())
+            )
+            .order_by(RecurrenceRun.run_date)
+            .all()
+        ]
+    finally:
+        db.close()
 
-    scheduler.start()
-    print("⏲ APScheduler started: monthly and yearly recurring jobs scheduled.")
+    if not run_ids:
+        return
+
+    for run_id in run_ids:
+        try:
+            _execute_run(run_id, chunk_size)
+        except Exception:
+            continue
+
+
+def generate_recurring_invoices(chunk_size: int = None):
+    """
+    This function finds all base invoices marked is_recurring = True,
+    whose next billing date has arrived, and for each:
+      1) Updates the base invoice with a new amount, Issue date, status, etc.
+      2) Gives it a pay link if the merchant is connected to Stripe (the
+         Checkout session is created when the customer opens it).
+      3) Sends an email notification to the customer.
+      4) Updates last_generated_on on the invoice to today().
+
+    Every run is recorded in recurrence_runs, with one recurrence_run_items
+    row per due invoice. Items are claimed and processed in chunks (one
+    commit per chunk, emails queued in the email outbox), so
+    calling this again after a crash resumes the unfinished run without
+    duplicate emails, and several workers
+    (see app/worker.py) can share one run.
+    """
+    start_recurrence_run()
+    work_recurrence_runs(chunk_size)
@@ -0,0 +1,28 @@
+# app/tasks/revoked_tokens.py
+#
+# Drops revoked refresh tokens that have expired anyway: an expired token
+# is rejected by its signature check, so its row is no longer needed.
+
+import logging
+from datetime import datetime
+
+from app.db.database import SchedulerSessionLocal
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+def prune_revoked_tokens() -> int:
+    db = SchedulerSessionLocal()
+    try:
+        pruned = (
+            db.query(RevokedToken)
+            .filter(RevokedToken.expires_at < datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    if pruned:
+        logger.info("Pruned %d expired revoked token(s)", pruned)
+    return pruned
@@ -0,0 +1,109 @@
+# app/tasks/webhook_events.py
+#
+# Applies the Stripe events stored by POST /stripe-webhook. Runs on the
+# scheduler every WEBHOOK_PROCESS_SECONDS on every process; batches are
+# claimed with FOR UPDATE SKIP LOCKED, so workers never apply the same
+# event twice and bursts are absorbed by the queue instead of the API.
+
+import json
+import logging
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from app.api.webhook import apply_events
+from app.core.config import settings
+from app.db.database import SchedulerSessionLocal
+from app.models.webhook_event import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+
+def _claim(db: Session, limit: int, exclude=()):
+    query = db.query(WebhookEvent).filter(WebhookEvent.status == "pending")
+    if exclude:
+        query = query.filter(WebhookEvent.id.notin_(exclude))
+    return query.order_by(WebhookEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def _apply(db: Session, batch: list):
+    apply_events(db, [json.loads(event.payload) for event in batch])
+    now = datetime.utcnow()
+    for event in batch:
+        event.attempts += 1
+        event.status = "processed"
+        event.processed_at = now
+        event.last_error = None
+    db.commit()
+
+
+def _apply_one_by_one(event_ids: list) -> tuple:
+    """
+    Fallback after a batch failed: each event in its own transaction, so
+    one bad event does not hold up the others. Failing events are retried
+    on later ticks and marked failed after WEBHOOK_MAX_ATTEMPTS.
+    Returns (processed, failed ids).
+    """
+    processed, failed = 0, []
+    for event_id in event_ids:
+        db: Session = SchedulerSessionLocal()
+        try:
+            event = (
+                db.query(WebhookEvent)
+                .filter(WebhookEvent.id == event_id, WebhookEvent.status == "pending")
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if not event:
+                continue
+            try:
+                _apply(db, [event])
+                processed += 1
+            except Exception as ex:
+                db.rollback()
+                event.attempts += 1
+                event.last_error = str(ex)
+                if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                    event.status = "failed"
+                db.commit()
+                failed.append(event_id)
+                logger.error(
+                    "Webhook event %s (%s) failed: %s", event.stripe_event_id, event.type, ex,
+                    extra={"event_id": event.stripe_event_id, "attempts": event.attempts},
+                )
+        finally:
+            db.close()
+    return processed, failed
+
+
+def process_webhook_events(batch_size: int = None) -> int:
+    """
+    Applies pending webhook events, oldest first, until none are left.
+    Returns the number of events processed.
+    """
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    processed = 0
+    failed = []
+
+    while True:
+        db: Session = SchedulerSessionLocal()
+        try:
+            batch = _claim(db, batch_size, failed)
+            if not batch:
+                break
+            event_ids = [event.id for event in batch]
+            try:
+                _apply(db, batch)
+                processed += len(batch)
+                logger.info("Applied %d Stripe event(s)", len(batch))
+                continue
+            except Exception as ex:
+                db.rollback()
+                logger.warning("Webhook batch of %d failed, retrying one by one: %s", len(batch), ex)
+        finally:
+            db.close()
+
+        done, batch_failed = _apply_one_by_one(event_ids)
+        processed += done
+        failed += batch_failed
+
+    return processed
@@ -0,0 +1,251 @@
+# app/utils/aggregates.py
+#
+# Keeps the customer_summaries and merchant_daily_rollups tables in step
+# with invoices. Every code path that inserts, deletes or changes an
+# invoice calls invoices_changed() (or refresh_for_invoice_ids() after a
+# set-based UPDATE) before its commit, so the aggregates are written in
+# the same transaction as the change.
+#
+# Each refresh recomputes whole rows from the invoices, so two transactions
+# refreshing the same key (create_invoice, the webhook worker, recurrence
+# and import chunks) must not overlap: under READ COMMITTED the later
+# commit would overwrite the other's result with one computed from a
+# snapshot that misses its invoices. On Postgres a refresh therefore first
+# takes transaction-scoped advisory locks covering the customers and
+# (merchant, day) keys it refreshes, in sorted order; the recompute that
+# follows runs after any competing transaction has committed and sees its
+# invoices. SQLite already allows only one writing transaction at a time.
+
+import hashlib
+import logging
+from sqlalchemy import case, delete, func, inspect, or_, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from app.db.upsert import insert_for
+from app.models.customer import Customer
+from app.models.customer_summary import CustomerSummary
+from app.models.invoice import Invoice
+from app.models.merchant_rollup import MerchantDailyRollup
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 10000
+
+
+# Advisory locks are taken per slot, not per key: a recurrence or import
+# chunk touches up to ~1000 customers, and Postgres keeps every advisory
+# lock in its shared lock table (max_locks_per_transaction). Keys that
+# share a slot just wait for each other.
+LOCK_SLOTS = 128
+_SUMMARY_LOCK_CLASS = 8101
+_ROLLUP_LOCK_CLASS = 8102
+
+
+def _lock_slot(*parts) -> int:
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % LOCK_SLOTS
+
+
+def _lock_slots(db: Session, lock_class: int, slots):
+    """
+    Serializes refreshes of the same aggregate rows until commit/rollback.
+    Slots are locked in sorted order so two refreshes cannot deadlock.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for slot in sorted(set(slots)):
+        db.execute(text("SELECT pg_advisory_xact_lock(:class_id, :slot)"), {"class_id": lock_class, "slot": slot})
+
+
+def _summary_select(customer_filter):
+    """
+    One aggregate row per customer matching `customer_filter`
+    (customers without invoices get zeros).
+    """
+    is_active = or_(Invoice.status == "Due", Invoice.is_recurring == True)
+    return (
+        select(
+            Customer.id,
+            Customer.merchant_id,
+            func.coalesce(func.sum(case((is_active, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Invoice.status == "Due", Invoice.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((Invoice.status == "Paid", Invoice.amount), else_=0)), 0),
+            func.max(Invoice.issue_date),
+            func.now(),
+        )
+        .select_from(Customer)
+        .outerjoin(Invoice, Invoice.customer_id == Customer.id)
+        .where(customer_filter)
+        .group_by(Customer.id, Customer.merchant_id)
+    )
+
+
+def _upsert_summaries(db: Session, customer_filter):
+    insert = insert_for(db)
+    columns = [
+        "customer_id", "merchant_id", "active_invoice_count",
+        "due_total", "paid_total", "last_invoice_date", "updated_at",
+    ]
+    statement = insert(CustomerSummary).from_select(columns, _summary_select(customer_filter))
+    statement = statement.on_conflict_do_update(
+        index_elements=[CustomerSummary.customer_id],
+        set_={column: statement.excluded[column] for column in columns[1:]},
+    )
+    db.execute(statement)
+
+
+def refresh_customer_summaries(db: Session, customer_ids):
+    """
+    Recomputes the summary rows of the given customers from their invoices
+    with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE, holding
+    their advisory locks until the transaction ends. Does not commit.
+    """
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id is not None}
+    if not customer_ids:
+        return
+    _lock_slots(db, _SUMMARY_LOCK_CLASS, [_lock_slot(customer_id) for customer_id in customer_ids])
+    _upsert_summaries(db, Customer.id.in_(customer_ids))
+
+
+def _rollup_select(invoice_filter):
+    """One rollup row per (merchant_id, issue_date) among the matching invoices."""
+    is_recurring = Invoice.is_recurring == True
+    recurring_amount = func.coalesce(Invoice.recurring_amount, Invoice.amount)
+    return (
+        select(
+            Invoice.merchant_id,
+            Invoice.issue_date,
+            func.sum(case((Invoice.status == "Due", 1), else_=0)),
+            func.coalesce(func.sum(case((Invoice.status == "Due", Invoice.amount), else_=0)), 0),
+            func.sum(case((Invoice.status == "Paid", 1), else_=0)),
+            func.coalesce(func.sum(case((Invoice.status == "Paid", Invoice.amount), else_=0)), 0),
+            func.sum(case((Invoice.status == "canceled", 1), else_=0)),
+            func.coalesce(func.sum(case(
+                (is_recurring & (Invoice.frequency == "monthly"), recurring_amount),
+                (is_recurring & (Invoice.frequency == "yearly"), recurring_amount / 12.0),
+                else_=0,
+            )), 0),
+            func.now(),
+        )
+        .where(Invoice.merchant_id.isnot(None))
+        .where(invoice_filter)
+        .group_by(Invoice.merchant_id, Invoice.issue_date)
+    )
+
+
+def _upsert_rollups(db: Session, invoice_filter):
+    insert = insert_for(db)
+    columns = [
+        "merchant_id", "day", "due_count", "due_total", "paid_count",
+        "paid_total", "canceled_count", "recurring_mrr", "updated_at",
+    ]
+    statement = insert(MerchantDailyRollup).from_select(columns, _rollup_select(invoice_filter))
+    statement = statement.on_conflict_do_update(
+        index_elements=[MerchantDailyRollup.merchant_id, MerchantDailyRollup.day],
+        set_={column: statement.excluded[column] for column in columns[2:]},
+    )
+    db.execute(statement)
+
+
+def refresh_merchant_rollups(db: Session, keys):
+    """
+    Recomputes the rollup rows for the given (merchant_id, day) keys,
+    holding their advisory locks until the transaction ends. Rows whose day no longer has any invoice are removed first, then the
+    rest is rewritten with one INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+    Does not commit.
+    """
+    keys = {(merchant_id, day) for merchant_id, day in keys if merchant_id is not None and day is not None}
+    if not keys:
+        return
+    _lock_slots(db, _ROLLUP_LOCK_CLASS, [_lock_slot(merchant_id, str(day)[:10]) for merchant_id, day in keys])
+    db.execute(
+        delete(MerchantDailyRollup)
+        .where(tuple_(MerchantDailyRollup.merchant_id, MerchantDailyRollup.day).in_(keys))
+    )
+    _upsert_rollups(db, tuple_(Invoice.merchant_id, Invoice.issue_date).in_(keys))
+
+
+def _history_values(invoice: Invoice, attribute: str) -> set:
+    # Current value plus the previous one if the attribute is being changed
+    history = inspect(invoice).attrs[attribute].history
+    return set(history.added) | set(history.unchanged) | set(history.deleted)
+
+
+def invoices_changed(db: Session, invoices):
+    """
+    Call after adding, changing or deleting invoices and before commit.
+    Flushes the pending changes, then refreshes the affected customer
+    summaries and merchant rollups.
+    """
+    customer_ids = set()
+    rollup_keys = set()
+    for invoice in invoices:
+        customer_ids |= _history_values(invoice, "customer_id")
+        for merchant_id in _history_values(invoice, "merchant_id"):
+            for day in _history_values(invoice, "issue_date"):
+                rollup_keys.add((merchant_id, day))
+    db.flush()
+    refresh_customer_summaries(db, customer_ids)
+    refresh_merchant_rollups(db, rollup_keys)
+
+
+def refresh_for_invoice_ids(db: Session, invoice_ids):
+    """
+    Same as invoices_changed(), for code that updates invoices with
+    set-based UPDATE statements instead of ORM objects (keys unchanged).
+    """
+    invoice_ids = set(invoice_ids)
+    if not invoice_ids:
+        return
+    rows = (
+        db.query(Invoice.customer_id, Invoice.merchant_id, Invoice.issue_date)
+        .filter(Invoice.id.in_(invoice_ids))
+        .distinct()
+        .all()
+    )
+    refresh_customer_summaries(db, [customer_id for customer_id, _, _ in rows])
+    refresh_merchant_rollups(db, [(merchant_id, day) for _, merchant_id, day in rows])
+
+
+def rebuild_customer_summaries(db: Session) -> int:
+    """
+    Recomputes every summary from the invoices table, committing in
+    batches of customer ids. Each batch holds every summary lock slot,
+    so live refreshes wait for it. Used for backfills and repairs.
+    """
+    last_id = 0
+    rebuilt = 0
+    while True:
+        ids = [
+            customer_id for (customer_id,) in
+            db.query(Customer.id)
+            .filter(Customer.id > last_id)
+            .order_by(Customer.id)
+            .limit(REBUILD_BATCH_SIZE)
+        ]
+        if not ids:
+            break
+        _lock_slots(db, _SUMMARY_LOCK_CLASS, range(LOCK_SLOTS))
+        _upsert_summaries(db, Customer.id.between(ids[0], ids[-1]))
+        db.commit()
+        last_id = ids[-1]
+        rebuilt += len(ids)
+        logger.info("Rebuilt %d customer summaries (up to customer %s)", rebuilt, last_id)
+    return rebuilt
+
+
+def rebuild_merchant_rollups(db: Session) -> int:
+    """
+    Recomputes every merchant's daily rollups from the invoices table,
+    one merchant per transaction (holding every rollup lock slot).
+    Used for backfills and repairs.
+    """
+    merchant_ids = [merchant_id for (merchant_id,) in db.query(User.id).order_by(User.id)]
+    for merchant_id in merchant_ids:
+        _lock_slots(db, _ROLLUP_LOCK_CLASS, range(LOCK_SLOTS))
+        db.execute(delete(MerchantDailyRollup).where(MerchantDailyRollup.merchant_id == merchant_id))
+        _upsert_rollups(db, Invoice.merchant_id == merchant_id)
+        db.commit()
+    logger.info("Rebuilt daily rollups for %d merchant(s)", len(merchant_ids))
+    return len(merchant_ids)
@@ -0,0 +1,207 @@
+# app/utils/bulk.py
+#
+# Set-based building blocks for creating many invoices at once
+# (POST /invoices/bulk and the CSV/NDJSON import): customers are upserted
+# and invoices inserted with one statement per chunk instead of one
+# round-trip per row.
+
+from datetime import date, datetime
+from typing import List
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.db.upsert import insert_for
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.schemas.invoice import BulkInvoiceResult, InvoiceCreate, InvoiceOut
+from app.utils.aggregates import refresh_for_invoice_ids
+from app.utils.checkout import payment_link
+
+# Rows per executemany call for the invoice inserts
+CHUNK_SIZE = 1000
+
+
+def _chunks(rows: list, size: int = CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert_customers(db: Session, merchant_id: int, customers: list, update_existing: bool = False) -> dict:
+    """
+    Inserts the merchant's customers that do not exist yet and returns
+    {email: customer_id} for all of them, existing ones included.
+    `customers` are dicts with email, first_name, last_name and optionally
+    phone; the first entry wins for repeated emails. Existing customers keep
+    their details unless `update_existing` (then names are overwritten and
+    the phone is, when given).
+    One INSERT ... ON CONFLICT (email, merchant_id) ... RETURNING, executed
+    for many rows at once (batched into multi-row statements by SQLAlchemy).
+    Does not commit.
+    """
+    rows = {}
+    for customer in customers:
+        rows.setdefault(customer["email"], {
+            "merchant_id": merchant_id,
+            "email": customer["email"],
+            "first_name": customer["first_name"],
+            "last_name": customer["last_name"],
+            "phone": customer.get("phone"),
+            "created_at": datetime.utcnow(),
+        })
+
+    if not rows:
+        return {}
+
+    statement = insert_for(db)(Customer)
+    if update_existing:
+        set_ = {
+            "first_name": statement.excluded.first_name,
+            "last_name": statement.excluded.last_name,
+            "phone": func.coalesce(statement.excluded.phone, Customer.phone),
+        }
+    else:
+        # A no-op update (instead of DO NOTHING) so RETURNING also yields existing rows
+        set_ = {"email": statement.excluded.email}
+    statement = statement.on_conflict_do_update(
+        index_elements=[Customer.email, Customer.merchant_id],
+        set_=set_,
+    ).returning(Customer.id, Customer.email)
+    return {email: customer_id for customer_id, email in db.execute(statement, list(rows.values()))}
+
+
+def insert_invoices(db: Session, payloads: list) -> list:
+    """
+    Bulk-inserts invoices (dicts of Invoice columns) and returns their ids
+    in the same order, then refreshes the affected customer summaries and
+    merchant rollups. Does not commit.
+    """
+    ids = []
+    statement = Invoice.__table__.insert().returning(Invoice.id, sort_by_parameter_order=True)
+    for chunk in _chunks(payloads):
+        ids += db.execute(statement, chunk).scalars().all()
+    refresh_for_invoice_ids(db, ids)
+    return ids
+
+
+def recurring_customer_ids(db: Session, merchant_id: int, customer_ids) -> set:
+    """Which of these customers already have an active recurring invoice."""
+    customer_ids = set(customer_ids)
+    if not customer_ids:
+        return set()
+    return set(db.scalars(
+        select(Invoice.customer_id)
+        .where(Invoice.merchant_id == merchant_id)
+        .where(Invoice.customer_id.in_(customer_ids))
+        .where(Invoice.is_recurring == True)
+        .distinct()
+    ))
+
+
+def set_payment_urls(db: Session, payment_urls: dict):
+    """{invoice_id: url} as one executemany UPDATE. Does not commit."""
+    if payment_urls:
+        db.execute(
+            update(Invoice),
+            [{"id": invoice_id, "payment_url": url} for invoice_id, url in payment_urls.items()],
+        )
+
+
+
+def first_of_next_month(d: date) -> date:
+    if d.month == 12:
+        return date(d.year + 1, 1, 1)
+    return date(d.year, d.month + 1, 1)
+
+
+def first_of_next_year(d: date) -> date:
+    return date(d.year + 1, 1, 1)
+
+
+def apply_recurrence_fields(payload: dict):
+    """
+    Validates a new invoice's recurrence settings and fills in the derived
+    fields (POST /invoices/ and prepare_bulk). Raises HTTPException(422).
+    """
+    if payload.get("is_recurring"):
+        if payload.get("recurring_amount") is None:
+            raise HTTPException(
+                status_code=422,
+                detail="If is_recurring is true, you must also provide recurring_amount."
+            )
+        today = date.today()
+        freq = (payload.get("frequency") or "").lower()
+        if freq == "monthly":
+            payload["recurrence_start_date"] = first_of_next_month(today)
+        elif freq == "yearly":
+            payload["recurrence_start_date"] = first_of_next_year(today)
+        else:
+            raise HTTPException(
+                status_code=422,
+                detail="If is_recurring is true, frequency must be 'monthly' or 'yearly'."
+            )
+    else:
+        payload["recurring_amount"] = None
+        payload["recurrence_start_date"] = None
+        payload["original_invoice_id"] = None
+
+
+def _fail(result: BulkInvoiceResult, error: str):
+    result.status = "error"
+    result.error = error
+
+
+def prepare_bulk(db: Session, merchant, invoices: List[InvoiceCreate]):
+    """
+    Validates the invoices, upserts their customers and bulk-inserts them
+    with their pay links (step 1 of POST /invoices/bulk; also used per
+    chunk by the CSV/NDJSON import). Returns the per-item results (errors
+    filled in) and {index: InvoiceOut} for the inserted invoices.
+    Does not commit.
+    """
+    results = [BulkInvoiceResult(index=index, status="created") for index in range(len(invoices))]
+    payloads = {}
+    for index, invoice in enumerate(invoices):
+        payload = invoice.dict()
+        payload["merchant_id"] = merchant.id
+        payload["is_recurring"] = bool(payload.get("is_recurring"))
+        try:
+            apply_recurrence_fields(payload)
+        except HTTPException as e:
+            _fail(results[index], e.detail)
+            continue
+        payloads[index] = payload
+
+    customer_ids = upsert_customers(db, merchant.id, [
+        {
+            "email": payload["customer_email"],
+            "first_name": payload["customer_first_name"],
+            "last_name": payload["customer_last_name"],
+        }
+        for payload in payloads.values()
+    ])
+
+    # One active recurring invoice per customer, counting earlier items of this batch
+    recurring = recurring_customer_ids(db, merchant.id, [
+        customer_ids[payload["customer_email"]] for payload in payloads.values() if payload["is_recurring"]
+    ])
+    for index, payload in list(payloads.items()):
+        payload["customer_id"] = customer_ids[payload["customer_email"]]
+        if payload["is_recurring"]:
+            if payload["customer_id"] in recurring:
+                _fail(results[index], f"Customer with email {payload['customer_email']} already has an active recurring invoice.")
+                del payloads[index]
+                continue
+            recurring.add(payload["customer_id"])
+
+    invoice_ids = insert_invoices(db, list(payloads.values()))
+    set_payment_urls(db, {invoice_id: payment_link(invoice_id) for invoice_id in invoice_ids})
+    created = {
+        # Already validated as InvoiceCreate: skip re-validating every field
+        index: InvoiceOut.model_construct(
+            id=invoice_id, status="Due", payment_url=payment_link(invoice_id),
+            **{field: payload[field] for field in InvoiceCreate.model_fields}
+        )
+        for (index, payload), invoice_id in zip(payloads.items(), invoice_ids)
+    }
+    return results, created
@@ -0,0 +1,89 @@
+# app/utils/checkout.py
+#
+# Lazy Stripe Checkout sessions. Invoices are emailed with a stable pay
+# link (GET /pay/{token}, see app/api/pay.py) instead of a session URL; the
+# session is only created when a customer opens the link, cached on the
+# invoice until shortly before it expires, and recreated after that.
+
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.config import settings
+from app.models.invoice import Invoice
+from app.utils.stripe_gateway import get_stripe_gateway, idempotency_key
+
+
+def _signature(invoice_id: int) -> str:
+    message = f"pay:{invoice_id}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def payment_link(invoice_id: int) -> str:
+    """The customer-facing payment URL of an invoice (signed, so ids can't be guessed)."""
+    return f"{settings.PUBLIC_BASE_URL}/pay/{invoice_id}-{_signature(invoice_id)}"
+
+
+def invoice_id_from_token(token: str) -> Optional[int]:
+    invoice_id, _, signature = token.partition("-")
+    if not invoice_id.isdigit() or not hmac.compare_digest(signature, _signature(int(invoice_id))):
+        return None
+    return int(invoice_id)
+
+
+def checkout_session_params(invoice: Invoice, merchant) -> dict:
+    return dict(
+        payment_method_types=["card"],
+        line_items=[{
+            "price_data": {
+                "currency": "eur",
+                "product_data": {
+                    "name": f"Invoice #{invoice.id} for {merchant.company_name}"
+                },
+                "unit_amount": int(invoice.amount * 100),
+            },
+            "quantity": 1,
+        }],
+        mode="payment",
+        success_url=f"{settings.PAYMENT_RESULT_URL}?status=success&session_id={{CHECKOUT_SESSION_ID}}",
+        cancel_url=f"{settings.PAYMENT_RESULT_URL}?status=cancel",
+        # The period tells webhooks apart once a recurring invoice moved on
+        metadata={"invoice_id": str(invoice.id), "period": invoice.issue_date.isoformat()},
+        payment_intent_data={
+            "transfer_data": {
+                "destination": merchant.stripe_account_id
+            },
+            # So payment_intent.* webhooks can be matched to the invoice
+            "metadata": {"invoice_id": str(invoice.id), "period": invoice.issue_date.isoformat()},
+        },
+    )
+
+
+def reset_checkout(invoice: Invoice):
+    """Forgets the cached session (call when the amount or billing period changes)."""
+    invoice.checkout_session_id = None
+    invoice.checkout_url = None
+    invoice.checkout_expires_at = None
+
+
+def checkout_url(invoice: Invoice, merchant) -> str:
+    """
+    The Checkout URL for an invoice: the cached session while it has at
+    least CHECKOUT_MIN_REMAINING_SECONDS left, otherwise a new one, stored
+    on the invoice (the caller commits). Raises stripe.error.StripeError.
+    """
+    now = datetime.utcnow()
+    if invoice.checkout_url and invoice.checkout_expires_at > now + timedelta(seconds=settings.CHECKOUT_MIN_REMAINING_SECONDS):
+        return invoice.checkout_url
+
+    # Keyed on the session being replaced: customers opening the link at the
+    # same time get the same new session instead of one each
+    session = get_stripe_gateway().create_checkout_session(
+        checkout_session_params(invoice, merchant),
+        idempotency_key(invoice.id, invoice.issue_date, f"checkout-after-{invoice.checkout_session_id or 'none'}"),
+    )
+    invoice.checkout_session_id = session.id
+    invoice.checkout_url = session.url
+    invoice.checkout_expires_at = datetime.utcfromtimestamp(session.expires_at)
+    return session.url
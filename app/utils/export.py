@@ -0,0 +1,45 @@
+# app/utils/export.py
+#
+# Row serialisation for streamed exports (GET /invoices/export): the
+# endpoint yields the header, then one encoded chunk per batch of rows
+# fetched from a server-side cursor.
+
+import csv
+import io
+import json
+from datetime import date
+
+# Rows fetched per round-trip from the server-side cursor, and per yielded chunk
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Excel only detects UTF-8 CSV files that start with a byte order mark
+UTF8_BOM = "﻿"
+
+
+def export_header(fields: list, file_format: str, bom: bool = False) -> str:
+    if file_format != "csv":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return (UTF8_BOM if bom else "") + buffer.getvalue()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def encode_rows(rows, fields: list, file_format: str) -> str:
+    """One chunk of CSV lines or NDJSON objects for `rows` (tuples in `fields` order)."""
+    if file_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({field: _json_value(value) for field, value in zip(fields, row)}) + "\n"
+        for row in rows
+    )
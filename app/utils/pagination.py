@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import date
+from fastapi import HTTPException
+from typing import Union
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.orm import Session, Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values) -> str:
+    """
+    Opaque cursor for the keyset values of the last row of a page,
+    e.g. encode_cursor(issue_date, id).
+    """
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types):
+    """
+    Reverses encode_cursor(), converting each value with the matching
+    entry of `types`, e.g. decode_cursor(cursor, date.fromisoformat, int).
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(types):
+            raise ValueError("cursor length")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: str, allowed: list, required: tuple = ()) -> list:
+    """
+    Turns a `fields=a,b,c` query value into a column list, always keeping
+    `required` (the keyset columns). Unknown names are a 400.
+    """
+    if not fields:
+        return list(allowed)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    return list(required) + [f for f in requested if f not in required]
+
+
+def estimate_count(db: Session, query: Union[Query, Select]) -> int:
+    """
+    Row count for the X-Total-Count header. On Postgres this is the
+    planner's estimate for the query (no scan); elsewhere an exact COUNT.
+    Accepts an ORM Query or a select() (async code calls it via run_sync).
+    """
+    statement = query.statement if isinstance(query, Query) else query
+    statement = statement.order_by(None)
+    if db.bind.dialect.name != "postgresql":
+        return db.scalar(select(func.count()).select_from(statement.subquery()))
+
+    compiled = statement.compile(
+        dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,16 +1,129 @@
 import os
+import random
+import time
+from collections import deque
+from functools import lru_cache
+from sqlalchemy.orm import Session
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, Personalization, To, Substitution
 
-def send_invoice_email(to_email: str, subject: str, content: str):
-    message = Mail(
-        from_email=os.getenv("SENDER_EMAIL"),
-        to_emails=to_email,
-        subject=subject,
-        html_content=content
-    )
+from app.core.config import settings
+from app.core.request_metrics import upstream_call
+from app.models.email_outbox import EmailOutbox
+
+# SendGrid accepts at most 1000 personalizations per mail/send call, and
+# substitutions are capped at 10000 bytes per personalization.
+SENDGRID_MAX_BATCH = 1000
+SUBSTITUTION_MAX_BYTES = 10000
+CONTENT_TAG = "-invoice-content-"
+
+
+@lru_cache(maxsize=1)
+def get_sendgrid_client() -> SendGridAPIClient:
+    # One client per process instead of one per email
+    return SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+
+
+class SendGridSender:
+    """
+    Sends a batch of messages with as few API calls as possible: every
+    message becomes one personalization (own recipient and subject) of a
+    shared mail whose body is a substitution tag.
+    """
+    max_batch = SENDGRID_MAX_BATCH
+
+    def send_batch(self, messages: list) -> list:
+        """
+        Returns one outcome per message, in order: None when it was sent,
+        otherwise the exception of the SendGrid call it was part of. A failed
+        call does not stop the ones after it.
+        """
+        sg = get_sendgrid_client()
+        from_email = os.getenv("SENDER_EMAIL")
+        outcomes = [None] * len(messages)
+
+        batchable = [i for i, m in enumerate(messages) if len(m["html_content"].encode()) <= SUBSTITUTION_MAX_BYTES]
+        oversized = [i for i, m in enumerate(messages) if len(m["html_content"].encode()) > SUBSTITUTION_MAX_BYTES]
+
+        for start in range(0, len(batchable), self.max_batch):
+            indexes = batchable[start:start + self.max_batch]
+            mail = Mail(from_email=from_email, html_content=CONTENT_TAG)
+            for i in indexes:
+                personalization = Personalization()
+                personalization.add_to(To(messages[i]["to_email"]))
+                personalization.subject = messages[i]["subject"]
+                personalization.add_substitution(Substitution(CONTENT_TAG, messages[i]["html_content"]))
+                mail.add_personalization(personalization)
+            try:
+                sg.send(mail)
+            except Exception as ex:
+                for i in indexes:
+                    outcomes[i] = ex
+
+        for i in oversized:
+            message = messages[i]
+            try:
+                sg.send(Mail(
+                    from_email=from_email,
+                    to_emails=message["to_email"],
+                    subject=message["subject"],
+                    html_content=message["html_content"]
+                ))
+            except Exception as ex:
+                outcomes[i] = ex
 
-    sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-    response = sg.send(message)
+        return outcomes
 
-    return response.status_code
+
+class FakeEmailSender:
+    """
+    In-memory sender for tests, local runs and load tests (EMAIL_BACKEND=fake).
+    Nothing leaves the process; the last messages are kept in `sent` and
+    all of them counted in `sent_count`. FAKE_EMAIL_LATENCY_MS and
+    FAKE_EMAIL_ERROR_RATE make it behave like a slow or flaky SendGrid.
+    """
+    max_batch = SENDGRID_MAX_BATCH
+
+    def __init__(self, latency_ms: int = 0, error_rate: float = 0.0, keep: int = 10000):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.sent = deque(maxlen=keep)
+        self.sent_count = 0
+
+    def send_batch(self, messages: list) -> list:
+        """Same outcomes as SendGridSender.send_batch; an injected failure fails the whole call."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < self.error_rate:
+            return [RuntimeError("Injected SendGrid failure (FAKE_EMAIL_ERROR_RATE)")] * len(messages)
+        self.sent.extend(messages)
+        self.sent_count += len(messages)
+        return [None] * len(messages)
+
+
+@lru_cache(maxsize=1)
+def get_email_sender():
+    if settings.EMAIL_BACKEND == "fake":
+        return FakeEmailSender(settings.FAKE_EMAIL_LATENCY_MS, settings.FAKE_EMAIL_ERROR_RATE)
+    return SendGridSender()
+
+
+def enqueue_email(db: Session, to_email: str, subject: str, content: str) -> EmailOutbox:
+    """
+    Adds an email to the outbox. It is committed together with the caller's
+    transaction and sent by the outbox dispatcher, so the caller never waits
+    on SendGrid.
+    """
+    message = EmailOutbox(to_email=to_email, subject=subject, html_content=content)
+    db.add(message)
+    return message
+
+
+def send_invoice_email(to_email: str, subject: str, content: str):
+    # Synchronous send, kept for scripts; request paths use enqueue_email()
+    with upstream_call("sendgrid", "mail.send"):
+        error, = get_email_sender().send_batch([
+            {"to_email": to_email, "subject": subject, "html_content": content}
+        ])
+    if error is not None:
+        raise error
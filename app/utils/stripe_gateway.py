@@ -0,0 +1,204 @@
+# app/utils/stripe_gateway.py
+#
+# The one way this app talks to Stripe. A single client per process with a
+# pooled HTTP session; every request waits for a concurrency slot
+# (STRIPE_CONCURRENCY) and a token from a bucket refilled at
+# STRIPE_RATE_LIMIT requests/second, and rate-limited or dropped requests
+# are retried with backoff under the same idempotency key, so a retry can
+# never create a second session.
+# STRIPE_BACKEND=fake swaps in FakeStripeGateway (same limits, no network)
+# for load tests; fake_webhook() builds signed events to post to the app.
+
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.core.request_metrics import upstream_call
+
+logger = logging.getLogger(__name__)
+
+# Signs fake webhooks when STRIPE_WEBHOOK_SECRET is not set
+FAKE_WEBHOOK_SECRET = "whsec_fake"
+
+
+def idempotency_key(invoice_id: int, period, action: str) -> str:
+    """Same invoice, billing period and action → same key → same Stripe object."""
+    return f"invoice-{invoice_id}-{period}-{action}"
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_delay(error: stripe.error.StripeError, attempt: int) -> float:
+    # Stripe sends Retry-After on some 429s; otherwise exponential backoff with jitter
+    retry_after = (getattr(error, "headers", None) or {}).get("retry-after")
+    if retry_after:
+        return float(retry_after)
+    return settings.STRIPE_RETRY_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+class StripeGateway:
+    webhook_secret = settings.STRIPE_WEBHOOK_SECRET
+
+    def __init__(self):
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=settings.STRIPE_CONCURRENCY))
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY or "",
+            client_id=settings.STRIPE_CLIENT_ID,
+            http_client=stripe.RequestsClient(session=session, timeout=settings.STRIPE_TIMEOUT_SECONDS),
+            max_network_retries=0,  # retried in _request, after waiting for the rate limiter again
+        )
+        self._init_limits()
+
+    def _init_limits(self):
+        self._slots = threading.BoundedSemaphore(settings.STRIPE_CONCURRENCY)
+        self._bucket = TokenBucket(settings.STRIPE_RATE_LIMIT, max(1, int(settings.STRIPE_RATE_LIMIT)))
+
+    def _request(self, operation: str, call, *args, **kwargs):
+        # Timed as a whole (limiter waits and retries included): that is what the caller waits for
+        with upstream_call("stripe", operation):
+            for attempt in range(settings.STRIPE_MAX_RETRIES + 1):
+                self._bucket.acquire()
+                with self._slots:
+                    try:
+                        return call(*args, **kwargs)
+                    except (stripe.error.RateLimitError, stripe.error.APIConnectionError) as e:
+                        if attempt == settings.STRIPE_MAX_RETRIES:
+                            raise
+                        delay = _retry_delay(e, attempt)
+                        logger.warning("Stripe %s on %s, retrying in %.1fs", type(e).__name__, operation, delay)
+                # Back off without holding a slot
+                time.sleep(delay)
+
+    def create_checkout_session(self, params: dict, idempotency_key: str):
+        return self._request(
+            "checkout.sessions.create",
+            self.client.v1.checkout.sessions.create,
+            params=params,
+            options={"idempotency_key": idempotency_key},
+        )
+
+    def oauth_token(self, code: str):
+        """Completes Stripe Connect OAuth; the result has stripe_user_id."""
+        return self._request(
+            "oauth.token",
+            self.client.oauth.token,
+            params={"grant_type": "authorization_code", "code": code},
+        )
+
+    def verify_webhook(self, payload: bytes, sig_header: str) -> dict:
+        """
+        Checks the signature (raises stripe.error.SignatureVerificationError),
+        then parses the payload as plain dicts (StripeObject no longer
+        supports dict methods like .get()).
+        """
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, self.webhook_secret
+        )
+        return json.loads(payload)
+
+
+class FakeStripeGateway(StripeGateway):
+    """
+    In-process Stripe for load tests (STRIPE_BACKEND=fake). Calls go through
+    the same concurrency slots, rate limiter and retries as the real
+    gateway, then sleep FAKE_STRIPE_LATENCY_MS (±50%) and fail with a 429
+    or a dropped connection FAKE_STRIPE_ERROR_RATE of the time. Idempotency
+    keys behave like Stripe's: the same key returns the same session.
+    """
+    webhook_secret = settings.STRIPE_WEBHOOK_SECRET or FAKE_WEBHOOK_SECRET
+
+    def __init__(self, latency_ms: int = 0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._init_limits()
+
+    def _upstream(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < self.error_rate:
+            if random.random() < 0.5:
+                raise stripe.error.RateLimitError("Injected rate limit (FAKE_STRIPE_ERROR_RATE)", http_status=429)
+            raise stripe.error.APIConnectionError("Injected connection error (FAKE_STRIPE_ERROR_RATE)")
+
+    def _checkout_session(self, params: dict, idempotency_key: str):
+        self._upstream()
+        with self._lock:
+            if idempotency_key not in self.sessions:
+                session_id = f"cs_fake_{len(self.sessions) + 1}"
+                self.sessions[idempotency_key] = SimpleNamespace(
+                    id=session_id,
+                    url=f"https://checkout.stripe.test/c/pay/{session_id}",
+                    expires_at=int(time.time()) + 24 * 3600,
+                    metadata=params.get("metadata", {}),
+                )
+            return self.sessions[idempotency_key]
+
+    def _oauth_token(self, code: str):
+        self._upstream()
+        return SimpleNamespace(stripe_user_id=f"acct_fake_{code}")
+
+    def create_checkout_session(self, params: dict, idempotency_key: str):
+        return self._request("checkout.sessions.create", self._checkout_session, params, idempotency_key)
+
+    def oauth_token(self, code: str):
+        return self._request("oauth.token", self._oauth_token, code)
+
+
+def fake_webhook(event_type: str, data_object: dict, event_id: str = None, secret: str = None) -> tuple:
+    """
+    A Stripe-style event and its Stripe-Signature header, for posting to
+    /stripe-webhook in load tests. Returns (body, headers).
+    """
+    secret = secret or FakeStripeGateway.webhook_secret
+    body = json.dumps({
+        "id": event_id or f"evt_fake_{random.getrandbits(64):016x}",
+        "object": "event",
+        "type": event_type,
+        "created": int(time.time()),
+        "data": {"object": data_object},
+    })
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return body, {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
+
+@lru_cache(maxsize=1)
+def get_stripe_gateway() -> StripeGateway:
+    if settings.STRIPE_BACKEND == "fake":
+        return FakeStripeGateway(settings.FAKE_STRIPE_LATENCY_MS, settings.FAKE_STRIPE_ERROR_RATE)
+    return StripeGateway()
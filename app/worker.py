@@ -0,0 +1,42 @@
+# invoice_saas/app/worker.py
+"""
+Dedicated background worker, running the scheduler jobs without the API:
+
+    python -m app.worker
+
+Start as many as needed. Every worker claims disjoint chunks of open
+recurrence runs (SELECT ... FOR UPDATE SKIP LOCKED), so billing throughput
+grows with the number of processes, while only the leader fires the
+monthly/yearly ticks. Workers also run the queued CSV/NDJSON imports,
+so IMPORT_DIR must be shared with the API. Set RUN_SCHEDULER_IN_WEB=false
+on the API once the workers are deployed.
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import logging
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from app.core.log import setup_logging
+from app.models import user, invoice, customer  # 👈 ensure models are loaded
+from app.scheduler import register_jobs
+from app.tasks.recurrence import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    setup_logging()
+    scheduler = BlockingScheduler(timezone="UTC")
+    register_jobs(scheduler)
+    logger.info("Worker %s started", WORKER_ID)
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Worker %s stopped", WORKER_ID)
+
+
+if __name__ == "__main__":
+    main()
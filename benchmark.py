@@ -0,0 +1,370 @@
+# benchmark.py (place this at the project root, alongside app/)
+#
+# Reproducible benchmarks for the hot API endpoints and background jobs.
+# Seeds a synthetic dataset (merchants × customers × invoices), starts the
+# API in-process on a local port with the fake Stripe and email backends,
+# and measures:
+#
+#   create_invoice, list_all_invoices, get_customers, stripe_webhook (HTTP)
+#   process_webhook_events, generate_recurring_invoices (jobs)
+#
+# reporting throughput, p50/p99 latency and database queries per operation
+# (work an operation triggers in the background, like the email outbox
+# dispatch after create_invoice, counts towards it).
+# Results are written as JSON; pass an earlier file to --compare to see the
+# difference between two commits.
+#
+#   python benchmark.py --merchants 10 --customers 500 --invoices 5000
+#   python benchmark.py --database-url postgresql://localhost/invoice_bench --compare benchmark-1a2b3c4.json
+#
+# ⚠️ All tables of --database-url are dropped and recreated: point it at a
+# scratch database, never at DATABASE_URL.
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: list, share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def _summary(ops: int, seconds: float, queries: int, latencies: list = None) -> dict:
+    result = {
+        "ops": ops,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(ops / seconds, 2) if seconds else None,
+        "queries_per_op": round(queries / ops, 2) if ops else None,
+    }
+    if latencies:
+        latencies = sorted(latencies)
+        result["p50_ms"] = round(_percentile(latencies, 0.50) * 1000, 2)
+        result["p99_ms"] = round(_percentile(latencies, 0.99) * 1000, 2)
+    return result
+
+
+class Bench:
+    def __init__(self, args):
+        # The app reads its settings at import time, so everything is
+        # configured before the first app import
+        os.environ.update({
+            "DATABASE_URL": args.database_url,
+            "STRIPE_BACKEND": "fake",
+            "EMAIL_BACKEND": "fake",
+            "FAKE_STRIPE_LATENCY_MS": str(args.stripe_latency_ms),
+            "FAKE_EMAIL_LATENCY_MS": str(args.email_latency_ms),
+            "RUN_SCHEDULER_IN_WEB": "false",
+            "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        })
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.results = {}
+
+    # ─── Dataset ────────────────────────────────────────────────────────────
+    def seed(self):
+        from app.core.log import setup_logging
+        from app.core.security import hash_password
+        from app.db.database import Base, SessionLocal, engine
+        from app.main import app  # 👈 loads every model (and router), so all tables are dropped/created
+        from app.models.user import User
+        from app.utils.bulk import insert_invoices, set_payment_urls, upsert_customers
+        from app.utils.checkout import payment_link
+
+        setup_logging()
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        args, rng = self.args, self.rng
+        started = time.perf_counter()
+        today = date.today()
+        password = hash_password("benchmark")
+        self.merchants = []
+        self.invoice_ids = []
+
+        db = SessionLocal()
+        try:
+            for m in range(args.merchants):
+                merchant = User(
+                    company_name=f"Bench {m}",
+                    email=f"bench-{m}@example.com",
+                    hashed_password=password,
+                    stripe_account_id=f"acct_bench_{m}",
+                )
+                db.add(merchant)
+                db.flush()
+
+                customers = [
+                    {"email": f"c{c}-m{m}@example.com", "first_name": f"First{c}", "last_name": f"Last{c}"}
+                    for c in range(args.customers)
+                ]
+                customer_ids = upsert_customers(db, merchant.id, customers)
+
+                payloads = []
+                for i in range(args.invoices):
+                    customer = customers[i % len(customers)]
+                    # At most one recurring invoice per customer, due today
+                    recurring = i < len(customers) and rng.random() < args.recurring_share
+                    payloads.append({
+                        "merchant_id": merchant.id,
+                        "customer_id": customer_ids[customer["email"]],
+                        "customer_first_name": customer["first_name"],
+                        "customer_last_name": customer["last_name"],
+                        "customer_email": customer["email"],
+                        "amount": round(rng.uniform(10, 1000), 2),
+                        "issue_date": today - timedelta(days=rng.randrange(730)),
+                        "status": rng.choices(["Due", "Paid", "canceled"], [5, 4, 1])[0],
+                        "is_recurring": recurring,
+                        "frequency": "monthly" if recurring else None,
+                        "recurring_amount": 50.0 if recurring else None,
+                        "recurrence_start_date": today - timedelta(days=31) if recurring else None,
+                    })
+                ids = insert_invoices(db, payloads)
+                set_payment_urls(db, {invoice_id: payment_link(invoice_id) for invoice_id in ids})
+                db.commit()
+
+                self.merchants.append({"id": merchant.id, "email": merchant.email, "customers": customers})
+                self.invoice_ids += ids
+        finally:
+            db.close()
+
+        print(
+            f"🌱 Seeded {args.merchants} merchant(s) × {args.customers} customer(s) × {args.invoices} invoice(s) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    # ─── Server ─────────────────────────────────────────────────────────────
+    def start_server(self):
+        import requests
+        import uvicorn
+        from app.main import app
+
+        port = _free_port()
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+        self.http = requests.Session()
+        self.http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(self.args.concurrency, 10)))
+        for merchant in self.merchants:
+            response = self.http.post(
+                f"{self.base_url}/auth/login", data={"username": merchant["email"], "password": "benchmark"}
+            )
+            response.raise_for_status()
+            merchant["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def stop_server(self):
+        self.server.should_exit = True
+
+    # ─── Measurements ───────────────────────────────────────────────────────
+    def _queries(self) -> int:
+        # Every tracked engine times its queries (app/core/request_metrics.py)
+        from app.core.request_metrics import DB_QUERY_SECONDS
+        return sum(value for suffix, _, _, value in DB_QUERY_SECONDS.samples() if suffix == "_count")
+
+    def measure_http(self, name: str, make_request):
+        """Calls make_request() --requests times (after --warmup calls) from --concurrency threads."""
+        for _ in range(self.args.warmup):
+            make_request().raise_for_status()
+
+        def timed(_):
+            started = time.perf_counter()
+            response = make_request()
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        queries = self._queries()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.args.concurrency) as pool:
+            latencies = list(pool.map(timed, range(self.args.requests)))
+        elapsed = time.perf_counter() - started
+        self.results[name] = _summary(len(latencies), elapsed, self._queries() - queries, latencies)
+        self._report(name)
+
+    def measure_job(self, name: str, job, count_ops):
+        """Runs job() once; count_ops() gives the number of items it handled."""
+        queries = self._queries()
+        started = time.perf_counter()
+        job()
+        elapsed = time.perf_counter() - started
+        self.results[name] = _summary(count_ops(), elapsed, self._queries() - queries)
+        self._report(name)
+
+    def _report(self, name: str):
+        result = self.results[name]
+        latency = f", p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms" if "p50_ms" in result else ""
+        print(
+            f"⏱ {name}: {result['ops']} op(s), {result['throughput_per_s']}/s{latency}, "
+            f"{result['queries_per_op']} queries/op"
+        )
+
+    def _merchant(self) -> dict:
+        return self.rng.choice(self.merchants)
+
+    def run(self):
+        from sqlalchemy import func
+        from app.db.database import SessionLocal
+        from app.models.recurrence_run import RecurrenceRunItem
+        from app.models.webhook_event import WebhookEvent
+        from app.tasks.recurrence import generate_recurring_invoices
+        from app.tasks.webhook_events import process_webhook_events
+        from app.utils.stripe_gateway import fake_webhook
+
+        url = self.base_url
+
+        def create_invoice():
+            merchant = self._merchant()
+            customer = self.rng.choice(merchant["customers"])
+            return self.http.post(f"{url}/invoices/", headers=merchant["headers"], json={
+                "customer_first_name": customer["first_name"],
+                "customer_last_name": customer["last_name"],
+                "customer_email": customer["email"],
+                "amount": 99.0,
+                "issue_date": date.today().isoformat(),
+            })
+
+        def list_all_invoices():
+            return self.http.get(f"{url}/invoices/all", headers=self._merchant()["headers"], params={"limit": 50})
+
+        def get_customers():
+            return self.http.get(f"{url}/customers/", headers=self._merchant()["headers"])
+
+        def stripe_webhook():
+            invoice_id = self.rng.choice(self.invoice_ids)
+            body, headers = fake_webhook("checkout.session.completed", {
+                "object": "checkout.session",
+                "id": f"cs_bench_{invoice_id}",
+                "payment_intent": f"pi_bench_{invoice_id}",
+                "metadata": {"invoice_id": str(invoice_id)},
+            })
+            return self.http.post(f"{url}/stripe-webhook", data=body, headers=headers)
+
+        self.measure_http("create_invoice", create_invoice)
+        self.measure_http("list_all_invoices", list_all_invoices)
+        self.measure_http("get_customers", get_customers)
+        self.measure_http("stripe_webhook", stripe_webhook)
+        # The scheduler is off, so the queued events are all still pending
+        self.stop_server()
+
+        def count(query):
+            db = SessionLocal()
+            try:
+                return query(db)
+            finally:
+                db.close()
+
+        self.measure_job(
+            "process_webhook_events",
+            process_webhook_events,
+            lambda: count(lambda db: db.query(func.count(WebhookEvent.id)).filter(WebhookEvent.status == "processed").scalar()),
+        )
+        self.measure_job(
+            "generate_recurring_invoices",
+            generate_recurring_invoices,
+            lambda: count(lambda db: db.query(func.count(RecurrenceRunItem.id)).filter(RecurrenceRunItem.status != "pending").scalar()),
+        )
+
+    def document(self) -> dict:
+        args = self.args
+        return {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": args.database_url.split(":", 1)[0],
+            "config": {
+                "merchants": args.merchants,
+                "customers": args.customers,
+                "invoices": args.invoices,
+                "recurring_share": args.recurring_share,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "stripe_latency_ms": args.stripe_latency_ms,
+                "email_latency_ms": args.email_latency_ms,
+                "seed": args.seed,
+            },
+            "results": self.results,
+        }
+
+
+def compare(previous: dict, current: dict):
+    """Prints throughput and p99 changes against an earlier results file."""
+    print(f"\n📊 {previous.get('commit')} → {current.get('commit')}")
+    if previous.get("config") != current.get("config"):
+        print("⚠️ The two runs used different settings; the numbers are not directly comparable.")
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("throughput_per_s", "p99_ms", "queries_per_op"):
+            if before.get(key) and result.get(key) is not None:
+                changes.append(f"{key} {before[key]} → {result[key]} ({(result[key] / before[key] - 1) * 100:+.1f}%)")
+        print(f"  {name}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints and recurrence job.")
+    parser.add_argument("--database-url", default="sqlite:///benchmark.sqlite",
+                        help="scratch database; all its tables are dropped and recreated")
+    parser.add_argument("--merchants", type=int, default=5)
+    parser.add_argument("--customers", type=int, default=200, help="per merchant")
+    parser.add_argument("--invoices", type=int, default=2000, help="per merchant")
+    parser.add_argument("--recurring-share", type=float, default=0.5,
+                        help="share of customers with a recurring invoice due today")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--stripe-latency-ms", type=int, default=0)
+    parser.add_argument("--email-latency-ms", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default: benchmark-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    bench = Bench(args)
+    bench.seed()
+    bench.start_server()
+    bench.run()
+
+    document = bench.document()
+    output = args.output or f"benchmark-{document['commit']}.json"
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), document)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# emit_fake_webhooks.py (place this at the project root, alongside app/)
+#
+# Posts signed fake Stripe events to a running API, e.g. to load-test the
+# webhook queue or mark seeded invoices as paid:
+#
+#     python emit_fake_webhooks.py --invoice-ids 1-5000 --concurrency 32
+#     python emit_fake_webhooks.py --invoice-ids 1-100 --type charge.refunded --duplicates 0.2
+#
+# Events are signed with STRIPE_WEBHOOK_SECRET (or the fake backend's
+# secret), so the server must use the same one.
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app.utils.stripe_gateway import fake_webhook
+
+
+def _data_object(event_type: str, invoice_id: int) -> dict:
+    metadata = {"invoice_id": str(invoice_id)}
+    intent_id = f"pi_fake_{invoice_id}"
+    if event_type.startswith("checkout.session."):
+        return {"object": "checkout.session", "id": f"cs_fake_{invoice_id}", "metadata": metadata, "payment_intent": intent_id}
+    if event_type.startswith("payment_intent."):
+        return {"object": "payment_intent", "id": intent_id, "metadata": metadata,
+                "last_payment_error": {"message": "Your card was declined."}}
+    if event_type == "charge.refunded":
+        return {"object": "charge", "id": f"ch_fake_{invoice_id}", "payment_intent": intent_id,
+                "metadata": metadata, "amount_refunded": 100, "refunded": True}
+    raise SystemExit(f"Unsupported event type: {event_type}")
+
+
+def _invoice_ids(spec: str) -> list:
+    ids = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        ids += range(int(first), int(last or first) + 1)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post signed fake Stripe webhooks.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/stripe-webhook")
+    parser.add_argument("--type", default="checkout.session.completed")
+    parser.add_argument("--invoice-ids", required=True, help="e.g. 1-1000 or 3,5,10-20")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duplicates", type=float, default=0.0, help="share of events delivered twice")
+    parser.add_argument("--secret", help="defaults to STRIPE_WEBHOOK_SECRET / the fake backend's")
+    args = parser.parse_args()
+
+    deliveries = []
+    for invoice_id in _invoice_ids(args.invoice_ids):
+        body, headers = fake_webhook(args.type, _data_object(args.type, invoice_id), secret=args.secret)
+        deliveries.append((body, headers))
+        if random.random() < args.duplicates:
+            deliveries.append((body, headers))
+    random.shuffle(deliveries)
+
+    session = requests.Session()
+    session.mount("http", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def post(delivery):
+        started = time.perf_counter()
+        response = session.post(args.url, data=delivery[0], headers=delivery[1])
+        return response.status_code, response.json().get("success"), time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(post, deliveries))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, _, latency in results)
+    failed = sum(1 for status, success, _ in results if status != 200 or not success)
+    print(f"📤 Sent {len(results)} {args.type} event(s) in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), {failed} failed")
+    print(f"⏱ p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
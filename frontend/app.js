@@ -3,6 +3,9 @@ const API_BASE_URL = "http://localhost:8000"; // adjust if needed
 // --- Global State for Filtering ---
 let activeFilters = {};
 let allInvoicesData = [];
+// Invoices are loaded a page at a time, with only the columns the table shows
+const INVOICE_PAGE_SIZE = 200;
+const INVOICE_TABLE_FIELDS = 'id,status,is_recurring,issue_date,amount,frequency,customer_email,notes';
 let currentCustomerInvoices = [];
 let currentView = ''; // Track active view for sidebar styling
 
@@ -237,6 +240,7 @@ if (document.getElementById("login-form")) {
             if (response.ok) {
                 const data = await response.json();
                 localStorage.setItem("access_token", data.access_token);
+                localStorage.setItem("refresh_token", data.refresh_token);
                 showApp();
             } else {
                 document.getElementById("login-error").innerText = "Invalid credentials. Please try again.";
@@ -250,6 +254,29 @@ if (document.getElementById("login-form")) {
     });
 }
 
+// Access tokens are short-lived; swaps the (single-use) refresh token for a new pair.
+// Concurrent 401s share one refresh call.
+let refreshInFlight = null;
+function refreshTokens() {
+    if (!refreshInFlight) {
+        refreshInFlight = (async () => {
+            const refreshToken = localStorage.getItem("refresh_token");
+            if (!refreshToken) return false;
+            const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            });
+            if (!response.ok) return false;
+            const data = await response.json();
+            localStorage.setItem("access_token", data.access_token);
+            localStorage.setItem("refresh_token", data.refresh_token);
+            return true;
+        })().finally(() => { refreshInFlight = null; });
+    }
+    return refreshInFlight;
+}
+
 async function secureFetch(url, options = {}) {
     const token = localStorage.getItem("access_token");
     if (!token) {
@@ -258,7 +285,11 @@ async function secureFetch(url, options = {}) {
     }
     options.headers = options.headers || {};
     options.headers["Authorization"] = `Bearer ${token}`;
-    const response = await fetch(url, options);
+    let response = await fetch(url, options);
+    if (response.status === 401 && await refreshTokens()) {
+        options.headers["Authorization"] = `Bearer ${localStorage.getItem("access_token")}`;
+        response = await fetch(url, options);
+    }
     if (response.status === 401) {
         showToast("Session expired or unauthorized. Please log in again.", 'error');
         logout();
@@ -267,6 +298,32 @@ async function secureFetch(url, options = {}) {
     return response;
 }
 
+// One page of a paginated list endpoint: { rows, nextCursor, total }
+async function fetchPage(url, { cursor = null, pageSize = 1000, fields = null } = {}) {
+    const pageUrl = new URL(url);
+    pageUrl.searchParams.set('limit', pageSize);
+    if (cursor) pageUrl.searchParams.set('cursor', cursor);
+    if (fields) pageUrl.searchParams.set('fields', fields);
+    const response = await secureFetch(pageUrl.toString());
+    return {
+        rows: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+        total: Number(response.headers.get('X-Total-Count') || 0)
+    };
+}
+
+// Follows X-Next-Cursor until the last page of a paginated list endpoint
+async function fetchAllPages(url, pageSize = 1000) {
+    const rows = [];
+    let cursor = null;
+    do {
+        const page = await fetchPage(url, { cursor, pageSize });
+        rows.push(...page.rows);
+        cursor = page.nextCursor;
+    } while (cursor);
+    return rows;
+}
+
 function showLogin() {
     document.getElementById("login-screen").style.display = "block";
     document.getElementById("app").style.display = "none";
@@ -281,7 +338,19 @@ function showApp() {
 }
 
 function logout() {
+    const refreshToken = localStorage.getItem("refresh_token");
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
+    if (refreshToken) {
+        // Revoke the session server-side; reload either way
+        fetch(`${API_BASE_URL}/auth/logout`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+            keepalive: true
+        }).catch(() => {}).finally(() => window.location.reload());
+        return;
+    }
     window.location.reload();
 }
 
@@ -751,11 +820,46 @@ async function loadAllInvoices() {
                 </thead>
                 <tbody id="invoice-table-body"></tbody>
             </table>
+        </div>
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-top: 1rem;">
+            <span id="invoice-page-info"></span>
+            <button id="load-more-invoices-btn" class="btn" style="display:none;">Load more</button>
         </div>`;
     document.getElementById("main-content").innerHTML = content;
 
     const tbody = document.getElementById("invoice-table-body");
+    const pageInfo = document.getElementById("invoice-page-info");
+    const loadMoreBtn = document.getElementById("load-more-invoices-btn");
     const onApplyFilters = () => applyAndRenderFilters(allInvoicesData, tbody, renderAllInvoiceRows);
+    let nextCursor = null;
+
+    // Appends the next page (newest first); filters apply to the loaded rows
+    const loadPage = async () => {
+        const page = await fetchPage(`${API_BASE_URL}/invoices/all`, {
+            cursor: nextCursor, pageSize: INVOICE_PAGE_SIZE, fields: INVOICE_TABLE_FIELDS
+        });
+        allInvoicesData.push(...page.rows);
+        nextCursor = page.nextCursor;
+        loadMoreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+        pageInfo.textContent = nextCursor
+            ? `Showing the latest ${allInvoicesData.length} of about ${Math.max(page.total, allInvoicesData.length)} invoices`
+            : `${allInvoicesData.length} invoices`;
+        onApplyFilters();
+    };
+
+    loadMoreBtn.onclick = async () => {
+        loadMoreBtn.disabled = true;
+        showLoader();
+        try {
+            await loadPage();
+        } catch (error) {
+            console.error("Failed to fetch more invoices:", error);
+            showToast("Failed to load more invoices.", 'error');
+        } finally {
+            loadMoreBtn.disabled = false;
+            hideLoader();
+        }
+    };
 
     document.getElementById('clear-all-filters-btn').onclick = () => {
         activeFilters = {};
@@ -771,9 +875,8 @@ async function loadAllInvoices() {
     
     showLoader();
     try {
-        const response = await secureFetch(`${API_BASE_URL}/invoices/all`);
-        allInvoicesData = await response.json();
-        onApplyFilters();
+        allInvoicesData = [];
+        await loadPage();
     } catch (error) {
         console.error("Failed to fetch invoices:", error);
         tbody.innerHTML = '<tr><td colspan="8">Failed to load invoices.</td></tr>';
@@ -924,8 +1027,7 @@ async function loadCustomers() {
             if (filter === 'active') url += '?is_active=true';
             else if (filter === 'inactive') url += '?is_active=false';
 
-            const response = await secureFetch(url);
-            allCustomers = await response.json();
+            allCustomers = await fetchAllPages(url);
             applyCustomerSearch(allCustomers);
         } catch (error) {
             console.error("Failed to fetch customers:", error);
@@ -0,0 +1,24 @@
+# rebuild_aggregates.py (place this at the project root, alongside app/)
+#
+# Recomputes the materialized invoice aggregates from the invoices table.
+# Run once after applying the migration that creates them, or to repair.
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.core.log import setup_logging
+from app.db.database import SessionLocal
+from app.models import user, invoice, customer  # 👈 ensure models are loaded
+from app.utils.aggregates import rebuild_customer_summaries, rebuild_merchant_rollups
+
+
+if __name__ == "__main__":
+    setup_logging()
+    db = SessionLocal()
+    try:
+        count = rebuild_customer_summaries(db)
+        print(f"✅ Rebuilt {count} customer summaries.")
+        count = rebuild_merchant_rollups(db)
+        print(f"✅ Rebuilt daily rollups for {count} merchant(s).")
+    finally:
+        db.close()
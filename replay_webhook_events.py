@@ -0,0 +1,78 @@
+# replay_webhook_events.py (place this at the project root, alongside app/)
+#
+# Re-applies stored Stripe webhook events through the current handlers,
+# oldest first, e.g. to backfill state after a new event type is handled:
+#
+#     python replay_webhook_events.py --type charge.refunded --since 2025-01-01
+#     python replay_webhook_events.py --failed
+#
+# Replayed events go through the same checks as live ones, so events of an
+# earlier billing period of a recurring invoice leave it alone. They are
+# not idempotent against later changes, though: a replayed payment marks an
+# invoice Paid again even if a merchant changed its status since, and a
+# replayed partial refund overwrites amount_refunded. Replay complete ranges
+# (oldest first, as done here) so the latest event of each invoice wins.
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import json
+from datetime import datetime
+
+from app.api.webhook import apply_events
+from app.core.config import settings
+from app.core.log import setup_logging
+from app.db.database import SessionLocal
+from app.models import user, invoice, customer  # 👈 ensure models are loaded
+from app.models.webhook_event import WebhookEvent
+
+
+def replay(event_types=None, since=None, until=None, failed_only=False, batch_size=None) -> int:
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    db = SessionLocal()
+    replayed = 0
+    last_id = 0
+    try:
+        while True:
+            query = db.query(WebhookEvent).filter(WebhookEvent.id > last_id)
+            if event_types:
+                query = query.filter(WebhookEvent.type.in_(event_types))
+            if since:
+                query = query.filter(WebhookEvent.received_at >= since)
+            if until:
+                query = query.filter(WebhookEvent.received_at < until)
+            if failed_only:
+                query = query.filter(WebhookEvent.status == "failed")
+            batch = query.order_by(WebhookEvent.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            apply_events(db, [json.loads(event.payload) for event in batch])
+            now = datetime.utcnow()
+            for event in batch:
+                event.status = "processed"
+                event.processed_at = now
+                event.last_error = None
+            db.commit()
+
+            last_id = batch[-1].id
+            replayed += len(batch)
+            print(f"🔁 Replayed {replayed} event(s) (up to event {last_id})")
+    finally:
+        db.close()
+    return replayed
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Re-apply stored Stripe webhook events.")
+    parser.add_argument("--type", action="append", dest="types", help="event type (repeatable)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="received at or after (ISO date/time)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="received before (ISO date/time)")
+    parser.add_argument("--failed", action="store_true", help="only events that gave up after retries")
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+
+    count = replay(args.types, args.since, args.until, args.failed, args.batch_size)
+    print(f"✅ Replayed {count} webhook event(s).")
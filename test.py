@@ -1,7 +1,9 @@
 # test.py (place this at the project root, alongside app/)
 
+from app.core.log import setup_logging
 from app.tasks.recurrence import generate_recurring_invoices
 
 if __name__ == "__main__":
+    setup_logging()
     generate_recurring_invoices()
     print("Recurrence job run complete.")
@@ -1,8 +1,10 @@
 from freezegun import freeze_time
+from app.core.log import setup_logging
 from app.tasks.recurrence import generate_recurring_invoices
 from app.models import invoice, customer  # 👈 ensure models are loaded
 
 if __name__ == "__main__":
+    setup_logging()
     with freeze_time("2025-09-01"):
         print("⏳ Freezing time at:", __import__("datetime").date.today())
         generate_recurring_invoices()
@@ -0,0 +1,69 @@
+# tests/conftest.py
+#
+# Behavioural tests run the app in-process (TestClient) against a
+# throwaway SQLite database; the settings below keep every backend local.
+# Every test starts from empty tables.
+
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="invoice-tests-")
+
+# The app modules create their engine and read settings on import
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.sqlite"
+os.environ["EMAIL_BACKEND"] = "fake"
+os.environ["STRIPE_BACKEND"] = "fake"
+os.environ["STRIPE_WEBHOOK_SECRET"] = "whsec_test"
+os.environ["RUN_SCHEDULER_IN_WEB"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["IMPORT_DIR"] = _DB_DIR
+
+import importlib
+import pkgutil
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables."""
+    import app.models
+    from app.db.database import Base, SessionLocal, engine
+
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.api.dependencies import user_cache
+    from app.main import app
+
+    user_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def merchant(db, client):
+    """(merchant_id, auth headers) for a merchant without a Stripe account."""
+    from app.core.security import hash_password
+    from app.models.user import User
+
+    user = User(company_name="Test Co", email="merchant@example.com", hashed_password=hash_password("secret"))
+    db.add(user)
+    db.commit()
+
+    response = client.post("/auth/login", data={"username": user.email, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return user.id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
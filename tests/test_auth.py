@@ -0,0 +1,34 @@
+# tests/test_auth.py
+#
+# Access/refresh tokens: refresh tokens are single-use and revoked on logout.
+
+def _login(client) -> dict:
+    response = client.post("/auth/login", data={"username": "merchant@example.com", "password": "secret"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_refresh_logout_refresh_is_rejected(client, merchant):
+    merchant_id, _ = merchant
+    tokens = _login(client)
+
+    refreshed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200, refreshed.text
+    refreshed = refreshed.json()
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["id"] == merchant_id
+
+    # Single use: the token that was exchanged is revoked
+    reused = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+
+    assert client.post("/auth/logout", json={"refresh_token": refreshed["refresh_token"]}).json() == {"success": True}
+    after_logout = client.post("/auth/refresh", json={"refresh_token": refreshed["refresh_token"]})
+    assert after_logout.status_code == 401
+
+
+def test_access_token_is_not_a_refresh_token(client, merchant):
+    tokens = _login(client)
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
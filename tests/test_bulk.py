@@ -0,0 +1,48 @@
+# tests/test_bulk.py
+#
+# POST /invoices/bulk: invalid items fail on their own, the rest is created.
+
+from app.models.invoice import Invoice
+
+
+def _invoice(index: int, **fields) -> dict:
+    payload = {
+        "customer_first_name": "Ada",
+        "customer_last_name": "Lovelace",
+        "customer_email": f"customer{index}@example.com",
+        "amount": 10 + index,
+        "issue_date": "2025-06-01",
+    }
+    payload.update(fields)
+    return payload
+
+
+def test_bulk_reports_errors_per_item(client, db, merchant):
+    merchant_id, headers = merchant
+    items = [
+        _invoice(0),
+        _invoice(1, is_recurring=True, recurring_amount=5, frequency=None),
+        _invoice(2, is_recurring=True, recurring_amount=5, frequency="weekly"),
+        _invoice(3, is_recurring=True, frequency="monthly"),
+        _invoice(4, is_recurring=True, recurring_amount=5, frequency="Monthly"),
+        _invoice(5, customer_email="customer4@example.com", is_recurring=True, recurring_amount=5, frequency="yearly"),
+        _invoice(6),
+    ]
+
+    response = client.post("/invoices/bulk", json=items, headers=headers)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["failed"]) == (3, 4)
+    assert [result["status"] for result in body["results"]] == [
+        "created", "error", "error", "error", "created", "error", "created",
+    ]
+    assert "frequency must be 'monthly' or 'yearly'" in body["results"][1]["error"]
+    assert "recurring_amount" in body["results"][3]["error"]
+    assert "already has an active recurring invoice" in body["results"][5]["error"]
+
+    created = {result["index"]: result["invoice"] for result in body["results"] if result["status"] == "created"}
+    stored = db.query(Invoice).filter(Invoice.merchant_id == merchant_id).order_by(Invoice.id).all()
+    assert [invoice.id for invoice in stored] == [created[index]["id"] for index in (0, 4, 6)]
+    assert [float(invoice.amount) for invoice in stored] == [10, 14, 16]
+    assert all(invoice.payment_url for invoice in stored)
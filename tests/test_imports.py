@@ -0,0 +1,99 @@
+# tests/test_imports.py
+#
+# Import jobs (app/tasks/imports.py): row failures stay row failures, and
+# a job interrupted mid-chunk resumes after its last committed row.
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.models.import_job import ImportJob
+from app.models.invoice import Invoice
+from app.tasks import imports
+
+HEADER = "customer_first_name,customer_last_name,customer_email,amount,issue_date\n"
+
+
+def _upload(client, headers, emails) -> int:
+    rows = HEADER + "".join(f"Ada,Lovelace,{email},12.5,2025-06-01\n" for email in emails)
+    response = client.post("/imports/invoices", files={"file": ("invoices.csv", rows.encode())}, headers=headers)
+    assert response.status_code == 202, response.text
+    return response.json()["id"]
+
+
+def _job(client, headers, job_id) -> dict:
+    return client.get(f"/imports/{job_id}", headers=headers).json()
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 3)
+
+
+def test_crashing_row_fails_alone(client, db, merchant, small_chunks, monkeypatch):
+    merchant_id, headers = merchant
+    emails = [f"customer{index}@example.com" for index in range(7)]
+    emails[4] = "crash@example.com"
+    job_id = _upload(client, headers, emails)
+
+    prepare_bulk = imports.prepare_bulk
+
+    def crashing_prepare_bulk(db, merchant, invoices):
+        if any(invoice.customer_email == "crash@example.com" for invoice in invoices):
+            raise RuntimeError("boom")
+        return prepare_bulk(db, merchant, invoices)
+
+    monkeypatch.setattr(imports, "prepare_bulk", crashing_prepare_bulk)
+    assert imports.process_import_jobs() == 1
+
+    job = _job(client, headers, job_id)
+    assert job["status"] == "completed"
+    assert (job["rows_processed"], job["rows_imported"], job["rows_failed"]) == (7, 6, 1)
+    assert job["errors"] == [{"row": 5, "error": "boom"}]
+    imported = db.query(Invoice.customer_email).filter(Invoice.merchant_id == merchant_id).all()
+    assert sorted(email for (email,) in imported) == sorted(set(emails) - {"crash@example.com"})
+
+
+def test_interrupted_import_resumes_after_last_committed_row(client, db, merchant, small_chunks, monkeypatch):
+    merchant_id, headers = merchant
+    emails = [f"customer{index}@example.com" for index in range(8)]
+    job_id = _upload(client, headers, emails)
+
+    # The database goes away while the second chunk is written
+    write_chunk = imports._write_chunk
+    calls = []
+
+    def failing_write_chunk(db, job, merchant, rows):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("server closed the connection unexpectedly"))
+        return write_chunk(db, job, merchant, rows)
+
+    monkeypatch.setattr(imports, "_write_chunk", failing_write_chunk)
+    assert imports.process_import_jobs() == 1
+
+    job = _job(client, headers, job_id)
+    assert job["status"] == "running"
+    assert (job["rows_processed"], job["rows_imported"]) == (3, 3)
+    stored = db.get(ImportJob, job_id)
+    assert "server closed the connection" in stored.last_error
+    assert os.path.exists(stored.file_path)
+
+    # Not claimed again while the lease runs
+    assert imports.process_import_jobs() == 0
+
+    monkeypatch.setattr(imports, "_write_chunk", write_chunk)
+    stored.claimed_at = datetime.utcnow() - timedelta(seconds=settings.IMPORT_LEASE_SECONDS + 1)
+    db.commit()
+    assert imports.process_import_jobs() == 1
+
+    job = _job(client, headers, job_id)
+    assert job["status"] == "completed"
+    assert (job["rows_processed"], job["rows_imported"], job["rows_failed"]) == (8, 8, 0)
+    db.expire_all()
+    assert not os.path.exists(db.get(ImportJob, job_id).file_path)
+    imported = db.query(Invoice.customer_email).filter(Invoice.merchant_id == merchant_id).all()
+    assert sorted(email for (email,) in imported) == sorted(emails)
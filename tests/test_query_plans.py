@@ -0,0 +1,148 @@
+# tests/test_query_plans.py
+#
+# Query-plan regression check for the invoice/customer indexes.
+# Seeds a large synthetic dataset into QUERY_PLAN_DATABASE_URL (Postgres),
+# runs EXPLAIN on the statements our endpoints and the recurrence job
+# issue, built with the application's own statement builders, and fails if
+# any of them falls back to a sequential scan. Skipped when the variable is
+# not set. Everything runs inside one transaction that is rolled back at
+# the end, so the database is left untouched.
+#
+#   QUERY_PLAN_DATABASE_URL=postgresql://... python -m pytest tests/test_query_plans.py
+#
+# QUERY_PLAN_MERCHANTS / QUERY_PLAN_INVOICES_PER_MERCHANT change the seed size.
+
+import os
+from datetime import date
+
+import pytest
+
+DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL")
+MERCHANTS = int(os.getenv("QUERY_PLAN_MERCHANTS", "200"))
+INVOICES_PER_MERCHANT = int(os.getenv("QUERY_PLAN_INVOICES_PER_MERCHANT", "2000"))
+
+if not (DATABASE_URL or "").startswith("postgresql"):
+    pytest.skip("QUERY_PLAN_DATABASE_URL is not a Postgres URL", allow_module_level=True)
+
+# The app modules below create their engine on import
+os.environ.setdefault("DATABASE_URL", DATABASE_URL)
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+
+from app.api.customer import _customer_invoices_statement, _customer_page_statement
+from app.api.invoice import _invoice_list_statement, _invoice_page_statement
+from app.db.database import Base
+from app.models import user, invoice, customer, customer_summary  # 👈 ensure models are loaded
+from app.models.invoice import Invoice
+from app.tasks.recurrence import _due_filter
+from app.utils.aggregates import rebuild_customer_summaries
+from app.utils.pagination import DEFAULT_PAGE_SIZE, encode_cursor
+
+CHECKED_TABLES = {"invoices", "customers", "customer_summaries"}
+
+
+def _seed(db: Session, merchants: int, invoices_per_merchant: int):
+    customers_per_merchant = max(invoices_per_merchant // 10, 1)
+    db.execute(text("""
+        INSERT INTO users (company_name, email, hashed_password)
+        SELECT 'Plan Check ' || m, 'plan-check-' || m || '@example.com', 'x'
+        FROM generate_series(1, :merchants) AS m
+    """), {"merchants": merchants})
+    db.execute(text("""
+        INSERT INTO customers (merchant_id, first_name, last_name, email, created_at)
+        SELECT u.id, 'First', 'Last', 'c' || c || '-' || u.id || '@example.com', NOW()
+        FROM users u, generate_series(1, :customers) AS c
+        WHERE u.email LIKE 'plan-check-%'
+    """), {"customers": customers_per_merchant})
+    db.execute(text("""
+        INSERT INTO invoices (
+            merchant_id, customer_id, customer_first_name, customer_last_name, customer_email,
+            amount, issue_date, frequency, status, is_recurring, recurring_amount,
+            recurrence_start_date, last_generated_on
+        )
+        SELECT c.merchant_id, c.id, c.first_name, c.last_name, c.email,
+               (random() * 500)::numeric(10, 2),
+               DATE '2020-01-01' + (random() * 2000)::int,
+               CASE WHEN i % 50 = 0 THEN 'monthly' END,
+               (ARRAY['Paid', 'Paid', 'Paid', 'Due', 'canceled'])[1 + (random() * 4)::int],
+               i % 50 = 0,
+               CASE WHEN i % 50 = 0 THEN 9.99 END,
+               CASE WHEN i % 50 = 0 THEN DATE '2020-01-01' END,
+               CASE WHEN i % 50 = 0 THEN CURRENT_DATE - (random() * 40)::int END
+        FROM customers c
+        JOIN users u ON u.id = c.merchant_id AND u.email LIKE 'plan-check-%',
+        generate_series(1, 10) AS i
+    """))
+    db.execute(text("ANALYZE users"))
+    db.execute(text("ANALYZE customers"))
+    db.execute(text("ANALYZE invoices"))
+    rebuild_customer_summaries(db)
+    db.execute(text("ANALYZE customer_summaries"))
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    """(session, merchant_id, customer_id) on the seeded data; rolled back afterwards."""
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    connection = engine.connect()
+    transaction = connection.begin()
+    # rebuild_customer_summaries commits per batch; keep that inside our transaction
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        _seed(db, MERCHANTS, INVOICES_PER_MERCHANT)
+        merchant_id, customer_id = db.execute(text(
+            "SELECT merchant_id, id FROM customers WHERE email LIKE 'c1-%@example.com' LIMIT 1"
+        )).one()
+        yield db, merchant_id, customer_id
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+
+# name -> builder(merchant_id, customer_id), using the same functions the
+# endpoints and the recurrence job call
+CHECKED_STATEMENTS = {
+    "GET /invoices/all (first page)": lambda merchant_id, customer_id: _invoice_page_statement(
+        _invoice_list_statement(merchant_id, None, None), None, DEFAULT_PAGE_SIZE,
+    ),
+    "GET /invoices/all (next page)": lambda merchant_id, customer_id: _invoice_page_statement(
+        _invoice_list_statement(merchant_id, None, None),
+        encode_cursor(date(2023, 1, 1), 10 ** 9),
+        DEFAULT_PAGE_SIZE,
+    ),
+    "GET /invoices/due": lambda merchant_id, customer_id: _invoice_page_statement(
+        _invoice_list_statement(merchant_id, "Due", "id,issue_date,amount"), None, DEFAULT_PAGE_SIZE,
+    ),
+    "GET /customers": lambda merchant_id, customer_id: _customer_page_statement(
+        merchant_id, None, None, None, DEFAULT_PAGE_SIZE,
+    ),
+    "GET /customers/{id}/invoices": lambda merchant_id, customer_id: _customer_invoices_statement(
+        merchant_id, customer_id, None,
+    ),
+    "recurrence run planning": lambda merchant_id, customer_id: select(Invoice.id).where(
+        _due_filter(date.today())
+    ),
+}
+
+
+def _seq_scans(plan: dict):
+    """Yields the tables a plan (or any of its sub-plans) scans sequentially."""
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in CHECKED_TABLES:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+@pytest.mark.parametrize("name", list(CHECKED_STATEMENTS))
+def test_query_uses_indexes(seeded, name):
+    db, merchant_id, customer_id = seeded
+    statement = CHECKED_STATEMENTS[name](merchant_id, customer_id).compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()[0]["Plan"]
+    scanned = sorted(set(_seq_scans(plan)))
+    assert not scanned, f"{name}: sequential scan on {', '.join(scanned)}"
@@ -0,0 +1,84 @@
+# tests/test_recurrence.py
+#
+# Recurrence runs (app/tasks/recurrence.py): a run that raises is retried
+# after a delay, and only billed items count as done.
+
+from datetime import date, datetime, timedelta
+
+from app.core.config import settings
+from app.models.invoice import Invoice
+from app.models.recurrence_run import RecurrenceRun, RecurrenceRunItem
+from app.tasks import recurrence
+
+
+def _recurring_invoice(merchant_id: int, index: int, frequency: str) -> Invoice:
+    return Invoice(
+        merchant_id=merchant_id,
+        customer_first_name="Ada",
+        customer_last_name="Lovelace",
+        customer_email=f"customer{index}@example.com",
+        amount=10,
+        issue_date=date(2025, 1, 1),
+        status="Paid",
+        is_recurring=True,
+        frequency=frequency,
+        recurring_amount=12,
+        recurrence_start_date=date(2025, 1, 1),
+    )
+
+
+def test_failed_run_is_retried_after_a_delay(db, merchant, monkeypatch):
+    merchant_id, _ = merchant
+    db.add_all([
+        _recurring_invoice(merchant_id, 0, "monthly"),
+        _recurring_invoice(merchant_id, 1, "monthly"),
+        _recurring_invoice(merchant_id, 2, "weekly"),  # unrecognized: skipped
+    ])
+    db.commit()
+
+    process_chunk = recurrence._process_chunk
+
+    def failing_process_chunk(db, run, items):
+        raise RuntimeError("Stripe is down")
+
+    monkeypatch.setattr(recurrence, "_process_chunk", failing_process_chunk)
+    recurrence.generate_recurring_invoices()
+
+    run = db.query(RecurrenceRun).one()
+    assert (run.status, run.attempts, run.last_error) == ("running", 1, "Stripe is down")
+    assert run.next_attempt_at > datetime.utcnow()
+    assert db.query(RecurrenceRunItem).filter(RecurrenceRunItem.claimed_by.isnot(None)).count() == 0
+
+    # Not resumed before next_attempt_at
+    monkeypatch.setattr(recurrence, "_process_chunk", process_chunk)
+    recurrence.generate_recurring_invoices()
+    db.refresh(run)
+    assert (run.status, run.invoices_done) == ("running", 0)
+
+    run.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    recurrence.generate_recurring_invoices()
+
+    db.refresh(run)
+    assert (run.status, run.invoices_total, run.invoices_done) == ("completed", 3, 2)
+    statuses = sorted(status for (status,) in db.query(RecurrenceRunItem.status))
+    assert statuses == ["done", "done", "skipped"]
+
+
+def test_run_is_marked_failed_after_max_attempts(db, merchant, monkeypatch):
+    merchant_id, _ = merchant
+    db.add(_recurring_invoice(merchant_id, 0, "monthly"))
+    db.commit()
+
+    def failing_process_chunk(db, run, items):
+        raise RuntimeError("Stripe is down")
+
+    monkeypatch.setattr(recurrence, "_process_chunk", failing_process_chunk)
+    monkeypatch.setattr(settings, "RECURRENCE_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "RECURRENCE_RETRY_BASE_SECONDS", 0)
+    for _ in range(3):
+        recurrence.generate_recurring_invoices()
+
+    run = db.query(RecurrenceRun).one()
+    assert (run.status, run.attempts) == ("failed", 2)
+    assert run.finished_at is not None
@@ -0,0 +1,173 @@
+# tests/test_webhook.py
+#
+# POST /stripe-webhook stores verified events once; the webhook worker
+# (app/tasks/webhook_events.py) applies them in batches and falls back to
+# one event at a time when a batch fails.
+
+import hashlib
+import hmac
+import json
+import time
+from datetime import date
+
+import pytest
+
+from app.core.config import settings
+from app.models.invoice import Invoice
+from app.models.webhook_event import WebhookEvent
+from app.tasks.recurrence import generate_recurring_invoices
+from app.tasks.webhook_events import process_webhook_events
+
+PERIOD = date(2025, 6, 1)
+
+
+def _post_event(client, event_id: str, event_type: str, data_object: dict):
+    body = json.dumps({"id": event_id, "object": "event", "type": event_type, "data": {"object": data_object}})
+    timestamp = int(time.time())
+    signature = hmac.new(
+        settings.STRIPE_WEBHOOK_SECRET.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256
+    ).hexdigest()
+    response = client.post(
+        "/stripe-webhook", content=body,
+        headers={"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _completed_session(invoice_id, session_id: str = "cs_test_1", payment_intent: str = "pi_test_1") -> dict:
+    return {
+        "id": session_id,
+        "object": "checkout.session",
+        "payment_intent": payment_intent,
+        "metadata": {"invoice_id": str(invoice_id), "period": PERIOD.isoformat()},
+    }
+
+
+@pytest.fixture
+def invoices(db, merchant):
+    merchant_id, _ = merchant
+    rows = [
+        Invoice(
+            merchant_id=merchant_id,
+            customer_first_name="Ada",
+            customer_last_name="Lovelace",
+            customer_email=f"customer{index}@example.com",
+            amount=25,
+            issue_date=PERIOD,
+            status="Due",
+        )
+        for index in range(3)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def test_duplicate_delivery_is_stored_once(client, db, invoices):
+    session = _completed_session(invoices[0].id)
+
+    assert _post_event(client, "evt_1", "checkout.session.completed", session) == {"success": True, "duplicate": False}
+    assert _post_event(client, "evt_1", "checkout.session.completed", session) == {"success": True, "duplicate": True}
+    assert db.query(WebhookEvent).count() == 1
+
+    assert process_webhook_events() == 1
+    db.refresh(invoices[0])
+    assert (invoices[0].status, invoices[0].stripe_payment_intent_id) == ("Paid", "pi_test_1")
+
+
+def test_unsigned_event_is_rejected(client, db):
+    response = client.post("/stripe-webhook", content=b"{}", headers={"Stripe-Signature": "t=1,v1=bad"})
+    assert response.json()["success"] is False
+    assert db.query(WebhookEvent).count() == 0
+
+
+def test_failing_event_does_not_hold_up_its_batch(client, db, invoices, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 2)
+    _post_event(client, "evt_1", "checkout.session.completed", _completed_session(invoices[0].id, "cs_1", "pi_1"))
+    _post_event(client, "evt_bad", "checkout.session.completed", _completed_session("not-a-number", "cs_2", "pi_2"))
+    _post_event(client, "evt_3", "checkout.session.completed", _completed_session(invoices[2].id, "cs_3", "pi_3"))
+
+    # The batch fails on evt_bad and is applied again one event at a time
+    assert process_webhook_events() == 2
+
+    db.expire_all()
+    assert [invoice.status for invoice in db.query(Invoice).order_by(Invoice.id)] == ["Paid", "Due", "Paid"]
+    bad = db.query(WebhookEvent).filter_by(stripe_event_id="evt_bad").one()
+    assert (bad.status, bad.attempts) == ("pending", 1)
+    assert bad.last_error
+
+    # Retried on the next tick, then given up after WEBHOOK_MAX_ATTEMPTS
+    assert process_webhook_events() == 0
+    db.refresh(bad)
+    assert (bad.status, bad.attempts) == ("failed", 2)
+    assert {event.status for event in db.query(WebhookEvent).filter(WebhookEvent.id != bad.id)} == {"processed"}
+
+
+def _roll_over(db, invoice: Invoice):
+    """Bills the next period of the invoice, as a recurrence run does."""
+    invoice.is_recurring = True
+    invoice.frequency = "monthly"
+    invoice.recurring_amount = 30
+    invoice.recurrence_start_date = PERIOD
+    db.commit()
+
+    generate_recurring_invoices()
+    db.refresh(invoice)
+    assert invoice.issue_date > PERIOD
+
+
+def test_events_of_an_earlier_period_leave_the_invoice_alone(client, db, invoices):
+    invoice = invoices[0]
+    _post_event(client, "evt_paid", "checkout.session.completed", _completed_session(invoice.id, "cs_june", "pi_june"))
+    process_webhook_events()
+
+    _roll_over(db, invoice)
+    assert (invoice.status, invoice.stripe_payment_intent_id, invoice.checkout_session_id) == ("Due", None, None)
+
+    # June's payment delivered late, a refund of it, a failed retry of it
+    _post_event(client, "evt_paid_late", "checkout.session.completed", _completed_session(invoice.id, "cs_june_2", "pi_june_2"))
+    _post_event(client, "evt_refund", "charge.refunded", {
+        "id": "ch_june", "object": "charge", "payment_intent": "pi_june",
+        "amount_refunded": 2500, "refunded": True, "metadata": {"invoice_id": str(invoice.id)},
+    })
+    _post_event(client, "evt_failed", "payment_intent.payment_failed", {
+        "id": "pi_june_3", "object": "payment_intent",
+        "metadata": {"invoice_id": str(invoice.id), "period": PERIOD.isoformat()},
+        "last_payment_error": {"message": "Your card was declined."},
+    })
+    assert process_webhook_events() == 3
+
+    db.refresh(invoice)
+    assert (invoice.status, invoice.stripe_payment_intent_id, invoice.payment_error, invoice.amount_refunded) == (
+        "Due", None, None, None,
+    )
+
+
+def test_session_without_period_must_be_the_current_one(client, db, invoices):
+    current, replaced = invoices[0], invoices[1]
+    current.checkout_session_id = "cs_current"
+    replaced.checkout_session_id = "cs_newer"
+    db.commit()
+
+    for index, invoice in enumerate((current, replaced)):
+        session = _completed_session(invoice.id, f"cs_{'current' if index == 0 else 'older'}", f"pi_{index}")
+        del session["metadata"]["period"]
+        _post_event(client, f"evt_{index}", "checkout.session.completed", session)
+    process_webhook_events()
+
+    db.refresh(current)
+    db.refresh(replaced)
+    assert (current.status, replaced.status) == ("Paid", "Due")
+
+
+def test_refund_of_the_current_payment_is_applied(client, db, invoices):
+    invoice = invoices[0]
+    _post_event(client, "evt_paid", "checkout.session.completed", _completed_session(invoice.id, "cs_1", "pi_1"))
+    _post_event(client, "evt_refund", "charge.refunded", {
+        "id": "ch_1", "object": "charge", "payment_intent": "pi_1", "amount_refunded": 2500, "refunded": True,
+    })
+    process_webhook_events()
+
+    db.refresh(invoice)
+    assert (invoice.status, invoice.amount_refunded) == ("refunded", 25)